@@ -1,16 +1,51 @@
-from flask import Flask, render_template, jsonify, request
-from new import SecureNetwork, create_network
+import json
+import os
+import time
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context
 from flask_cors import CORS
-import matplotlib
-matplotlib.use('Agg')  # 设置matplotlib后端
-import io
-import base64
-import matplotlib.pyplot as plt
+os.environ.setdefault('MPLBACKEND', 'Agg')  # 设置matplotlib后端（matplotlib在首次渲染时才导入）
+os.environ.setdefault('ROUTE_METRICS', '1')  # 服务默认启用性能指标，ROUTE_METRICS=0 关闭
+import metrics
+from metrics import API_PHASE_SECONDS, API_REQUEST_SECONDS, REGISTRY
+from new import DEFAULT_WEIGHTS
+from state import NetworkStateManager, build_network, snapshot_loader
 
 app = Flask(__name__)
 CORS(app)
 
-network = None
+# 设置 ROUTE_SHARED_STATE 后，多个worker进程通过共享内存使用同一份拓扑和负载；
+# 设置 ROUTE_TOPOLOGY 后，从快照文件（snapshot.save_network 生成）加载拓扑而不是随机生成；
+# ROUTE_INDEX_WORKERS 为后台构建延迟距离索引的进程数，0 表示不构建
+topology_file = os.environ.get('ROUTE_TOPOLOGY')
+state = NetworkStateManager(shared_name=os.environ.get('ROUTE_SHARED_STATE'),
+                            network_factory=snapshot_loader(topology_file) if topology_file else build_network,
+                            index_workers=int(os.environ.get('ROUTE_INDEX_WORKERS', min(4, os.cpu_count() or 1))))
+
+if topology_file:
+    @app.before_request
+    def _load_topology():
+        # 首个请求时才加载快照：导入 app 时不构建网络，也就不会创建索引进程池
+        state.ensure_initialized(seed=0)
+
+if metrics.ENABLED:
+    @app.before_request
+    def _start_timer():
+        request.metrics_begin = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        begin = getattr(request, 'metrics_begin', None)
+        if begin is not None and request.endpoint != 'get_metrics':
+            API_REQUEST_SECONDS.observe(time.perf_counter() - begin, endpoint=request.endpoint or 'unknown',
+                                        method=request.method, status=str(response.status_code))
+        return response
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus 文本格式的性能指标（本进程）"""
+    if not metrics.ENABLED:
+        return jsonify({'error': 'Metrics disabled (set ROUTE_METRICS=1)'}), 404
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
@@ -19,120 +54,189 @@ def index():
 
 @app.route('/api/network/init', methods=['POST'])
 def init_network():
-    global network
-    network = create_network()
-    return jsonify({'message': 'Network initialized successfully'})
+    data = request.get_json(silent=True) or {}
+    seed = state.reset(seed=data.get('seed'))
+    return jsonify({'message': 'Network initialized successfully', 'seed': seed})
 
 @app.route('/api/network/status', methods=['GET'])
 def get_network_status():
-    if network is None:
+    if not state.initialized:
         return jsonify({'error': 'Network not initialized'}), 400
     
-    nodes_status = {
-        node_id: {
-            'security_level': node.security_level,
-            'max_capacity': node.max_capacity,
-            'current_load': node.current_load,
-            'load_ratio': node.load_ratio
-        }
-        for node_id, node in network.nodes.items()
-    }
-    
-    edges_status = {
-        f"{u}-{v}": {
-            'latency': props['latency'],
-            'bandwidth': props['bandwidth'],
-            'security': props['security']
-        }
-        for (u, v), props in network.edge_props.items()
-        if u < v  # 只返回一个方向的边
-    }
-    
-    return jsonify({
-        'nodes': nodes_status,
-        'edges': edges_status
-    })
+    return jsonify(state.snapshot().status)
+
+@app.route('/api/network/graph', methods=['GET'])
+def get_graph():
+    """供前端ECharts直接绘制的拓扑数据，不经过matplotlib"""
+    if not state.initialized:
+        return jsonify({'error': 'Network not initialized'}), 400
+    return jsonify(state.snapshot().graph)
+
+@app.route('/api/network/edge', methods=['POST'])
+def add_edge():
+    """在两个已有节点之间添加一条边"""
+    if not state.initialized:
+        return jsonify({'error': 'Network not initialized'}), 400
+    if state.shared is not None:
+        # 共享模式下各worker按共享内存中的种子重建拓扑，单个worker上加的边无法同步给其他worker
+        return jsonify({'error': 'Adding edges is not supported with shared state (ROUTE_SHARED_STATE)'}), 409
+
+    data = request.json or {}
+    try:
+        with state.write() as network:
+            u, v = data['u'], data['v']
+            _check_nodes(network, [u, v])
+            if u == v or network.graph.has_edge(u, v):
+                raise ValueError(f"Invalid or duplicate edge: {u}-{v}")
+            network.add_edge(u, v, data['latency'], data.get('bandwidth', 100))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'message': 'Edge added successfully'})
+
+@app.route('/api/network/stream', methods=['GET'])
+def stream_changes():
+    """Server-Sent Events 推送增量变更
+
+    事件类型：hello（连接时的版本号）、loads（负载变化的节点 {id: [current_load, load_ratio]}）、
+    edges（新增的边 [u, v, latency, bandwidth, security]）、reset（拓扑被替换，需重新拉取全量数据）。
+    支持 Last-Event-ID 断线续传。长连接需要线程或协程型的worker。
+    """
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        last_id = int(last_id) if last_id else state.feed.last_id
+    except ValueError:
+        return jsonify({'error': f"Invalid event id: {last_id!r}"}), 400
+
+    def generate(last_id):
+        yield _sse('hello', {'last_id': last_id})
+        while True:
+            events = state.changes(last_id)
+            if not events:
+                yield ': keep-alive\n\n'
+                continue
+            for event_id, kind, data in events:
+                last_id = event_id
+                yield _sse(kind, data, event_id)
+
+    return Response(stream_with_context(generate(last_id)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _sse(kind, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{head}event: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
 
 @app.route('/api/network/find_path', methods=['POST'])
 def find_path():
-    if network is None:
+    """单次寻路；查询参数 render=0 不生成图像，render=defer 只返回图像地址"""
+    if not state.initialized:
         return jsonify({'error': 'Network not initialized'}), 400
     
     data = request.json
     start = data.get('start')
     end = data.get('end')
-    weights = data.get('weights', {'latency': 0.4, 'load': 0.4, 'security': 0.2})
+    weights = data.get('weights', DEFAULT_WEIGHTS)
+    render_mode = request.args.get('render', '1').lower()
     
     try:
-        path, cost = network.find_path(start, end, weights)
-        
-        # 生成可视化
-        network._draw_network(highlight_path=path)
-        
-        # 添加图例
-        legend_elements = [
-            plt.Line2D([0], [0], color='red', lw=2, label='选中路径'),
-            plt.scatter([0], [0], c='lightblue', s=100, label='路径节点'),
-            plt.scatter([0], [0], c='g', s=100, label='低负载'),
-            plt.scatter([0], [0], c='y', s=100, label='中负载'),
-            plt.scatter([0], [0], c='r', s=100, label='高负载')
-        ]
-        plt.legend(handles=legend_elements, 
-                  prop=network.font_prop,
-                  loc='upper right',
-                  bbox_to_anchor=(1.15, 1),
-                  fontsize=10)
+        with metrics.timer(API_PHASE_SECONDS, phase='routing'):
+            with state.write() as network:
+                path, cost = network.find_path(start, end, weights)
+        result = {'path': path, 'cost': cost}
         
-        # 将图像转换为base64
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', bbox_inches='tight', dpi=100,
-                    facecolor='white', edgecolor='none')
-        buf.seek(0)
-        image_base64 = base64.b64encode(buf.getvalue()).decode('utf-8')
-        plt.close()
+        if render_mode in ('0', 'false', 'no'):
+            result['image'] = None
+        elif render_mode == 'defer':
+            result['image'] = None
+            query = f"?path={','.join(map(str, path))}" if path else ''
+            result['image_url'] = f"/api/network/visualization{query}"
+        else:
+            result['image'] = state.render(highlight_path=path)
         
-        return jsonify({
-            'path': path,
-            'cost': cost,
-            'image': image_base64
-        })
+        return jsonify(result)
     except Exception as e:
-        plt.close()  # 确保关闭所有图形
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/network/find_paths', methods=['POST'])
+def find_paths():
+    """批量寻路，不生成图像
+
+    请求体二选一：
+      {"requests": [{"start": 0, "end": 5, "weights": {...}}, ...], "weights": {...}}
+      {"start": 0, "ends": [5, 7, 9], "weights": {...}}  # 单源多目的，只运行一次Dijkstra
+    按顺序执行并依次更新负载，返回 {"paths": [...], "costs": [...]}，不可达时为 null。
+    """
+    if not state.initialized:
+        return jsonify({'error': 'Network not initialized'}), 400
+
+    data = request.json or {}
+    default_weights = data.get('weights', DEFAULT_WEIGHTS)
+
+    try:
+        with metrics.timer(API_PHASE_SECONDS, phase='routing'), state.write() as network:
+            if 'ends' in data:
+                start, ends = data.get('start'), data['ends']
+                _check_nodes(network, [start] + list(ends))
+                results = network.find_paths_from(start, ends, default_weights)
+            else:
+                queries = data.get('requests', [])
+                _check_nodes(network, [n for q in queries for n in (q.get('start'), q.get('end'))])
+                results = [network.find_path(q['start'], q['end'], q.get('weights', default_weights))
+                           for q in queries]
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'paths': [path for path, _ in results],
+        'costs': [cost if path is not None else None for path, cost in results]
+    })
+
+@app.route('/api/network/find_multipath', methods=['POST'])
+def find_multipath():
+    """多路径寻路，不生成图像
+
+    请求体 {"start": 0, "end": 5, "weights": {...}, "k": 3, "requests": 10}：
+    把 requests 个请求按剩余容量比例分到 k 条候选路径上并更新负载，
+    返回 {"paths": [...], "costs": [...], "requests": [...]}，不可达时各列表为空。
+    """
+    if not state.initialized:
+        return jsonify({'error': 'Network not initialized'}), 400
+
+    data = request.json or {}
+    try:
+        start, end = data.get('start'), data.get('end')
+        k, requests = int(data.get('k', 3)), int(data.get('requests', 1))
+        if k < 1 or requests < 1:
+            raise ValueError("k and requests must be positive")
+        with metrics.timer(API_PHASE_SECONDS, phase='routing'), state.write() as network:
+            _check_nodes(network, [start, end])
+            results = network.find_multipath(start, end, data.get('weights', DEFAULT_WEIGHTS),
+                                             k=k, requests=requests)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'paths': [path for path, _, _ in results],
+        'costs': [cost for _, cost, _ in results],
+        'requests': [count for _, _, count in results]
+    })
+
+def _check_nodes(network, node_ids):
+    unknown = [n for n in node_ids if n not in network.nodes]
+    if unknown:
+        raise ValueError(f"Unknown node ids: {unknown}")
+
 @app.route('/api/network/visualization', methods=['GET'])
 def get_visualization():
-    if network is None:
+    """当前网络图像；可用 ?path=0,3,5 高亮一条路径"""
+    if not state.initialized:
         return jsonify({'error': 'Network not initialized'}), 400
     
     try:
-        # 生成可视化
-        network._draw_network()
-        
-        # 添加图例
-        legend_elements = [
-            plt.scatter([0], [0], c='g', s=100, label='低负载'),
-            plt.scatter([0], [0], c='y', s=100, label='中负载'),
-            plt.scatter([0], [0], c='r', s=100, label='高负载')
-        ]
-        plt.legend(handles=legend_elements, 
-                  prop=network.font_prop,
-                  loc='upper right',
-                  bbox_to_anchor=(1.15, 1),
-                  fontsize=10)
-        
-        # 将图像转换为base64
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', bbox_inches='tight', dpi=100,
-                    facecolor='white', edgecolor='none')
-        buf.seek(0)
-        image_base64 = base64.b64encode(buf.getvalue()).decode('utf-8')
-        plt.close()
-        
-        return jsonify({'image': image_base64})
+        path_arg = request.args.get('path')
+        path = [int(n) for n in path_arg.split(',')] if path_arg else None
+        return jsonify({'image': state.render(highlight_path=path)})
     except Exception as e:
-        plt.close()  # 确保关闭所有图形
         return jsonify({'error': str(e)}), 400
 
 if __name__ == '__main__':
-    app.run(debug=True) 
\ No newline at end of file
+    app.run(debug=True)
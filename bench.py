@@ -0,0 +1,376 @@
+"""性能基准测试：route.py、new.py 与 Flask 接口在不同规模拓扑上的耗时与内存
+
+    python bench.py                              # 全部规模、全部用例，结果写入 bench_results.json
+    python bench.py --scales 20,1k --cases find_path,api_find_path
+    python bench.py -o new.json --baseline bench_results.json   # 与基线对比
+
+每个 (用例, 规模) 在独立的子进程中运行，记录：
+  - 墙钟时间：repeat 次运行的最小值/中位数/平均值（秒）
+  - 内存分配：tracemalloc 统计的单次运行峰值与净增量（字节）
+  - 峰值RSS：子进程的 ru_maxrss（字节，包含拓扑构建）
+另外在全新的解释器中测量 route/new/state/app 的导入耗时，并记录导入时连带加载了
+哪些重量级依赖（matplotlib、tabulate 等应在首次渲染时才加载）。
+拓扑由种子确定性生成，相同种子在任何机器上得到相同的图。依赖稠密延迟矩阵、
+节点布局或预先搜索k条候选路径的用例只在较小规模上运行，超出时在结果中记为 skipped。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+SCALES = {'20': 20, '1k': 1000, '10k': 10000, '100k': 100000}
+DENSE_LIMIT = 2000  # 稠密延迟矩阵（n*n）用例的最大节点数
+LAYOUT_LIMIT = 1000  # 需要 spring_layout 布局（绘图、前端拓扑数据）的用例的最大节点数
+KSP_LIMIT = 10000  # 需要预先用Yen算法搜索候选路径的用例的最大节点数
+EDGE_FACTOR = 1.75  # 边数/节点数，与 create_network 的 35/20 一致
+
+def delay_matrix(num_nodes, seed, low=50, high=200):
+    """对称的随机整数延迟矩阵，对角线为0"""
+    rng = np.random.default_rng(seed)
+    upper = np.triu(rng.integers(low, high + 1, size=(num_nodes, num_nodes)), 1).astype(np.float64)
+    return upper + upper.T
+
+def csr_graph(num_nodes, seed):
+    from route import CSRGraph
+    from topology import generate_edges
+    rng = np.random.default_rng(seed)
+    _, u, v = generate_edges('er', rng, num_nodes=num_nodes,
+                             num_edges=int(num_nodes * EDGE_FACTOR))
+    delays = rng.integers(50, 201, size=len(u)).astype(np.float64)
+    return CSRGraph.from_edges(num_nodes, u, v, delays)
+
+def secure_network(num_nodes, seed):
+    """与 create_network 参数分布相同、规模可变的连通 SecureNetwork"""
+    from topology import generate_network
+    return generate_network('er', seed=seed, num_nodes=num_nodes,
+                            num_edges=int(num_nodes * EDGE_FACTOR))
+
+def _route_pairs(num_nodes, seed, count=32):
+    rng = random.Random(seed + 1)
+    return [tuple(rng.sample(range(num_nodes), 2)) for _ in range(count)]
+
+# ---- 用例：setup(num_nodes, seed) 返回无参可调用对象，只有该对象被计时 ----
+
+def setup_dijkstra(num_nodes, seed):
+    from route import dijkstra_shortest_path
+    matrix = delay_matrix(num_nodes, seed)
+    return lambda: dijkstra_shortest_path(0, num_nodes - 1, matrix)
+
+def setup_dijkstra_csr(num_nodes, seed):
+    from route import dijkstra_shortest_path_csr
+    graph = csr_graph(num_nodes, seed)
+    return lambda: dijkstra_shortest_path_csr(0, num_nodes - 1, graph)
+
+def setup_select_next_node(num_nodes, seed):
+    from route import NodeState, select_next_node
+    np.random.seed(seed)
+    nodes = NodeState(num_nodes)
+    nodes.load[:] = np.random.randint(0, 100, size=num_nodes)
+    # select_next_node 只读取当前节点所在的行，用 (1, n) 矩阵避免分配 n*n
+    row = np.random.default_rng(seed).integers(50, 201, size=(1, num_nodes)).astype(np.float64)
+    row[0, 0] = 0
+    return lambda: select_next_node(0, nodes, row, 0.8, 1.0, 0.5, 3)
+
+def _setup_simulation(num_nodes, seed, batch_size):
+    from route import SimulationConfig, Simulator
+    config = SimulationConfig(num_nodes=num_nodes, num_requests=200, batch_size=batch_size,
+                              record_paths=False)
+    simulator = Simulator(config, delay_matrix(num_nodes, seed))
+    return lambda: simulator.run(seed=seed)
+
+def setup_simulation(num_nodes, seed):
+    return _setup_simulation(num_nodes, seed, None)
+
+def setup_simulation_batched(num_nodes, seed):
+    return _setup_simulation(num_nodes, seed, 50)
+
+def setup_find_path(num_nodes, seed):
+    from new import DEFAULT_WEIGHTS
+    network = secure_network(num_nodes, seed)
+    pairs = iter(_route_pairs(num_nodes, seed) * 1000)
+    network.find_path(0, 1, DEFAULT_WEIGHTS)  # 预热数组与代价缓存
+    return lambda: network.find_path(*next(pairs), DEFAULT_WEIGHTS)
+
+def setup_rank_paths(num_nodes, seed):
+    from new import DEFAULT_WEIGHTS
+    network = secure_network(num_nodes, seed)
+    pairs = _route_pairs(num_nodes, seed, count=4)
+    for pair in pairs:
+        network.rank_paths(*pair, DEFAULT_WEIGHTS)  # 预热候选路径缓存，只测热点对的重排序
+    pairs = iter(pairs * 1000)
+    return lambda: network.rank_paths(*next(pairs), DEFAULT_WEIGHTS)
+
+def setup_draw_network(num_nodes, seed):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    network = secure_network(num_nodes, seed)
+    network.ensure_layout()
+    path = network.find_path(0, num_nodes - 1, {'latency': 1, 'load': 0, 'security': 0})[0]
+
+    def draw():
+        network._draw_network(path)
+        plt.close('all')
+    return draw
+
+def _client(num_nodes, seed):
+    """把 app.state 替换为指定规模的网络，返回 Flask 测试客户端"""
+    import app as app_module
+    from state import NetworkStateManager
+    app_module.state = NetworkStateManager(network_factory=lambda s: secure_network(num_nodes, s))
+    client = app_module.app.test_client()
+    client.post('/api/network/init', json={'seed': seed})
+    return client
+
+def _get(client, url):
+    def call():
+        response = client.get(url)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return call
+
+def _post(client, url, payloads):
+    payloads = iter(payloads * 1000)
+
+    def call():
+        response = client.post(url, json=next(payloads))
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return call
+
+def setup_api_status(num_nodes, seed):
+    client = _client(num_nodes, seed)
+    call = _get(client, '/api/network/status')
+    # 每次都让负载变化，避免只测到快照缓存
+    find = _post(client, '/api/network/find_path?render=0', [{'start': 0, 'end': num_nodes - 1}])
+
+    def run():
+        find()
+        call()
+    return run
+
+def setup_api_graph(num_nodes, seed):
+    client = _client(num_nodes, seed)
+    call = _get(client, '/api/network/graph')
+    find = _post(client, '/api/network/find_path?render=0', [{'start': 0, 'end': num_nodes - 1}])
+
+    def run():
+        find()
+        call()
+    return run
+
+def setup_api_find_path(num_nodes, seed):
+    client = _client(num_nodes, seed)
+    return _post(client, '/api/network/find_path?render=0',
+                 [{'start': s, 'end': e} for s, e in _route_pairs(num_nodes, seed)])
+
+def setup_api_find_paths(num_nodes, seed):
+    client = _client(num_nodes, seed)
+    batch = [{'start': s, 'end': e} for s, e in _route_pairs(num_nodes, seed)]
+    return _post(client, '/api/network/find_paths', [{'requests': batch}])
+
+def setup_api_find_path_render(num_nodes, seed):
+    client = _client(num_nodes, seed)
+    return _post(client, '/api/network/find_path',
+                 [{'start': s, 'end': e} for s, e in _route_pairs(num_nodes, seed)])
+
+# 用例名 -> (setup函数, 最大节点数)
+CASES = {
+    'dijkstra': (setup_dijkstra, DENSE_LIMIT),
+    'dijkstra_csr': (setup_dijkstra_csr, None),
+    'select_next_node': (setup_select_next_node, None),
+    'simulation': (setup_simulation, DENSE_LIMIT),
+    'simulation_batched': (setup_simulation_batched, DENSE_LIMIT),
+    'find_path': (setup_find_path, None),
+    'rank_paths': (setup_rank_paths, KSP_LIMIT),
+    'draw_network': (setup_draw_network, LAYOUT_LIMIT),
+    'api_status': (setup_api_status, None),
+    'api_graph': (setup_api_graph, LAYOUT_LIMIT),
+    'api_find_path': (setup_api_find_path, None),
+    'api_find_paths': (setup_api_find_paths, None),
+    'api_find_path_render': (setup_api_find_path_render, LAYOUT_LIMIT),
+}
+
+def run_case(case, num_nodes, seed, repeat):
+    """在当前进程中运行一个用例（由子进程调用）"""
+    setup, _ = CASES[case]
+    setup_start = time.perf_counter()
+    func = setup(num_nodes, seed)
+    setup_time = time.perf_counter() - setup_start
+    func()  # 预热，不计时
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    func()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'nodes': num_nodes,
+        'repeat': repeat,
+        'setup_s': setup_time,
+        'min_s': min(times),
+        'median_s': statistics.median(times),
+        'mean_s': statistics.fmean(times),
+        'alloc_peak_bytes': peak - before,
+        'alloc_net_bytes': after - before,
+        'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+def run_benchmarks(cases, scales, seed=42, repeat=5):
+    """逐个用例在全新的子进程中运行，使峰值RSS互不影响"""
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for scale in scales:
+        num_nodes = SCALES[scale]
+        for case in cases:
+            key = f"{case}@{scale}"
+            limit = CASES[case][1]
+            if limit is not None and num_nodes > limit:
+                results[key] = {'nodes': num_nodes, 'skipped': f"节点数超过该用例上限 {limit}"}
+                print(f"{key:<32} skipped")
+                continue
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                try:
+                    results[key] = pool.submit(run_case, case, num_nodes, seed, repeat).result()
+                except Exception as e:
+                    results[key] = {'nodes': num_nodes, 'error': f"{type(e).__name__}: {e}"}
+            result = results[key]
+            if 'error' in result:
+                print(f"{key:<32} error: {result['error']}")
+            else:
+                print(f"{key:<32} median {result['median_s'] * 1000:10.3f}ms  "
+                      f"peak RSS {result['peak_rss_bytes'] / 2 ** 20:8.1f}MiB")
+    return results
+
+IMPORT_MODULES = ('route', 'new', 'state', 'app')
+HEAVY_MODULES = ('matplotlib', 'tabulate', 'PIL', 'networkx', 'flask')
+
+_IMPORT_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'s': elapsed,
+                  'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+                  'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def import_time(module):
+    """在全新的解释器中导入模块，返回 {'s': 耗时, 'rss': 峰值RSS, 'loaded': 连带导入的重量级依赖}"""
+    code = _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def run_import_benchmarks(modules, repeat=5):
+    results = {}
+    for module in modules:
+        import_time(module)  # 预热字节码缓存
+        samples = [import_time(module) for _ in range(repeat)]
+        times = [sample['s'] for sample in samples]
+        key = f"import:{module}"
+        results[key] = {
+            'repeat': repeat,
+            'min_s': min(times),
+            'median_s': statistics.median(times),
+            'mean_s': statistics.fmean(times),
+            'peak_rss_bytes': max(sample['rss'] for sample in samples),
+            'loaded': samples[-1]['loaded'],
+        }
+        print(f"{key:<32} median {results[key]['median_s'] * 1000:10.3f}ms  "
+              f"loaded {','.join(results[key]['loaded']) or '-'}")
+    return results
+
+def metadata(seed, repeat):
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'seed': seed,
+        'repeat': repeat,
+    }
+
+def compare(current, baseline, threshold=0.2):
+    """逐项对比中位耗时与分配峰值，返回 (表格行, 是否存在回归)
+
+    比值 = 当前/基线，超过 1 + threshold 记为回归。
+    """
+    rows = []
+    regressed = False
+    for key, result in current['results'].items():
+        base = baseline['results'].get(key)
+        if base is None or 'median_s' not in result or 'median_s' not in base:
+            continue
+        time_ratio = result['median_s'] / base['median_s'] if base['median_s'] else float('inf')
+        alloc_ratio = (result['alloc_peak_bytes'] / base['alloc_peak_bytes']
+                       if base.get('alloc_peak_bytes') else 1.0)
+        flag = ''
+        if time_ratio > 1 + threshold or alloc_ratio > 1 + threshold:
+            flag = 'REGRESSION'
+            regressed = True
+        elif time_ratio < 1 - threshold:
+            flag = 'faster'
+        rows.append([key, f"{base['median_s'] * 1000:.3f}", f"{result['median_s'] * 1000:.3f}",
+                     f"{time_ratio:.2f}x", f"{alloc_ratio:.2f}x", flag])
+    return rows, regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="route/new/app 性能基准测试")
+    parser.add_argument('--scales', default=','.join(SCALES),
+                        help=f"逗号分隔的规模，可选 {','.join(SCALES)}")
+    parser.add_argument('--cases', default=','.join(CASES),
+                        help="逗号分隔的用例名，默认全部")
+    parser.add_argument('--imports', default=','.join(IMPORT_MODULES),
+                        help="逗号分隔的需要测量导入耗时的模块，空字符串表示跳过")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5, help="每个用例计时的运行次数")
+    parser.add_argument('-o', '--output', default='bench_results.json')
+    parser.add_argument('--baseline', default=None, help="用于对比的基线结果JSON")
+    parser.add_argument('--threshold', type=float, default=0.2, help="判定为回归的相对变化")
+    args = parser.parse_args()
+
+    scales = [s for s in args.scales.split(',') if s]
+    cases = [c for c in args.cases.split(',') if c]
+    modules = [m for m in args.imports.split(',') if m]
+    unknown = [s for s in scales if s not in SCALES] + [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"未知的规模或用例: {unknown}")
+
+    results = run_import_benchmarks(modules, args.repeat)
+    results.update(run_benchmarks(cases, scales, args.seed, args.repeat))
+    report = {'meta': metadata(args.seed, args.repeat), 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"结果已写入 {args.output}")
+
+    if args.baseline:
+        from tabulate import tabulate
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows, regressed = compare(report, baseline, args.threshold)
+        print(tabulate(rows, headers=['用例', '基线(ms)', '当前(ms)', '耗时比', '分配比', ''],
+                       tablefmt='simple'))
+        if regressed:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
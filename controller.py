@@ -0,0 +1,274 @@
+"""集中控制器：多个路由进程通过共享状态存储（store.py）共享节点负载和信息素
+
+对应 picture.py 中“Controller + Redis -> Node 1..N”的结构：
+  - Controller 初始化共享状态，并集中执行全局维护（负载衰减、信息素挥发）；
+  - 路由进程通过 Controller.attach() 取得 SharedNodeState（route.NodeState 的共享版本），
+    或通过 Controller.attach_network() 为 new.SecureNetwork 挂上 SharedNetworkLoads。
+
+路由进程照常直接读写本地数组，本地数组即读缓存。sync() 把自上次同步以来的本地增量
+批量写入存储，并在同一次往返中读回其他进程累积的结果；距上次同步不足 max_staleness 秒时
+直接返回。因此每跳不产生网络往返：自身的写入立即可见，其他进程的写入最多在双方各自的
+max_staleness 之后可见。
+
+负载和信息素的沉积是加法，各进程的增量可以直接累加；衰减和挥发带下限，多个进程按
+各自的旧值算出的减量叠加后会越过下限。因此路由进程只在本地缓存上执行衰减和挥发，
+把每个节点实际减少的量作为待处理的维护量提交（同样可累加），由唯一的控制器读取最新值
+后统一扣除并施加下限。本地维护时基准也减去同样的量，所以 本地值 - 基准 始终只含沉积，
+沉积既不会被本地维护和控制器重复扣除，也不受二者执行先后的影响；读回共享值时先扣除
+已提交但控制器尚未执行的维护量，各进程看到的状态因此与控制器的执行时机无关。
+
+    store = RedisStore('127.0.0.1', 6379)        # 或 MemoryStore()
+    controller = Controller(store, namespace='route')
+    controller.initialize(num_nodes)              # 只需由一个进程执行一次
+    controller.start(interval=0.05)               # 后台定期执行全局维护
+    simulator = Simulator(config, delay_matrix, state_factory=controller.attach)
+"""
+import threading
+import time
+
+import numpy as np
+
+from route import NodeState
+
+# 各字段在初始化时的取值，与 route.NodeState 一致
+ROUTE_FIELDS = {'load': 0.0, 'pheromone': 1.0, 'request_count': 0.0}
+PHEROMONE_FLOOR = 0.1  # 与 route.evaporate_pheromone 的下限一致
+# 需要集中维护的字段 -> (待处理维护量的键名, 下限)
+MAINTAINED = {'load': ('decay', 0.0), 'pheromone': ('evaporation', PHEROMONE_FLOOR)}
+
+def _keys(namespace):
+    keys = {name: f"{namespace}:{name}" for name in ROUTE_FIELDS}
+    keys['decay'] = f"{namespace}:pending_decay"              # 节点ID -> 待执行的负载衰减量
+    keys['evaporation'] = f"{namespace}:pending_evaporation"  # 节点ID -> 待执行的信息素挥发量
+    return keys
+
+def _indexed(values, size):
+    """{节点ID字符串: 值} -> (下标数组, 值数组)，忽略超出范围的节点"""
+    index = np.fromiter(map(int, values.keys()), dtype=np.int64, count=len(values))
+    data = np.fromiter(values.values(), dtype=np.float64, count=len(values))
+    keep = (index >= 0) & (index < size)
+    return index[keep], data[keep]
+
+def _maintained_view(values, pending, floor, size):
+    """共享值扣除已提交、尚未执行的维护量后的值，返回 (下标数组, 值数组)"""
+    index, data = _indexed(values, size)
+    amounts = np.zeros(size)
+    pending_index, pending_data = _indexed(pending, size)
+    amounts[pending_index] = pending_data
+    return index, np.maximum(data - amounts[index], floor)
+
+def _sparse(index, values):
+    """只保留非零项的 {节点ID字符串: 值}"""
+    nonzero = np.flatnonzero(values)
+    return dict(zip(map(str, index[nonzero].tolist()), values[nonzero].tolist()))
+
+class SharedNodeState(NodeState):
+    """负载、信息素和被选次数保存在 StateStore 中的 NodeState"""
+    def __init__(self, num_nodes, store, namespace='route', max_staleness=0.05):
+        super().__init__(num_nodes)
+        self.store = store
+        self.keys = _keys(namespace)
+        self.max_staleness = max_staleness  # 秒；0 表示每次 sync 都访问存储
+        self.syncs = 0                      # 实际访问存储的次数
+        # 上次同步时的值；本地维护从它减去同样的量，因此 本地值 - 基准 只包含沉积
+        self._base = {name: getattr(self, name).copy() for name in ROUTE_FIELDS}
+        self._pending = {name: np.zeros(num_nodes) for name in MAINTAINED}  # 尚未提交的维护量
+        self._synced_at = None
+        self.sync(force=True)
+
+    def _record(self, name, before):
+        """本地维护后，把各节点实际减少的量从基准中扣除并记为待提交的维护量"""
+        removed = before - getattr(self, name)
+        self._base[name] -= removed
+        self._pending[name] += removed
+
+    def evaporate(self, rho, times=1, floor=PHEROMONE_FLOOR):
+        before = self.pheromone.copy()
+        super().evaporate(rho, times, floor)
+        self._record('pheromone', before)
+
+    def decay_load(self, mask, amount):
+        before = self.load.copy()
+        super().decay_load(mask, amount)
+        self._record('load', before)
+
+    def sync(self, force=False):
+        """提交本地增量与待处理维护量并读回共享状态；未过期且 force 为 False 时不访问存储
+
+        返回是否访问了存储。
+        """
+        now = time.monotonic()
+        if not force and self._synced_at is not None and now - self._synced_at < self.max_staleness:
+            return False
+
+        keys = self.keys
+        increments = {}
+        for name in ROUTE_FIELDS:
+            local, base = getattr(self, name), self._base[name]
+            changed = np.flatnonzero(local != base)
+            if changed.size:
+                increments[keys[name]] = _sparse(changed, (local[changed] - base[changed]).astype(np.float64))
+        for name, (pending_key, _) in MAINTAINED.items():
+            pending = self._pending[name]
+            if pending.any():
+                increments[keys[pending_key]] = _sparse(np.arange(len(self)), pending)
+                pending[:] = 0
+
+        remote = self.store.exchange(increments, [keys[name] for name in ROUTE_FIELDS] +
+                                     [keys[pending_key] for pending_key, _ in MAINTAINED.values()])
+        for name in ROUTE_FIELDS:
+            array = getattr(self, name)
+            if name in MAINTAINED:
+                pending_key, floor = MAINTAINED[name]
+                index, data = _maintained_view(remote[keys[name]], remote[keys[pending_key]],
+                                               floor, len(array))
+            else:
+                index, data = _indexed(remote[keys[name]], len(array))
+            array[index] = np.rint(data) if array.dtype.kind == 'i' else data
+            self._base[name] = array.copy()
+
+        self._synced_at = time.monotonic()
+        self.syncs += 1
+        return True
+
+class SharedNetworkLoads:
+    """把 SecureNetwork 各节点的 current_load 同步到 StateStore（与 SharedNodeState 相同的增量同步方式）
+
+    SecureNetwork 的负载只随寻路增加，在每次寻路前调用 sync() 即可；合并后的负载限制在
+    [0, max_capacity]，只对值真正变化的节点刷新缓存的边代价。
+    """
+    def __init__(self, network, store, namespace='route', max_staleness=0.05):
+        self.network = network
+        self.store = store
+        self.key = f"{namespace}:secure_load"
+        self.max_staleness = max_staleness
+        self.syncs = 0
+        self._base = {n: node.current_load for n, node in network.nodes.items()}
+        self._synced_at = None
+        self.sync(force=True)
+
+    def sync(self, force=False):
+        now = time.monotonic()
+        if not force and self._synced_at is not None and now - self._synced_at < self.max_staleness:
+            return False
+
+        nodes, base = self.network.nodes, self._base
+        deltas = {str(n): node.current_load - base.get(n, 0)
+                  for n, node in nodes.items() if node.current_load != base.get(n, 0)}
+        remote = self.store.exchange({self.key: deltas} if deltas else {}, [self.key])[self.key]
+
+        changed = []
+        for field, value in remote.items():
+            node = nodes.get(int(field))
+            if node is None:
+                continue
+            value = min(max(value, 0), node.max_capacity)
+            value = int(value) if float(value).is_integer() else value
+            if node.current_load != value:
+                node.current_load = value
+                changed.append(node.id)
+            base[node.id] = value
+        if changed:
+            self.network.refresh_loads(changed)
+
+        self._synced_at = time.monotonic()
+        self.syncs += 1
+        return True
+
+class Controller:
+    """集中控制器：管理一个命名空间下的共享状态，同一命名空间只应有一个控制器执行维护"""
+    def __init__(self, store, namespace='route'):
+        self.store = store
+        self.namespace = namespace
+        self.keys = _keys(namespace)
+        self.network_key = f"{namespace}:secure_load"
+        self._stop = None
+        self._thread = None
+
+    def initialize(self, num_nodes):
+        """清空并按 route.NodeState 的初始值写入 num_nodes 个节点的状态"""
+        self.store.delete(*self.keys.values())
+        fields = [str(i) for i in range(num_nodes)]
+        self.store.store({self.keys[name]: dict.fromkeys(fields, value)
+                          for name, value in ROUTE_FIELDS.items()})
+
+    def initialize_network(self, network):
+        """用 SecureNetwork 当前的负载初始化共享负载表"""
+        self.store.delete(self.network_key)
+        self.store.store({self.network_key: {str(n): node.current_load
+                                             for n, node in network.nodes.items()}})
+
+    def attach(self, num_nodes, max_staleness=0.05):
+        """返回绑定到本命名空间的 SharedNodeState，可直接作为 Simulator 的 state_factory"""
+        return SharedNodeState(num_nodes, self.store, self.namespace, max_staleness)
+
+    def attach_network(self, network, max_staleness=0.05):
+        """让 SecureNetwork 的负载与本命名空间同步，返回 SharedNetworkLoads"""
+        return SharedNetworkLoads(network, self.store, self.namespace, max_staleness)
+
+    def snapshot(self):
+        """读取当前共享状态（已扣除提交但尚未执行的维护量），返回 {字段名: ndarray}"""
+        names = list(ROUTE_FIELDS)
+        keys = self.keys
+        remote = self.store.fetch([keys[name] for name in names] +
+                                  [keys[pending_key] for pending_key, _ in MAINTAINED.values()])
+        size = max((len(remote[keys[name]]) for name in names), default=0)
+        result = {}
+        for name in names:
+            array = np.full(size, ROUTE_FIELDS[name])
+            if name in MAINTAINED:
+                pending_key, floor = MAINTAINED[name]
+                index, data = _maintained_view(remote[keys[name]], remote[keys[pending_key]], floor, size)
+            else:
+                index, data = _indexed(remote[keys[name]], size)
+            array[index] = data
+            result[name] = array
+        return result
+
+    def maintain(self):
+        """执行路由进程提交的待处理衰减和挥发，返回 {字段名: 执行了维护的节点数}
+
+        读取最新值、扣除维护量并清零待处理量在同一次 StateStore.update 中完成，期间其他进程
+        提交的沉积和维护量不会被覆盖（冲突时重新读取）。执行后 值 - 待处理量 与执行前完全相同
+        （包括浮点舍入），各路由进程读回的状态因此与维护的执行时机无关。
+        """
+        keys = self.keys
+
+        def apply(remote):
+            values = {}
+            maintained = {}
+            for name, (pending_key, floor) in MAINTAINED.items():
+                pending = {field: amount for field, amount in remote[keys[pending_key]].items() if amount}
+                maintained[name] = len(pending)
+                if not pending:
+                    continue
+                current = remote[keys[name]]
+                values[keys[name]] = {field: max(current[field] - amount, floor)
+                                      for field, amount in pending.items()
+                                      if current.get(field, floor) > floor}
+                values[keys[pending_key]] = dict.fromkeys(pending, 0.0)
+            return values, maintained
+
+        return self.store.update([keys[name] for name in MAINTAINED] +
+                                 [keys[pending_key] for pending_key, _ in MAINTAINED.values()], apply)
+
+    def start(self, interval=0.05):
+        """在后台线程中每 interval 秒执行一次 maintain()"""
+        if self._thread is not None:
+            return
+        self._stop = threading.Event()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.maintain()
+
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台维护，并执行最后一轮使共享状态与已提交的维护量一致"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.maintain()
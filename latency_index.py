@@ -0,0 +1,155 @@
+"""纯延迟距离索引：SecureNetwork 的边代价中只有负载项随时间变化，延迟项只取决于静态拓扑
+
+小图（节点数不超过 ALL_PAIRS_LIMIT）用 NumPy 向量化的 Floyd–Warshall 预计算全部节点对的
+延迟距离，得到精确距离，可直接回答纯延迟查询；大图选取若干地标（ALT），预计算各地标到
+所有节点的距离，由三角不等式得到任意两点延迟距离的下界：
+
+    d(v, t) >= max_L |d(L, t) - d(L, v)|
+
+两种表都可作为A*的启发函数（乘延迟权重后是可采纳且一致的下界）。地标距离用纯Python的
+Dijkstra计算，耗时较长，可交给 concurrent.futures 的进程池：地标分轮选取，每轮拆成
+parallelism 个任务并行计算；全对距离的 Floyd–Warshall 在 NumPy 内部运算，直接在调用线程中执行。
+节点均以编号（0..n-1）表示。
+
+    index = build_index(num_nodes, edge_src, edge_dst, edge_latency, executor=pool, parallelism=4)
+    index.lower_bounds(t)   # 各节点到 t 的延迟距离下界，不可达为 inf
+"""
+import heapq
+import multiprocessing
+
+import numpy as np
+
+ALL_PAIRS_LIMIT = 512  # 节点数不超过此值时预计算全对距离（Floyd–Warshall 为 O(n^3)）
+NUM_LANDMARKS = 16
+
+_POOL_WORKER = False  # 当前进程是否为索引进程池的worker
+
+def mark_pool_worker():
+    """索引进程池的 initializer：标记当前进程为池中的worker"""
+    global _POOL_WORKER
+    _POOL_WORKER = True
+
+def can_build_index():
+    """当前进程能否构建索引（并为此创建进程池）
+
+    索引进程池的worker（由 mark_pool_worker 标记）不构建；spawn 方式的子进程在导入主模块期间
+    （multiprocessing 此时设置了 _inheriting 标记）也不构建，否则在模块顶层构建索引的脚本会
+    递归产生进程。其他子进程（如 sweep、bench 的worker）照常构建。
+    """
+    return not (_POOL_WORKER or getattr(multiprocessing.current_process(), '_inheriting', False))
+
+def all_pairs_distances(num_nodes, edge_src, edge_dst, edge_latency):
+    """全对最短延迟距离矩阵（不可达为 inf）；每个中转节点 k 用一次向量化的 min-plus 更新整个矩阵"""
+    dist = np.full((num_nodes, num_nodes), np.inf)
+    np.minimum.at(dist, (edge_src, edge_dst), edge_latency)
+    np.fill_diagonal(dist, 0)
+    for k in range(num_nodes):
+        np.minimum(dist, dist[:, k, None] + dist[k], out=dist)
+    return dist
+
+def source_distances(num_nodes, edge_src, edge_dst, edge_latency, sources):
+    """从 sources 中各节点出发的最短延迟距离，形状 (len(sources), num_nodes)，不可达为 inf
+
+    模块级函数，可直接提交给进程池。
+    """
+    order = np.argsort(edge_src, kind='stable')
+    bounds = np.searchsorted(edge_src[order], np.arange(num_nodes + 1)).tolist()
+    targets = edge_dst[order].tolist()
+    latency = edge_latency[order].tolist()
+    adjacency = [list(zip(targets[bounds[i]:bounds[i + 1]], latency[bounds[i]:bounds[i + 1]]))
+                 for i in range(num_nodes)]
+
+    result = np.empty((len(sources), num_nodes))
+    for row, source in enumerate(sources):
+        dist = [float('inf')] * num_nodes
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, w in adjacency[u]:
+                nd = d + w
+                if nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        result[row] = dist
+    return result
+
+def select_landmarks(distances, count):
+    """在已有地标距离表 distances（地标数 x 节点数）的基础上再选最多 count 个地标
+
+    按最近的已有地标把节点分区，取各区中离该地标最远的节点，再按该距离从大到小取前 count 个，
+    新地标因而分散在图的不同外围；已有地标都不可达的节点（其他连通分量）距离为 inf，最先入选。
+    """
+    nearest = distances.argmin(axis=0)
+    reach = distances.min(axis=0)
+    order = np.lexsort((-reach, nearest))
+    heads = order[np.r_[True, nearest[order][1:] != nearest[order][:-1]]]
+    heads = heads[reach[heads] > 0]
+    return heads[np.argsort(-reach[heads], kind='stable')][:count]
+
+class LatencyIndex:
+    """预计算的延迟距离表
+
+    landmarks 为 None 时 distances 是 (n, n) 的全对距离，否则是 (地标数, n) 的地标距离。
+    """
+    def __init__(self, distances, landmarks=None):
+        self.distances = distances
+        self.landmarks = landmarks
+
+    @property
+    def exact(self):
+        """是否为精确的全对距离"""
+        return self.landmarks is None
+
+    def __len__(self):
+        return self.distances.shape[1]
+
+    def lower_bounds(self, target):
+        """各节点到 target 的延迟距离下界，与 target 不连通的节点为 inf"""
+        if self.exact:
+            return self.distances[target].copy()  # 无向图 d(v, t) = d(t, v)
+        with np.errstate(invalid='ignore'):
+            gap = np.abs(self.distances - self.distances[:, target, None])
+        gap[np.isnan(gap)] = 0  # 地标与两点都不连通（inf - inf）时不提供信息
+        return gap.max(axis=0)
+
+    def distance(self, source, target):
+        """精确的延迟距离（仅全对距离可用）"""
+        if not self.exact:
+            raise ValueError("地标索引只提供距离下界")
+        return self.distances[source, target].item()
+
+def _run(executor, parallelism, args, sources):
+    """把 sources 拆成最多 parallelism 个任务计算距离；没有进程池时直接计算"""
+    if executor is None:
+        return source_distances(*args, sources.tolist())
+    chunks = [chunk.tolist() for chunk in np.array_split(sources, min(parallelism, len(sources)))]
+    futures = [executor.submit(source_distances, *args, chunk) for chunk in chunks]
+    return np.vstack([future.result() for future in futures])
+
+def build_index(num_nodes, edge_src, edge_dst, edge_latency, executor=None, parallelism=1,
+                num_landmarks=NUM_LANDMARKS, all_pairs_limit=ALL_PAIRS_LIMIT, seed=0):
+    """构建延迟距离索引；edge_* 为按有向边排列的数组（两个方向各一条）
+
+    节点数不超过 all_pairs_limit 时返回全对距离，否则分轮选取 num_landmarks 个地标：
+    第一轮随机取 parallelism 个，之后每轮按 select_landmarks 取 parallelism 个，
+    每轮的地标距离在 executor 中并行计算。
+    """
+    if num_nodes <= all_pairs_limit:
+        return LatencyIndex(all_pairs_distances(num_nodes, edge_src, edge_dst, edge_latency))
+
+    args = (num_nodes, edge_src, edge_dst, edge_latency)
+    parallelism = max(1, parallelism)
+    num_landmarks = min(num_landmarks, num_nodes)
+    rng = np.random.default_rng(seed)
+    landmarks = rng.choice(num_nodes, size=min(parallelism, num_landmarks), replace=False)
+    distances = _run(executor, parallelism, args, landmarks)
+    while len(landmarks) < num_landmarks:
+        chosen = select_landmarks(distances, min(parallelism, num_landmarks - len(landmarks)))
+        if not len(chosen):
+            break
+        landmarks = np.concatenate([landmarks, chosen])
+        distances = np.vstack([distances, _run(executor, parallelism, args, chosen)])
+    return LatencyIndex(distances, landmarks)
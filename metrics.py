@@ -0,0 +1,236 @@
+"""路由引擎的性能指标：计数器与直方图，按 Prometheus 文本格式导出
+
+设置环境变量 ROUTE_METRICS=1 时启用（app.py 默认启用），是否启用在导入时确定：
+未启用时 timed() 装饰器原样返回被装饰的函数，timer() 返回共享的空上下文，
+find_path 也不会创建计数追踪器，热路径上没有任何额外开销。
+
+指标保存在进程内，多个 worker 进程各自导出自己的指标。
+
+    from metrics import REGISTRY
+    REGISTRY.render()   # Prometheus 文本格式
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+
+ENABLED = os.environ.get('ROUTE_METRICS', '').lower() in ('1', 'true', 'yes', 'on')
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # 秒
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536, 262144)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """单调递增计数器，可带标签"""
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+class Histogram:
+    """累积分桶直方图，可带标签"""
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # 标签值 -> [各桶计数..., +Inf桶计数, 总和]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0]
+            state[index] += 1
+            state[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, ('le', _number(bound)))} {cumulative}"
+            cumulative += state[len(self.buckets)]
+            yield f"{self.name}_bucket{_labels(self.labelnames, key, ('le', '+Inf'))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(state[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标 {name} 已注册为 {metric.kind}")
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self):
+        """Prometheus 文本格式（0.0.4）"""
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.begin, **self.labels)
+        return False
+
+def timer(histogram, **labels):
+    """with timer(h, phase='render'): ...  未启用时返回共享的空上下文"""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(histogram, labels)
+
+def timed(histogram, **labels):
+    """装饰器：启用时把每次调用的耗时记入直方图，未启用时原样返回函数"""
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            begin = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - begin, **labels)
+        return wrapper
+    return decorate
+
+# ---- SecureNetwork.find_path ----
+
+FIND_PATH_SECONDS = REGISTRY.histogram(
+    'route_find_path_seconds', "SecureNetwork.find_path 耗时", ('result',))
+FIND_PATH_SETTLED = REGISTRY.histogram(
+    'route_find_path_settled_nodes', "find_path 每次出堆确定的节点数", buckets=SIZE_BUCKETS)
+FIND_PATH_LENGTH = REGISTRY.histogram(
+    'route_find_path_length_hops', "find_path 找到的路径跳数", buckets=SIZE_BUCKETS)
+FIND_PATH_PUSHES = REGISTRY.counter('route_find_path_heap_pushes_total', "find_path 入堆次数")
+FIND_PATH_POPS = REGISTRY.counter('route_find_path_heap_pops_total', "find_path 出堆次数（含过期条目）")
+FIND_PATH_RELAXATIONS = REGISTRY.counter(
+    'route_find_path_relaxations_total', "find_path 成功松弛（代价变小）的边数")
+FIND_PATH_EDGES = REGISTRY.counter('route_find_path_edges_scanned_total', "find_path 扫描的邻接边数")
+
+class SearchCounter:
+    """find_path 的计数追踪器，接口与 new.StepTracer 相同；finish 时把本次搜索的统计写入指标"""
+    def __init__(self, adjacency):
+        self.adjacency = adjacency
+        self.records = []  # find_path 把它作为 step_records，计数时不记录单步
+
+    def begin(self, start):
+        self.settled = 0
+        self.relaxed = 0
+        self.scanned = 0
+        self.began = time.perf_counter()
+
+    def settle(self, node, cost):
+        self.settled += 1
+        self.scanned += len(self.adjacency[node])
+
+    def relax(self, node, cost):
+        self.relaxed += 1
+
+    def finish(self, path, remaining):
+        """path 为找到的路径（不可达时为 None），remaining 为结束时堆中剩余的条目数"""
+        elapsed = time.perf_counter() - self.began
+        scanned = self.scanned
+        if path is not None:
+            scanned -= len(self.adjacency[path[-1]])  # 终点出堆后直接返回，不扫描其邻居
+            FIND_PATH_LENGTH.observe(len(path) - 1)
+        pushes = self.relaxed + 1
+        FIND_PATH_SECONDS.observe(elapsed, result='found' if path is not None else 'unreachable')
+        FIND_PATH_SETTLED.observe(self.settled)
+        FIND_PATH_PUSHES.inc(pushes)
+        FIND_PATH_POPS.inc(pushes - remaining)
+        FIND_PATH_RELAXATIONS.inc(self.relaxed)
+        FIND_PATH_EDGES.inc(scanned)
+
+    def lookup(self, path):
+        """find_path 直接查延迟距离表得到结果、没有搜索过程时调用，只记录耗时和跳数"""
+        elapsed = time.perf_counter() - self.began
+        if path is not None:
+            FIND_PATH_LENGTH.observe(len(path) - 1)
+        FIND_PATH_SECONDS.observe(elapsed, result='lookup' if path is not None else 'unreachable')
+
+# ---- route.py 与 Flask 接口 ----
+
+DIJKSTRA_SECONDS = REGISTRY.histogram(
+    'route_dijkstra_seconds', "route.py 最短路径计算耗时", ('engine',))
+SELECT_NEXT_NODE_SECONDS = REGISTRY.histogram(
+    'route_select_next_node_seconds', "route.select_next_node 耗时")
+API_REQUEST_SECONDS = REGISTRY.histogram(
+    'route_api_request_seconds', "Flask 接口总耗时", ('endpoint', 'method', 'status'))
+API_PHASE_SECONDS = REGISTRY.histogram(
+    'route_api_phase_seconds', "Flask 接口各阶段耗时：routing 寻路、render 绘图与PNG编码、encode base64编码",
+    ('phase',))
+RENDER_CACHE = REGISTRY.counter('route_render_cache_total', "渲染结果缓存命中情况", ('result',))
@@ -1,30 +1,65 @@
+import functools
 import heapq
+import os
 import random
-import networkx as nx
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
-from tabulate import tabulate
+import threading
+from array import array
+from collections.abc import Mapping
+import numpy as np
 import platform
 
-plt.ion()
+import latency_index
+import metrics
+
+# networkx、matplotlib、tabulate 只在首次布局/绘图/打印表格时导入，只做寻路的进程不承担其导入开销
+
+DEFAULT_WEIGHTS = {'latency': 0.4, 'load': 0.4, 'security': 0.2}  # 默认路由权重
+
+# 各系统按顺序尝试的中文字体文件
+CHINESE_FONT_PATHS = {
+    'Windows': ['C:/Windows/Fonts/msyh.ttc',  # 微软雅黑
+                'C:/Windows/Fonts/simhei.ttf'],
+    'Darwin': ['/System/Library/Fonts/PingFang.ttc',  # 苹方字体
+               '/System/Library/Fonts/STHeiti Light.ttc'],
+    'Linux': ['/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf',
+              '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+              '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc'],
+}
+# 字体文件都不存在时，按字体族名在已安装字体中查找
+CHINESE_FONT_FAMILIES = ['Noto Sans CJK SC', 'WenQuanYi Micro Hei', 'Microsoft YaHei',
+                         'SimHei', 'PingFang SC', 'Droid Sans Fallback']
 
 # 设置中文字体
+@functools.lru_cache(maxsize=None)
 def setup_chinese_font():
-    system = platform.system()
-    if system == 'Windows':
-        font_path = 'C:/Windows/Fonts/msyh.ttc'  # 微软雅黑
-    elif system == 'Darwin':  # macOS
-        font_path = '/System/Library/Fonts/PingFang.ttc'  # 苹方字体
-    else:  # Linux
-        font_path = '/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf'
-    
-    # 设置中文字体
-    font_prop = fm.FontProperties(fname=font_path)
-    plt.rcParams['font.family'] = ['sans-serif']
-    plt.rcParams['font.sans-serif'] = [font_prop.get_name()]
-    plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
+    """加载中文字体并设置matplotlib全局参数，结果缓存，整个进程只查找一次
+
+    都找不到时退回matplotlib默认字体（中文会显示为方框，但不影响绘图）。
+    """
+    import matplotlib
+    import matplotlib.font_manager as fm
+
+    font_prop = None
+    for font_path in CHINESE_FONT_PATHS.get(platform.system(), CHINESE_FONT_PATHS['Linux']):
+        if os.path.exists(font_path):
+            font_prop = fm.FontProperties(fname=font_path)
+            break
+    if font_prop is None:
+        installed = {font.name for font in fm.fontManager.ttflist}
+        family = next((name for name in CHINESE_FONT_FAMILIES if name in installed), None)
+        font_prop = fm.FontProperties(family=family) if family else fm.FontProperties()
+
+    matplotlib.rcParams['font.family'] = ['sans-serif']
+    matplotlib.rcParams['font.sans-serif'] = [font_prop.get_name()]
+    matplotlib.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
     return font_prop
 
+def _pyplot():
+    """首次绘图时导入 pyplot 并开启交互模式"""
+    import matplotlib.pyplot as plt
+    plt.ion()
+    return plt
+
 class SecureNode:
     def __init__(self, node_id, capacity, security_level):
         self.id = node_id
@@ -36,35 +71,416 @@ class SecureNode:
     def load_ratio(self):
         return self.current_load / self.max_capacity
 
+class StepTracer:
+    """find_path 的可选单步追踪器
+
+    每次出堆只记录 (节点, 代价, [(被松弛的邻居, 新代价), ...]) 这样的增量，
+    需要完整快照时再用 snapshots() 回放重建。
+    """
+    def __init__(self):
+        self.start = None
+        self.records = []
+
+    def begin(self, start):
+        self.start = start
+        self.records = []
+
+    def settle(self, node, cost):
+        self.records.append((node, cost, []))
+
+    def relax(self, node, cost):
+        self.records[-1][2].append((node, cost))
+
+    def finish(self, path, remaining):
+        pass
+
+    def snapshots(self, nodes):
+        """回放增量记录，按旧格式逐步生成 current/candidates/visited/costs/path 快照"""
+        costs = {n: float('inf') for n in nodes}
+        costs[self.start] = 0
+        previous = {self.start: None}
+        visited = []
+        heap = [(0, self.start)]
+        for node, cost, relaxed in self.records:
+            while heap and heapq.heappop(heap) != (cost, node):
+                pass
+            path = []
+            u = node
+            while u is not None:
+                path.append(u)
+                u = previous[u]
+            path.reverse()
+            yield {
+                'current': node,
+                'candidates': list(heap),
+                'visited': list(visited),
+                'costs': dict(costs),
+                'path': path
+            }
+            visited.append(node)
+            for v, new_cost in relaxed:
+                costs[v] = new_cost
+                previous[v] = node
+                heapq.heappush(heap, (new_cost, v))
+
+def _number(value):
+    """数组中的浮点数在整数值时还原为 int，保持与原始属性相同的显示和JSON格式"""
+    return int(value) if value.is_integer() else value
+
+class CompactGraph:
+    """无向图的紧凑存储：邻接表和边属性集中在一处，每条无向边只存一份属性
+
+    无向边 k 的属性存放在按边编号排列的定长数组中；邻接表 u -> [(v, 有向边编号), ...]
+    直接供 Dijkstra 遍历，有向边 2k 为 u->v，2k+1 为 v->u。
+    """
+    __slots__ = ('_index', '_ids', '_adjacency', '_src', '_dst', '_latency', '_bandwidth', '_security')
+
+    def __init__(self):
+        self._index = {}              # 节点ID -> 节点编号
+        self._ids = []                # 节点编号 -> 节点ID
+        self._adjacency = {}          # 节点ID -> [(邻居ID, 有向边编号), ...]
+        self._src = array('q')        # 无向边的两个端点编号
+        self._dst = array('q')
+        self._latency = array('d')
+        self._bandwidth = array('d')
+        self._security = array('b')
+
+    def add_node(self, node_id):
+        if node_id not in self._index:
+            self._index[node_id] = len(self._ids)
+            self._ids.append(node_id)
+            self._adjacency[node_id] = []
+
+    def add_nodes_from(self, node_ids):
+        for node_id in node_ids:
+            self.add_node(node_id)
+
+    def add_edge(self, u, v, latency, bandwidth, security):
+        """添加边或更新已有边的属性，返回无向边编号"""
+        k = self._edge_id(u, v)
+        if k >= 0:
+            self._latency[k] = latency
+            self._bandwidth[k] = bandwidth
+            self._security[k] = security
+            return k
+        k = len(self._src)
+        self._latency.append(latency)
+        self._bandwidth.append(bandwidth)
+        self._security.append(security)
+        iu, iv = self._index[u], self._index[v]
+        self._src.append(iu)
+        self._dst.append(iv)
+        # 邻接表中使用节点表里的ID对象，避免每条边各持有一份
+        self._adjacency[u].append((self._ids[iv], 2 * k))
+        self._adjacency[v].append((self._ids[iu], 2 * k + 1))
+        return k
+
+    def extend_edges(self, src, dst, latency, bandwidth, security):
+        """批量追加新边：参数为按边排列的数组，端点为节点编号；调用方保证这些边彼此不重复且图中尚不存在
+
+        数组直接按字节拷入存储，邻接表按节点分组后整段追加，结果与逐条 add_edge 相同（包括邻接表顺序）。
+        """
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        first = len(self._src)
+        self._src.frombytes(src.tobytes())
+        self._dst.frombytes(dst.tobytes())
+        self._latency.frombytes(np.asarray(latency, dtype=np.float64).tobytes())
+        self._bandwidth.frombytes(np.asarray(bandwidth, dtype=np.float64).tobytes())
+        self._security.frombytes(np.asarray(security, dtype=np.int8).tobytes())
+
+        # 有向边 2k 属于 src[k]、2k+1 属于 dst[k]；按所属节点稳定排序，组内保持边编号递增的添加顺序
+        owners = np.empty(2 * len(src), dtype=np.int64)
+        others = np.empty(2 * len(src), dtype=np.int64)
+        owners[0::2], owners[1::2] = src, dst
+        others[0::2], others[1::2] = dst, src
+        order = np.argsort(owners, kind='stable')
+        owners = owners[order]
+        eids = (order + 2 * first).tolist()
+        ids = self._ids
+        other_ids = [ids[i] for i in others[order].tolist()]
+        entries = list(zip(other_ids, eids))
+        groups, starts = np.unique(owners, return_index=True)
+        ends = np.append(starts[1:], len(owners))
+        adjacency = self._adjacency
+        for i, begin, end in zip(groups.tolist(), starts.tolist(), ends.tolist()):
+            adjacency[ids[i]].extend(entries[begin:end])
+
+    def _edge_id(self, u, v):
+        """无向边编号，不存在时返回 -1（扫描度数较小一端的邻接表）"""
+        adjacency_u, adjacency_v = self._adjacency.get(u), self._adjacency.get(v)
+        if adjacency_u is None or adjacency_v is None:
+            return -1
+        if len(adjacency_v) < len(adjacency_u):
+            adjacency_u, v = adjacency_v, u
+        for w, eid in adjacency_u:
+            if w == v:
+                return eid // 2
+        return -1
+
+    def has_node(self, node_id):
+        return node_id in self._index
+
+    def has_edge(self, u, v):
+        return self._edge_id(u, v) >= 0
+
+    def neighbors(self, u):
+        return [v for v, _ in self._adjacency[u]]
+
+    @property
+    def nodes(self):
+        return self._ids
+
+    @property
+    def adjacency(self):
+        return self._adjacency
+
+    @property
+    def index(self):
+        return self._index
+
+    def number_of_nodes(self):
+        return len(self._ids)
+
+    def number_of_edges(self):
+        return len(self._src)
+
+    def edges(self):
+        """按添加顺序返回 (u, v) 列表"""
+        ids = self._ids
+        return [(ids[iu], ids[iv]) for iu, iv in zip(self._src, self._dst)]
+
+    def edge_attrs(self, k):
+        return {
+            'latency': _number(self._latency[k]),
+            'bandwidth': _number(self._bandwidth[k]),
+            'security': self._security[k]
+        }
+
+    def directed_arrays(self):
+        """按有向边编号排列的 (起点编号, 终点编号, 延迟, 安全等级) NumPy数组（副本）"""
+        src = np.array(self._src, dtype=np.int64)
+        dst = np.array(self._dst, dtype=np.int64)
+        edge_src = np.empty(2 * len(src), dtype=np.int64)
+        edge_dst = np.empty(2 * len(src), dtype=np.int64)
+        edge_src[0::2], edge_src[1::2] = src, dst
+        edge_dst[0::2], edge_dst[1::2] = dst, src
+        latency = np.repeat(np.array(self._latency, dtype=np.float64), 2)
+        security = np.repeat(np.array(self._security, dtype=np.int64), 2)
+        return edge_src, edge_dst, latency, security
+
+    def to_networkx(self):
+        import networkx as nx
+        graph = nx.Graph()
+        graph.add_nodes_from(self._ids)
+        graph.add_edges_from(self.edges())
+        return graph
+
+class EdgePropsView(Mapping):
+    """以 (u, v) 为键的只读边属性映射，两个方向的键都可访问，兼容原来的 edge_props 字典"""
+    __slots__ = ('_graph',)
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __getitem__(self, key):
+        u, v = key
+        k = self._graph._edge_id(u, v)
+        if k < 0:
+            raise KeyError(key)
+        return self._graph.edge_attrs(k)
+
+    def __contains__(self, key):
+        u, v = key
+        return self._graph.has_edge(u, v)
+
+    def __iter__(self):
+        for u, v in self._graph.edges():
+            yield (u, v)
+            yield (v, u)
+
+    def __len__(self):
+        return 2 * self._graph.number_of_edges()
+
+    def items(self):
+        graph = self._graph
+        for k, (u, v) in enumerate(graph.edges()):
+            props = graph.edge_attrs(k)
+            yield (u, v), props
+            yield (v, u), props
+
 class SecureNetwork:
+    EDGE_COST_CACHE_SIZE = 8  # 最多缓存多少组权重对应的边代价向量
+    PATH_CACHE_SIZE = 1024    # 最多缓存多少组 (起点, 终点, 权重, k) 的候选路径
+    INDEX_BOUND_CACHE_SIZE = 16  # 最多缓存多少个终点的索引下界表
+
     def __init__(self):
-        self.graph = nx.Graph()
+        self.graph = CompactGraph()  # 寻路用的邻接表与边属性
         self.nodes = {}
-        self.edge_props = {}
         self.step_records = []
+        self._arrays_dirty = True  # 拓扑变化后需要重建下面的数组
+        self._edge_costs = {}      # 权重元组 -> (代价ndarray, 代价list)
+        self._path_cache = {}      # (起点, 终点, 延迟权重, 安全权重, k) -> k条候选路径
+        self._latency_index = None  # (拓扑版本, LatencyIndex)，由 build_latency_index 构建
+        self._index_bounds = {}     # 终点 -> 索引给出的纯延迟距离下界，供 find_path 的A*使用
+        self.topology_version = 0  # 每次增删节点/边时递增
+        self.load_version = 0      # 每次负载变化时递增
+        self._listeners = []       # 变更回调 callback(event, payload)
+        self._nx_graph = None  # (拓扑版本, networkx图)，只在布局和绘图时构建
         self.pos = None  # 保存节点位置
-        self.font_prop = setup_chinese_font()
+        self.layout_seed = None  # 布局随机种子，多进程共享拓扑时保证各进程坐标一致
         
+    @property
+    def edge_props(self):
+        """(u, v) -> {'latency', 'bandwidth', 'security'} 的只读视图，两个方向都可访问"""
+        return EdgePropsView(self.graph)
+
+    def nx_graph(self):
+        """供布局和绘图使用的 networkx 图，按拓扑版本缓存"""
+        if self._nx_graph is None or self._nx_graph[0] != self.topology_version:
+            self._nx_graph = (self.topology_version, self.graph.to_networkx())
+        return self._nx_graph[1]
+
+    @property
+    def font_prop(self):
+        """中文字体，首次绘图时才加载"""
+        return setup_chinese_font()
+
     def add_node(self, node):
         self.nodes[node.id] = node
         self.graph.add_node(node.id)
+        self._topology_changed()
         
     def add_edge(self, u, v, latency, bandwidth):
         security = min(self.nodes[u].security_level, self.nodes[v].security_level)
-        self.graph.add_edge(u, v)
-        self.edge_props[(u, v)] = {
-            'latency': latency,
-            'bandwidth': bandwidth,
-            'security': security
-        }
-        self.edge_props[(v, u)] = self.edge_props[(u, v)]  # 双向连接
+        self.graph.add_edge(u, v, latency, bandwidth, security)  # 双向连接
+        self._topology_changed()
+        self._notify('edge', (u, v))
+
+    def add_nodes(self, nodes):
+        """批量添加节点，只触发一次拓扑变更"""
+        nodes = list(nodes)
+        for node in nodes:
+            self.nodes[node.id] = node
+        self.graph.add_nodes_from(node.id for node in nodes)
+        self._topology_changed()
+
+    def add_edges(self, edges):
+        """批量添加边，edges 为 (u, v, latency, bandwidth) 序列，只触发一次拓扑变更"""
+        edges = list(edges)
+        nodes = self.nodes
+        add_edge = self.graph.add_edge
+        for u, v, latency, bandwidth in edges:
+            add_edge(u, v, latency, bandwidth,
+                     min(nodes[u].security_level, nodes[v].security_level))
+        self._topology_changed()
+        if self._listeners:
+            for u, v, _, _ in edges:
+                self._notify('edge', (u, v))
+
+    def add_edge_arrays(self, u, v, latency, bandwidth):
+        """从数组批量添加新边（u、v 为节点ID），只触发一次拓扑变更
+
+        与 add_edges 结果相同，但不逐条检查重复：调用方保证这些边彼此不重复且网络中尚不存在，
+        如从快照加载时。
+        """
+        index = self.graph.index
+        u, v = np.asarray(u), np.asarray(v)
+        if self.graph.nodes == list(range(len(index))):
+            iu, iv = u.astype(np.int64), v.astype(np.int64)  # 节点ID即节点编号
+        else:
+            iu = np.fromiter((index[n] for n in u.tolist()), dtype=np.int64, count=len(u))
+            iv = np.fromiter((index[n] for n in v.tolist()), dtype=np.int64, count=len(v))
+        levels = np.array([self.nodes[n].security_level for n in self.graph.nodes], dtype=np.int64)
+        self.graph.extend_edges(iu, iv, latency, bandwidth, np.minimum(levels[iu], levels[iv]))
+        self._topology_changed()
+        if self._listeners:
+            for edge in zip(u.tolist(), v.tolist()):
+                self._notify('edge', edge)
+
+    def add_listener(self, callback):
+        """注册变更回调：负载变化时 callback('loads', 节点ID列表)，加边时 callback('edge', (u, v))"""
+        self._listeners.append(callback)
+
+    def _notify(self, event, payload):
+        for callback in self._listeners:
+            callback(event, payload)
+
+    def _topology_changed(self):
+        self.topology_version += 1
+        self._edge_costs.clear()
+        self._path_cache.clear()
+        self._latency_index = None
+        self._index_bounds = {}
+        self._arrays_dirty = True
+
+    def _ensure_arrays(self):
+        """按有向边编号把延迟、安全等级，按节点编号把负载率整理成连续数组"""
+        if not self._arrays_dirty:
+            return
+        self._node_index = self.graph.index
+        self._dense_ids = self.graph.nodes == list(range(len(self.nodes)))  # 节点ID即节点编号
+        self._adjacency = self.graph.adjacency  # u -> [(v, 有向边编号), ...]
+        (self._edge_src, self._edge_dst,
+         self._edge_latency, self._edge_security) = self.graph.directed_arrays()
+        # 以节点为终点的入边编号，负载变化时只需刷新这些边
+        order = np.argsort(self._edge_dst, kind='stable')
+        bounds = np.searchsorted(self._edge_dst[order], np.arange(len(self.nodes) + 1))
+        self._in_edges = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.nodes))]
+        self._current_load = np.array([n.current_load for n in self.nodes.values()])
+        self._max_capacity = np.array([n.max_capacity for n in self.nodes.values()])
+        self._load_ratio = self._current_load / self._max_capacity
+        self._edge_costs.clear()
+        self._arrays_dirty = False
+
+    def edge_costs(self, weights):
+        """返回按有向边编号排列的代价向量（与 path_cost 逐边计算结果一致），按权重缓存"""
+        self._ensure_arrays()
+        key = (weights['latency'], weights['load'], weights['security'])
+        cached = self._edge_costs.get(key)
+        if cached is None:
+            costs = (self._edge_latency * weights['latency'] +
+                     (self._load_ratio[self._edge_dst] ** 2) * 100 * weights['load'] +
+                     (4 - self._edge_security) * 10 * weights['security'])
+            if len(self._edge_costs) >= self.EDGE_COST_CACHE_SIZE:
+                del self._edge_costs[next(iter(self._edge_costs))]
+            cached = self._edge_costs[key] = (costs, costs.tolist())
+        return cached
+
+    def _loads_changed(self, node_ids):
+        """刷新负载率数组，并只重算以这些节点为终点的边的缓存代价"""
+        self.load_version += 1
+        if self._listeners:
+            self._notify('loads', node_ids)
+        if self._arrays_dirty or not node_ids:
+            return
+        idx = np.array([self._node_index[n] for n in node_ids], dtype=np.int64)
+        self._current_load[idx] = [self.nodes[n].current_load for n in node_ids]
+        self._load_ratio[idx] = self._current_load[idx] / self._max_capacity[idx]
+        if not self._edge_costs:
+            return
+        eids = np.concatenate([self._in_edges[i] for i in idx])
+        load_term = (self._load_ratio[self._edge_dst[eids]] ** 2) * 100
+        static_latency = self._edge_latency[eids]
+        static_security = (4 - self._edge_security[eids]) * 10
+        for (w_latency, w_load, w_security), (costs, cost_list) in self._edge_costs.items():
+            fresh = static_latency * w_latency + load_term * w_load + static_security * w_security
+            costs[eids] = fresh
+            for eid, cost in zip(eids.tolist(), fresh.tolist()):
+                cost_list[eid] = cost
+
+    def refresh_loads(self, node_ids=None):
+        """直接修改了 SecureNode.current_load 后调用，使缓存的负载与代价重新同步；可只指定变化的节点"""
+        self._loads_changed(list(self.nodes) if node_ids is None else list(node_ids))
         
-    def update_load(self, path):
+    def update_load(self, path, requests=1):
+        """路径上每个节点按每个请求 +3 增加负载，不超过容量"""
         for node_id in path:
             self.nodes[node_id].current_load = min(
-                self.nodes[node_id].current_load + 3,
+                self.nodes[node_id].current_load + 3 * requests,
                 self.nodes[node_id].max_capacity
             )
+        self._loads_changed(path)
             
     def path_cost(self, u, v, weights):
         edge = self.edge_props[(u, v)]
@@ -73,51 +489,469 @@ class SecureNetwork:
         (node.load_ratio ** 2) * 100 * weights['load'] + 
         (4 - edge['security']) * 10 * weights['security'])
     
-    def find_path(self, start, end, weights):
-        self.step_records = []
-        heap = [(0, start, [])]
-        costs = {n: float('inf') for n in self.graph.nodes}
-        costs[start] = 0
-        visited = {}
+    def find_path(self, start, end, weights, trace=False, tracer=None):
+        """加权Dijkstra寻路；trace=True 或传入 tracer 时记录单步过程到 step_records
+
+        已构建延迟距离索引（build_latency_index）且不记录单步过程时改用A*，以索引给出的
+        延迟距离下界乘延迟权重作为启发函数，结果代价不变；负载权重和安全权重都为0、
+        且索引是全对距离时，直接沿距离表回溯出路径，不再搜索。
+        启用指标（metrics.ENABLED）且未传入 tracer 时，用计数追踪器统计本次搜索。
+        起点或终点不存在时与不可达相同，返回 (None, inf)。
+        """
+        edge_costs = self.edge_costs(weights)[1]
+        adjacency = self._adjacency
+        index = None
+        if not trace and tracer is None and weights['latency'] > 0:
+            index = self.latency_index
+        if trace and tracer is None:
+            tracer = StepTracer()
+        elif tracer is None and metrics.ENABLED:
+            tracer = metrics.SearchCounter(adjacency)
+        if tracer is not None:
+            tracer.begin(start)
+            self.step_records = tracer.records
+        else:
+            self.step_records = []
+        if start not in self.nodes or end not in self.nodes:
+            if tracer is not None:
+                tracer.finish(None, 0)
+            return None, float('inf')
+        if index is not None:
+            if index.exact and weights['load'] == 0 and weights['security'] == 0:
+                found = self._lookup_path(start, end, edge_costs, index)
+                if found is not None:
+                    if tracer is not None:
+                        tracer.lookup(found[0])
+                    return found
+            return self._find_path_indexed(start, end, edge_costs, weights['latency'], tracer)
+        heap = [(0, start)]
+        costs = {start: 0}
+        previous = {start: None}
+        visited = set()
         
         while heap:
-            current_cost, u, path = heapq.heappop(heap)
+            current_cost, u = heapq.heappop(heap)
             
             if u in visited:
                 continue
                 
-            new_path = path + [u]
-            self._record_step(u, heap, visited.copy(), costs.copy(), new_path)
+            if tracer is not None:
+                tracer.settle(u, current_cost)
             
             if u == end:
-                self.update_load(new_path)
-                return new_path, current_cost
+                path = self._build_path(previous, end)
+                self.update_load(path)
+                if tracer is not None:
+                    tracer.finish(path, len(heap))
+                return path, current_cost
                 
-            visited[u] = True
+            visited.add(u)
             
-            for v in self.graph.neighbors(u):
+            for v, eid in adjacency[u]:
                 if v in visited:
                     continue
                     
-                edge_cost = self.path_cost(u, v, weights)
-                new_cost = current_cost + edge_cost
+                new_cost = current_cost + edge_costs[eid]
                 
-                if new_cost < costs[v]:
+                if new_cost < costs.get(v, float('inf')):
                     costs[v] = new_cost
-                    heapq.heappush(heap, (new_cost, v, new_path))
+                    previous[v] = u
+                    heapq.heappush(heap, (new_cost, v))
+                    if tracer is not None:
+                        tracer.relax(v, new_cost)
                     
+        if tracer is not None:
+            tracer.finish(None, 0)
         return None, float('inf')
-    
-    def _record_step(self, current_node, heap, visited, costs, path):
-        record = {
-            'current': current_node,
-            'candidates': [(cost, n, p) for cost, n, p in heap],
-            'visited': list(visited.keys()),
-            'costs': costs.copy(),
-            'path': path.copy()
-        }
-        self.step_records.append(record)
+
+    def find_paths_from(self, start, ends, weights):
+        """单源多目的寻路：一次Dijkstra同时得到到所有 ends 的路径
+
+        所有路径都基于调用时的负载计算，然后按 ends 的顺序依次 update_load。
+        返回与 ends 一一对应的 (路径, 代价) 列表，不可达时为 (None, inf)；
+        与 find_path 相同，起点或终点不存在时视为不可达。
+        """
+        if start not in self.nodes:
+            return [(None, float('inf')) for _ in ends]
+        edge_costs = self.edge_costs(weights)[1]
+        adjacency = self._adjacency
+        remaining = set(ends)
+        heap = [(0, start)]
+        costs = {start: 0}
+        previous = {start: None}
+        settled = {}
+
+        while heap and remaining:
+            current_cost, u = heapq.heappop(heap)
+
+            if u in settled:
+                continue
+
+            settled[u] = current_cost
+            remaining.discard(u)
+
+            for v, eid in adjacency[u]:
+                if v in settled:
+                    continue
+
+                new_cost = current_cost + edge_costs[eid]
+
+                if new_cost < costs.get(v, float('inf')):
+                    costs[v] = new_cost
+                    previous[v] = u
+                    heapq.heappush(heap, (new_cost, v))
+
+        results = []
+        for end in ends:
+            if end in settled:
+                path = self._build_path(previous, end)
+                self.update_load(path)
+                results.append((path, settled[end]))
+            else:
+                results.append((None, float('inf')))
+        return results
+
+    def find_path_astar(self, start, end, weights):
+        """A*寻路：以到终点的纯延迟距离下界乘延迟权重作为启发函数
+
+        下界取自预计算的延迟距离索引（build_latency_index）。负载项和安全项恒为非负，
+        因此该下界是可采纳且一致的，结果代价与 find_path 相同，但出堆的节点更少。
+        尚未构建索引或延迟权重不为正时没有廉价的下界，直接按 find_path 执行Dijkstra。
+        """
+        if start not in self.nodes or end not in self.nodes:
+            return None, float('inf')
+        if self.latency_index is None or weights['latency'] <= 0:
+            return self.find_path(start, end, weights)
+        edge_costs = self.edge_costs(weights)[1]
+        return self._find_path_indexed(start, end, edge_costs, weights['latency'], None)
+
+    def _shortest_path(self, start, end, edge_costs, banned_nodes=(), banned_edges=()):
+        """去掉 banned_nodes 和 banned_edges（有向边编号）后的Dijkstra，不修改负载
+
+        返回 (代价, 节点列表, 有向边编号列表)，不可达时返回 None。
+        """
+        adjacency = self._adjacency
+        heap = [(0, start)]
+        costs = {start: 0}
+        previous = {start: None}  # 节点 -> (前驱节点, 有向边编号)
+        visited = set()
+
+        while heap:
+            current_cost, u = heapq.heappop(heap)
+
+            if u in visited:
+                continue
+
+            if u == end:
+                nodes, eids = [end], []
+                while previous[u] is not None:
+                    u, eid = previous[u]
+                    nodes.append(u)
+                    eids.append(eid)
+                nodes.reverse()
+                eids.reverse()
+                return current_cost, nodes, eids
+
+            visited.add(u)
+
+            for v, eid in adjacency[u]:
+                if v in visited or v in banned_nodes or eid in banned_edges:
+                    continue
+
+                new_cost = current_cost + edge_costs[eid]
+
+                if new_cost < costs.get(v, float('inf')):
+                    costs[v] = new_cost
+                    previous[v] = (u, eid)
+                    heapq.heappush(heap, (new_cost, v))
+
+        return None
+
+    def k_shortest_paths(self, start, end, weights, k=3):
+        """Yen算法求 start 到 end 的 k 条无环最短路径，不修改负载
+
+        搜索只使用与负载无关的边代价（延迟项和安全项），候选集合因此不随负载变化，
+        按 (起点, 终点, 延迟权重, 安全权重, k) 缓存，只在拓扑变化时失效。
+        返回 [(节点列表, 有向边编号列表), ...]，按静态代价升序，不可达时为空列表。
+        """
+        self._ensure_arrays()
+        key = (start, end, weights['latency'], weights['security'], k)
+        cached = self._path_cache.get(key)
+        if cached is not None:
+            return cached
+
+        static_costs = (self._edge_latency * weights['latency'] +
+                        (4 - self._edge_security) * 10 * weights['security']).tolist()
+        first = self._shortest_path(start, end, static_costs)
+        paths = [first] if first is not None else []
+        candidates = []
+        seen = {tuple(first[1])} if first is not None else set()
+
+        while paths and len(paths) < k:
+            _, last_nodes, last_eids = paths[-1]
+            for i in range(len(last_nodes) - 1):
+                root_nodes = last_nodes[:i + 1]
+                root_eids = last_eids[:i]
+                # 去掉与已选路径共享同一前缀时用过的下一条边，以及前缀上的节点
+                banned_edges = {eids[i] for _, nodes, eids in paths if nodes[:i + 1] == root_nodes}
+                spur = self._shortest_path(root_nodes[-1], end, static_costs,
+                                           set(root_nodes[:-1]), banned_edges)
+                if spur is None:
+                    continue
+                spur_cost, spur_nodes, spur_eids = spur
+                nodes = root_nodes[:-1] + spur_nodes
+                if tuple(nodes) in seen:
+                    continue
+                seen.add(tuple(nodes))
+                root_cost = 0
+                for eid in root_eids:
+                    root_cost += static_costs[eid]
+                heapq.heappush(candidates, (root_cost + spur_cost, nodes, root_eids + spur_eids))
+            if not candidates:
+                break
+            paths.append(heapq.heappop(candidates))
+
+        result = [(nodes, eids) for _, nodes, eids in paths]
+        if len(self._path_cache) >= self.PATH_CACHE_SIZE:
+            del self._path_cache[next(iter(self._path_cache))]
+        self._path_cache[key] = result
+        return result
+
+    def rank_paths(self, start, end, weights, k=3):
+        """按当前负载下的代价对缓存的 k 条候选路径重新排序，返回 [(路径, 代价), ...]，不修改负载
+
+        候选路径命中缓存时只需对每条路径的边代价求和，不再搜索。
+        """
+        candidates = self.k_shortest_paths(start, end, weights, k)
+        edge_costs = self.edge_costs(weights)[1]
+        ranked = []
+        for nodes, eids in candidates:
+            cost = 0
+            for eid in eids:
+                cost += edge_costs[eid]
+            ranked.append((list(nodes), cost))
+        ranked.sort(key=lambda item: item[1])
+        return ranked
+
+    def find_multipath(self, start, end, weights, k=3, requests=1):
+        """把 requests 个请求按剩余容量比例分到 k 条候选路径上，并按分到的请求数更新负载
+
+        路径的剩余容量取中间节点 max_capacity - current_load 的最小值（起点终点为各路径共有，
+        直连路径则取两端）。份额按最大余数法取整，余数相同时优先当前代价低的路径；
+        所有路径都已满载时全部分给代价最低的路径。
+        返回 [(路径, 代价, 请求数), ...]，只包含分到请求的路径，按代价升序；不可达时为空列表。
+        """
+        ranked = self.rank_paths(start, end, weights, k)
+        if not ranked:
+            return []
+        nodes = self.nodes
+        headroom = [max(min(nodes[n].max_capacity - nodes[n].current_load for n in path[1:-1] or path), 0)
+                    for path, _ in ranked]
+        total = sum(headroom)
+        if total <= 0:
+            shares = [requests] + [0] * (len(ranked) - 1)
+        else:
+            exact = [requests * h / total for h in headroom]
+            shares = [int(x) for x in exact]
+            by_remainder = sorted(range(len(ranked)), key=lambda i: exact[i] - shares[i], reverse=True)
+            for i in by_remainder[:requests - sum(shares)]:
+                shares[i] += 1
+
+        result = []
+        for (path, cost), count in zip(ranked, shares):
+            if count:
+                self.update_load(path, count)
+                result.append((path, cost, count))
+        return result
+
+    @property
+    def latency_index(self):
+        """与当前拓扑一致的延迟距离索引（LatencyIndex），尚未构建或拓扑已变化时为 None"""
+        entry = self._latency_index
+        if entry is None or entry[0] != self.topology_version:
+            return None
+        return entry[1]
+
+    def build_latency_index(self, executor=None, parallelism=1, background=False):
+        """预计算纯延迟距离索引，供 find_path 作A*启发函数和零负载权重时直接查表
+
+        小图为全对距离，大图为地标距离表（见 latency_index.build_index），地标距离在
+        executor（concurrent.futures 进程池）中按 parallelism 个任务并行计算。
+        background=True 时在后台线程中构建并返回该线程，构建期间寻路照常进行；
+        构建完成前拓扑已变化时结果作废。否则返回构建好的索引。
+        在索引进程池的worker中和 spawn 子进程导入主模块期间（latency_index.can_build_index()
+        为 False）不构建，返回 None。
+        """
+        if not latency_index.can_build_index():
+            return None
+        self._ensure_arrays()
+        version = self.topology_version
+        args = (len(self.nodes), self._edge_src, self._edge_dst, self._edge_latency)
+
+        def build():
+            index = latency_index.build_index(*args, executor=executor, parallelism=parallelism)
+            if self.topology_version == version:  # 构建期间拓扑已变化（或更新的构建已开始）时丢弃
+                self._index_bounds = {}
+                self._latency_index = (version, index)
+            return index
+
+        if not background:
+            return build()
+        thread = threading.Thread(target=build, daemon=True)
+        thread.start()
+        return thread
+
+    def _index_bound(self, target):
+        """索引给出的各节点到 target 的延迟距离下界（与 target 不连通为 inf），可按节点ID下标访问"""
+        bounds = self._index_bounds
+        bound = bounds.get(target)
+        if bound is None:
+            bound = self.latency_index.lower_bounds(self._node_index[target]).tolist()
+            if not self._dense_ids:
+                bound = dict(zip(self.graph.nodes, bound))
+            if len(bounds) >= self.INDEX_BOUND_CACHE_SIZE:
+                del bounds[next(iter(bounds))]
+            bounds[target] = bound
+        return bound
+
+    def _find_path_indexed(self, start, end, edge_costs, w_latency, tracer):
+        """find_path 与 find_path_astar 共用的A*，下界取自预计算的延迟距离索引"""
+        bound = self._index_bound(end)
+        adjacency = self._adjacency
+        inf = float('inf')
+        if bound[start] == inf:
+            if tracer is not None:
+                tracer.finish(None, 0)
+            return None, inf
+        heap = [(bound[start] * w_latency, 0, start)]
+        costs = {start: 0}
+        previous = {start: None}
+        visited = set()
+
+        while heap:
+            _, current_cost, u = heapq.heappop(heap)
+
+            if u in visited:
+                continue
+
+            if tracer is not None:
+                tracer.settle(u, current_cost)
+
+            if u == end:
+                path = self._build_path(previous, end)
+                self.update_load(path)
+                if tracer is not None:
+                    tracer.finish(path, len(heap))
+                return path, current_cost
+
+            visited.add(u)
+
+            for v, eid in adjacency[u]:
+                if v in visited:
+                    continue
+
+                new_cost = current_cost + edge_costs[eid]
+
+                if new_cost < costs.get(v, inf):
+                    costs[v] = new_cost
+                    previous[v] = u
+                    heapq.heappush(heap, (new_cost + bound[v] * w_latency, new_cost, v))
+                    if tracer is not None:
+                        tracer.relax(v, new_cost)
+
+        if tracer is not None:
+            tracer.finish(None, 0)
+        return None, inf
+
+    def _lookup_path(self, start, end, edge_costs, index):
+        """纯延迟权重下直接沿全对距离表从终点回溯到起点，不搜索
+
+        每一步在邻居中选距起点更近、且距离加边延迟最接近当前节点距离的一个作为前驱。
+        返回 (路径, 代价) 并更新负载；不可达时为 (None, inf)；遇到零延迟边无法回溯时返回 None。
+        """
+        node_index = self._node_index
+        dist = index.distances[node_index[start]].tolist()
+        latency = self._edge_latency
+        if dist[node_index[end]] == float('inf'):
+            return None, float('inf')
+        path = [end]
+        eids = []
+        u = end
+        while u != start:
+            remaining = dist[node_index[u]]
+            best, best_eid, best_gap = None, -1, float('inf')
+            for v, eid in self._adjacency[u]:
+                d = dist[node_index[v]]
+                if d < remaining:
+                    gap = abs(d + latency[eid] - remaining)
+                    if gap < best_gap:
+                        best, best_eid, best_gap = v, eid, gap
+            if best is None:
+                return None
+            path.append(best)
+            eids.append(best_eid ^ 1)  # 回溯时走的是 u->前驱，正向为其反向边
+            u = best
+        path.reverse()
+        cost = 0
+        for eid in reversed(eids):
+            cost += edge_costs[eid]
+        self.update_load(path)
+        return path, cost
+
+    @staticmethod
+    def _build_path(previous, end):
+        """沿前驱表从终点回溯出完整路径"""
+        path = []
+        u = end
+        while u is not None:
+            path.append(u)
+            u = previous[u]
+        path.reverse()
+        return path
         
+    def ensure_layout(self):
+        """返回节点布局坐标，未初始化或节点数变化时重新计算"""
+        if self.pos is None or len(self.pos) != self.graph.number_of_nodes():
+            import networkx as nx
+            self.pos = nx.spring_layout(self.nx_graph(), k=1, iterations=50, seed=self.layout_seed)
+        return self.pos
+
+    def graph_data(self, precision=4, loads=None, load_version=None, edges=None, pos=None,
+                   topology_version=None):
+        """按列组织的拓扑JSON数据（节点坐标、负载、安全等级和边属性），供前端直接绘图
+
+        loads/load_version 为负载快照，edges/pos/topology_version 为拓扑快照（edges 为
+        [(u, v, 属性), ...]，每条边一个方向），省略时使用当前状态。
+        """
+        if pos is None:
+            pos = self.ensure_layout()
+        if loads is None:
+            loads = {n: node.current_load for n, node in self.nodes.items()}
+            load_version = self.load_version
+        if edges is None:
+            edges = [(u, v, props) for (u, v), props in self.edge_props.items() if u < v]
+            topology_version = self.topology_version
+        node_ids = list(self.nodes)
+        return {
+            'topology_version': topology_version,
+            'load_version': load_version,
+            'nodes': {
+                'id': node_ids,
+                'x': [round(float(pos[n][0]), precision) for n in node_ids],
+                'y': [round(float(pos[n][1]), precision) for n in node_ids],
+                'current_load': [loads[n] for n in node_ids],
+                'max_capacity': [self.nodes[n].max_capacity for n in node_ids],
+                'security_level': [self.nodes[n].security_level for n in node_ids]
+            },
+            'edges': {
+                'u': [u for u, _, _ in edges],
+                'v': [v for _, v, _ in edges],
+                'latency': [props['latency'] for _, _, props in edges],
+                'bandwidth': [props['bandwidth'] for _, _, props in edges],
+                'security': [props['security'] for _, _, props in edges]
+            }
+        }
+
     def print_final_status(self):
         """输出最终节点状态表格"""
         headers = ["NodeID", "CurrentLoad", "MaxCapacity", "SecurityLevel", "LoadRate"]
@@ -132,19 +966,22 @@ class SecureNetwork:
                 f"{node.load_ratio:.1%}"
             ])
         
+        from tabulate import tabulate
         print("\nFinal Network Status:")
         print(tabulate(table, headers=headers, tablefmt="github"))
         
     def _draw_network(self, highlight_path=None):
         """绘制网络拓扑图"""
+        import networkx as nx
+        plt = _pyplot()
+        graph = self.nx_graph()
         # 创建新的图形
         plt.figure(figsize=(16, 9), dpi=100)
         ax = plt.gca()
         ax.set_position([0.1, 0.1, 0.8, 0.8])
         
         # 如果位置未初始化，创建新的布局
-        if self.pos is None:
-            self.pos = nx.spring_layout(self.graph, k=1, iterations=50)
+        self.ensure_layout()
             
         # 绘制基础网络结构
         # 1. 首先绘制所有边
@@ -152,26 +989,26 @@ class SecureNetwork:
         edge_colors = [plt.cm.RdYlGn(self.edge_props[(u, v)]['security'] / 3) 
                       for (u, v) in edges]
         
-        nx.draw_networkx_edges(self.graph, self.pos,
+        nx.draw_networkx_edges(graph, self.pos,
                              edgelist=edges,
                              edge_color=edge_colors,
                              width=2)
 
         # 2. 绘制所有节点
         node_colors = [plt.cm.RdYlGn_r(self.nodes[n].load_ratio) 
-                      for n in self.graph.nodes()]
-        nx.draw_networkx_nodes(self.graph, self.pos,
+                      for n in graph.nodes()]
+        nx.draw_networkx_nodes(graph, self.pos,
                              node_color=node_colors,
                              node_size=1000)
 
         # 3. 如果有高亮路径，绘制高亮效果
         if highlight_path and len(highlight_path) > 1:
             path_edges = list(zip(highlight_path[:-1], highlight_path[1:]))
-            nx.draw_networkx_edges(self.graph, self.pos,
+            nx.draw_networkx_edges(graph, self.pos,
                                  edgelist=path_edges,
                                  edge_color='red',
                                  width=4)
-            nx.draw_networkx_nodes(self.graph, self.pos,
+            nx.draw_networkx_nodes(graph, self.pos,
                                  nodelist=highlight_path,
                                  node_color='lightblue',
                                  node_size=1200)
@@ -187,7 +1024,7 @@ class SecureNetwork:
         # 4. 添加节点标签
         labels = {node_id: f"{node_id}\nS{node.security_level}"
                  for node_id, node in self.nodes.items()}
-        nx.draw_networkx_labels(self.graph, self.pos,
+        nx.draw_networkx_labels(graph, self.pos,
                               labels,
                               font_family=self.font_prop.get_name(),
                               font_size=12)
@@ -196,7 +1033,7 @@ class SecureNetwork:
         edge_labels = {(u, v): f"{props['latency']}ms"
                       for (u, v), props in self.edge_props.items()
                       if u < v}
-        nx.draw_networkx_edge_labels(self.graph, self.pos,
+        nx.draw_networkx_edge_labels(graph, self.pos,
                                    edge_labels,
                                    font_family=self.font_prop.get_name(),
                                    font_size=10)
@@ -204,31 +1041,18 @@ class SecureNetwork:
         plt.title("网络拓扑图", fontproperties=self.font_prop, pad=20, fontsize=14)
         plt.axis('off')
 
-def create_network():
-    network = SecureNetwork()
-    
-    # 创建20个节点
-    for i in range(20):
-        capacity = random.randint(80, 200)
-        security = random.choice([1, 2, 3])
-        network.add_node(SecureNode(i, capacity, security))
-        
-    # 创建随机连接
-    for _ in range(35):
-        while True:
-            u = random.randint(0, 19)
-            v = random.randint(0, 19)
-            if u != v and not network.graph.has_edge(u, v):
-                latency = random.randint(10, 50)
-                bandwidth = random.choice([100, 200, 500])
-                network.add_edge(u, v, latency, bandwidth)
-                break
-                
-    return network
+def create_network(num_nodes=20, num_edges=35, connected=False):
+    """随机网络（G(n, m) 随机图）；种子取自全局 random，调用前 random.seed() 即可复现
+
+    更大规模或其他形状的拓扑见 topology.generate_network。
+    """
+    from topology import generate_network
+    return generate_network('er', seed=random.getrandbits(32), connected=connected,
+                            num_nodes=num_nodes, num_edges=num_edges)
 
 def main():
     network = create_network()
-    weights = {'latency': 0.4, 'load': 0.4, 'security': 0.2}
+    weights = DEFAULT_WEIGHTS
     
     # 模拟5次路由（无过程输出）
     for _ in range(100):
@@ -0,0 +1,165 @@
+"""SecureNetwork 的分层渲染
+
+静态底图（边、边标签、标题）按拓扑版本只绘制一次并缓存为像素缓冲区；
+每次请求只在底图上叠加节点负载着色、高亮路径和图例，再编码为PNG。
+渲染结果按 (拓扑版本, 负载版本, 路径) 缓存，相同状态的重复请求直接返回。
+"""
+import base64
+import io
+from collections import OrderedDict
+
+import networkx as nx
+from matplotlib import cm
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from PIL import Image
+
+import metrics
+from metrics import API_PHASE_SECONDS, RENDER_CACHE
+
+class NetworkRenderer:
+    CACHE_SIZE = 64  # 最多缓存多少张渲染结果
+
+    def __init__(self, network):
+        self.network = network
+        self._figure = None
+        self._canvas = None
+        self._ax = None
+        self._background = None
+        self._background_version = None
+        self._cache = OrderedDict()
+
+    def render(self, highlight_path=None, load_ratios=None, load_version=None):
+        """返回网络状态的PNG图像（base64字符串），可选高亮一条路径
+
+        load_ratios/load_version 为负载快照，省略时直接读取网络当前负载。
+        """
+        network = self.network
+        if load_ratios is None:
+            load_ratios = {n: node.load_ratio for n, node in network.nodes.items()}
+            load_version = network.load_version
+        path = tuple(highlight_path) if highlight_path else ()
+        key = (network.topology_version, load_version, path)
+        image = self._cache.get(key)
+        if metrics.ENABLED:
+            RENDER_CACHE.inc(result='hit' if image is not None else 'miss')
+        if image is not None:
+            self._cache.move_to_end(key)
+            return image
+
+        with metrics.timer(API_PHASE_SECONDS, phase='render'):
+            self._ensure_background()
+            png = self._compose(list(path), load_ratios)
+        with metrics.timer(API_PHASE_SECONDS, phase='encode'):
+            image = base64.b64encode(png).decode('utf-8')
+        self._cache[key] = image
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return image
+
+    def _ensure_background(self):
+        """绘制并缓存静态底图：布局、边、边标签、标题"""
+        network = self.network
+        if self._background is not None and self._background_version == network.topology_version:
+            return
+
+        # 如果位置未初始化，创建新的布局
+        network.ensure_layout()
+
+        figure = Figure(figsize=(16, 9), dpi=100, facecolor='white')
+        canvas = FigureCanvasAgg(figure)
+        ax = figure.add_axes([0.1, 0.1, 0.8, 0.8])
+        font_name = network.font_prop.get_name()
+        graph = network.nx_graph()
+
+        edges = [(u, v) for (u, v) in network.edge_props.keys() if u < v]
+        edge_colors = [cm.RdYlGn(network.edge_props[(u, v)]['security'] / 3) for (u, v) in edges]
+        nx.draw_networkx_edges(graph, network.pos, edgelist=edges,
+                               edge_color=edge_colors, width=2, ax=ax)
+
+        edge_labels = {(u, v): f"{props['latency']}ms"
+                       for (u, v), props in network.edge_props.items()
+                       if u < v}
+        nx.draw_networkx_edge_labels(graph, network.pos, edge_labels,
+                                     font_family=font_name, font_size=10, ax=ax)
+
+        ax.set_title("网络拓扑图", fontproperties=network.font_prop, pad=20, fontsize=14)
+        ax.axis('off')
+
+        # 固定坐标范围，之后叠加的图层不会触发重新缩放
+        if network.pos:
+            xs = [p[0] for p in network.pos.values()]
+            ys = [p[1] for p in network.pos.values()]
+            margin_x = (max(xs) - min(xs)) * 0.08 or 0.1
+            margin_y = (max(ys) - min(ys)) * 0.08 or 0.1
+            ax.set_xlim(min(xs) - margin_x, max(xs) + margin_x)
+            ax.set_ylim(min(ys) - margin_y, max(ys) + margin_y)
+        ax.set_autoscale_on(False)
+
+        canvas.draw()
+        self._figure, self._canvas, self._ax = figure, canvas, ax
+        self._background = canvas.copy_from_bbox(figure.bbox)
+        self._background_version = network.topology_version
+
+    def _compose(self, highlight_path, load_ratios):
+        """在底图上叠加动态图层并编码为PNG，返回PNG字节"""
+        network = self.network
+        ax = self._ax
+        graph = network.nx_graph()
+        self._canvas.restore_region(self._background)
+        artists = []
+
+        node_colors = [cm.RdYlGn_r(load_ratios[n]) for n in graph.nodes()]
+        artists.append(nx.draw_networkx_nodes(graph, network.pos, node_color=node_colors,
+                                              node_size=1000, ax=ax))
+
+        if len(highlight_path) > 1:
+            path_edges = list(zip(highlight_path[:-1], highlight_path[1:]))
+            artists.append(nx.draw_networkx_edges(graph, network.pos, edgelist=path_edges,
+                                                  edge_color='red', width=4, ax=ax))
+            artists.append(nx.draw_networkx_nodes(graph, network.pos,
+                                                  nodelist=highlight_path,
+                                                  node_color='lightblue', node_size=1200, ax=ax))
+            path_label = "路径: " + " → ".join(map(str, highlight_path))
+            artists.append(ax.text(0.05, 0.95, path_label, transform=ax.transAxes,
+                                   fontproperties=network.font_prop, fontsize=12,
+                                   bbox=dict(facecolor='white', alpha=0.8)))
+
+        labels = {node_id: f"{node_id}\nS{node.security_level}"
+                  for node_id, node in network.nodes.items()}
+        artists.extend(nx.draw_networkx_labels(graph, network.pos, labels,
+                                               font_family=network.font_prop.get_name(),
+                                               font_size=12, ax=ax).values())
+        artists.append(ax.legend(handles=self._legend_handles(len(highlight_path) > 1),
+                                 prop=network.font_prop, loc='upper right',
+                                 bbox_to_anchor=(1.12, 1), fontsize=10))
+
+        try:
+            for artist in artists:
+                if isinstance(artist, list):
+                    for patch in artist:
+                        ax.draw_artist(patch)
+                else:
+                    ax.draw_artist(artist)
+            width, height = self._canvas.get_width_height()
+            image = Image.frombuffer('RGBA', (width, height), self._canvas.buffer_rgba(),
+                                     'raw', 'RGBA', 0, 1).convert('RGB')
+            buf = io.BytesIO()
+            image.save(buf, format='png', compress_level=1)
+        finally:
+            for artist in artists:
+                for item in (artist if isinstance(artist, list) else [artist]):
+                    item.remove()
+        return buf.getvalue()
+
+    @staticmethod
+    def _legend_handles(with_path):
+        def marker(color, label):
+            return Line2D([0], [0], marker='o', color='w', markerfacecolor=color,
+                          markersize=10, label=label)
+        handles = [marker('g', '低负载'), marker('y', '中负载'), marker('r', '高负载')]
+        if with_path:
+            handles = [Line2D([0], [0], color='red', lw=2, label='选中路径'),
+                       marker('lightblue', '路径节点')] + handles
+        return handles
@@ -0,0 +1,213 @@
+"""路由请求回放与压测工具
+
+从JSONL文件逐行读取路由请求（start、end、weights、timestamp），发送到进程内的
+SecureNetwork 或 Flask 服务的 /api/network/find_path，统计延迟分位数和吞吐量。
+
+    python replay.py trace.jsonl --target inprocess --concurrency 4
+    python replay.py trace.jsonl --target http --url http://localhost:5000 --mode open --rate 500
+
+到达模式：
+  closed  每个并发工作线程在上一个请求完成后立即发送下一个（默认）；
+  open    按到达时间表发送，与服务端处理速度无关。时间表来自记录里的 timestamp
+          （可用 --speed 加速），或由 --rate 给出的固定/泊松到达率生成。
+          开环模式下延迟从计划发送时刻算起，包含排队时间。
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from new import DEFAULT_WEIGHTS
+
+def read_requests(path, limit=None):
+    """流式读取JSONL，跳过缺少 start/end 的行"""
+    count = 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict) or 'start' not in record or 'end' not in record:
+                continue
+            yield record
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+class InProcessTarget:
+    """直接调用进程内的 SecureNetwork.find_path（经 NetworkStateManager 加锁）"""
+    def __init__(self, seed=42):
+        from state import NetworkStateManager
+        self.manager = NetworkStateManager()
+        self.manager.reset(seed=seed)
+
+    def send(self, record):
+        with self.manager.write() as network:
+            path, _ = network.find_path(record['start'], record['end'],
+                                        record.get('weights', DEFAULT_WEIGHTS))
+        return path is not None
+
+class HttpTarget:
+    """通过HTTP调用Flask服务，每个线程复用一条keep-alive连接"""
+    def __init__(self, url, render=False, init_seed=None):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.path = '/api/network/find_path' + ('' if render else '?render=0')
+        self._local = threading.local()
+        if init_seed is not None:
+            self._post('/api/network/init', {'seed': init_seed})
+
+    def _post(self, path, payload):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        body = json.dumps(payload)
+        try:
+            conn.request('POST', path, body, {'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self._local.conn = None
+            raise
+        return response.status
+
+    def send(self, record):
+        payload = {'start': record['start'], 'end': record['end'],
+                   'weights': record.get('weights', DEFAULT_WEIGHTS)}
+        return self._post(self.path, payload) == 200
+
+class LatencyRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.latencies.append(latency)
+            if not ok:
+                self.errors += 1
+
+    def report(self, elapsed):
+        latencies = np.array(self.latencies) * 1000
+        result = {
+            'requests': len(latencies),
+            'errors': self.errors,
+            'elapsed_s': elapsed,
+            'throughput_rps': len(latencies) / elapsed if elapsed > 0 else 0.0
+        }
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            result.update({
+                'mean_ms': float(latencies.mean()),
+                'p50_ms': float(p50),
+                'p95_ms': float(p95),
+                'p99_ms': float(p99),
+                'max_ms': float(latencies.max())
+            })
+        return result
+
+def _timed_send(target, record, recorder, scheduled=None):
+    begin = time.perf_counter() if scheduled is None else scheduled
+    try:
+        ok = target.send(record)
+    except Exception:
+        ok = False
+    recorder.record(time.perf_counter() - begin, ok)
+
+def run_closed_loop(target, records, concurrency):
+    """闭环：concurrency 个线程各自串行发送"""
+    recorder = LatencyRecorder()
+    lock = threading.Lock()
+    records = iter(records)
+
+    def worker():
+        while True:
+            with lock:
+                record = next(records, None)
+            if record is None:
+                return
+            _timed_send(target, record, recorder)
+
+    begin = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return recorder.report(time.perf_counter() - begin)
+
+def arrival_offsets(records, rate=None, poisson=True, speed=1.0, seed=0):
+    """为每条记录生成相对开始时刻的计划发送偏移（秒）"""
+    rng = random.Random(seed)
+    offset = 0.0
+    first_ts = None
+    for record in records:
+        if rate:
+            yield offset, record
+            offset += rng.expovariate(rate) if poisson else 1.0 / rate
+        else:
+            ts = float(record.get('timestamp', 0.0))
+            first_ts = ts if first_ts is None else first_ts
+            yield (ts - first_ts) / speed, record
+
+def run_open_loop(target, records, concurrency, rate=None, poisson=True, speed=1.0, seed=0):
+    """开环：按时间表提交，线程池满时请求排队，排队时间计入延迟"""
+    recorder = LatencyRecorder()
+    begin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for offset, record in arrival_offsets(records, rate, poisson, speed, seed):
+            scheduled = begin + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(_timed_send, target, record, recorder, scheduled)
+    return recorder.report(time.perf_counter() - begin)
+
+def main():
+    parser = argparse.ArgumentParser(description="回放JSONL路由请求并统计延迟")
+    parser.add_argument('trace', help="JSONL请求文件，每行包含 start、end，可选 weights、timestamp")
+    parser.add_argument('--target', choices=['inprocess', 'http'], default='inprocess')
+    parser.add_argument('--url', default='http://localhost:5000', help="HTTP目标的服务地址")
+    parser.add_argument('--render', action='store_true', help="HTTP目标同时请求渲染图像")
+    parser.add_argument('--seed', type=int, default=42, help="初始化网络使用的种子")
+    parser.add_argument('--init', action='store_true', help="HTTP目标回放前先调用 /api/network/init")
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--rate', type=float, default=None, help="开环模式的到达率（请求/秒），缺省按timestamp回放")
+    parser.add_argument('--constant', action='store_true', help="开环固定间隔到达，默认泊松到达")
+    parser.add_argument('--speed', type=float, default=1.0, help="按timestamp回放时的加速倍数")
+    parser.add_argument('--limit', type=int, default=None, help="最多回放多少条请求")
+    parser.add_argument('-o', '--output', default=None, help="把统计结果写入JSON文件")
+    args = parser.parse_args()
+
+    if args.target == 'inprocess':
+        target = InProcessTarget(seed=args.seed)
+    else:
+        target = HttpTarget(args.url, render=args.render, init_seed=args.seed if args.init else None)
+
+    records = read_requests(args.trace, args.limit)
+    if args.mode == 'closed':
+        report = run_closed_loop(target, records, args.concurrency)
+    else:
+        report = run_open_loop(target, records, args.concurrency, rate=args.rate,
+                               poisson=not args.constant, speed=args.speed, seed=args.seed)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,86 @@
 import numpy as np
 import random
 import heapq
+import json
+
+from metrics import DIJKSTRA_SECONDS, SELECT_NEXT_NODE_SECONDS, timed
+
+class NodeState:
+    """以NumPy数组集中保存所有节点的状态，下标即节点ID"""
+    def __init__(self, num_nodes):
+        self.load = np.zeros(num_nodes)                          # 当前负载
+        self.pheromone = np.ones(num_nodes)                      # 信息素浓度
+        self.request_count = np.zeros(num_nodes, dtype=np.int64) # 被选次数统计
+        self._views = [Node(i, self, i) for i in range(num_nodes)]
+
+    @classmethod
+    def of(cls, nodes):
+        """取得节点集合背后的状态数组，nodes 可以是 NodeState 或其节点视图列表"""
+        if isinstance(nodes, NodeState):
+            return nodes
+        state = nodes[0].state if len(nodes) else None
+        if state is None or len(nodes) != len(state) or \
+                any(node.state is not state or node.id != i for i, node in enumerate(nodes)):
+            raise ValueError("nodes 必须是同一个 NodeState 中按ID排列的全部节点")
+        return state
+
+    def sync(self, force=False):
+        """与共享存储同步（见 controller.SharedNodeState），本地状态无需同步"""
+        return False
+
+    def evaporate(self, rho, times=1, floor=0.1):
+        """信息素挥发 times 次，不低于 floor"""
+        np.maximum(self.pheromone * rho ** times, floor, out=self.pheromone)
+
+    def decay_load(self, mask, amount):
+        """mask 选中的节点负载减少 amount，不低于0"""
+        self.load[mask] = np.maximum(self.load[mask] - amount, 0)
+
+    def __len__(self):
+        return len(self._views)
+
+    def __getitem__(self, node_id):
+        return self._views[node_id]
+
+    def __iter__(self):
+        return iter(self._views)
 
 class Node:
-    def __init__(self, node_id):
+    """节点视图，属性读写直接映射到 NodeState 中的数组"""
+    __slots__ = ('id', 'state', '_index')
+
+    def __init__(self, node_id, state=None, index=None):
         self.id = node_id          # 节点ID
-        self.load = 0.0           # 当前负载
-        self.pheromone = 1.0      # 信息素浓度
-        self.request_count = 0    # 被选次数统计
+        if state is None:
+            state, index = NodeState(1), 0
+        self.state = state
+        self._index = index
 
+    @property
+    def load(self):
+        return float(self.state.load[self._index])
+
+    @load.setter
+    def load(self, value):
+        self.state.load[self._index] = value
+
+    @property
+    def pheromone(self):
+        return float(self.state.pheromone[self._index])
+
+    @pheromone.setter
+    def pheromone(self, value):
+        self.state.pheromone[self._index] = value
+
+    @property
+    def request_count(self):
+        return int(self.state.request_count[self._index])
+
+    @request_count.setter
+    def request_count(self, value):
+        self.state.request_count[self._index] = value
+
+@timed(DIJKSTRA_SECONDS, engine='dense')
 def dijkstra_shortest_path(start, end, delay_matrix):
     """使用Dijkstra算法找到最短延迟路径"""
     num_nodes = len(delay_matrix)
@@ -48,31 +120,253 @@ def dijkstra_shortest_path(start, end, delay_matrix):
 
     return path
 
+class CSRGraph:
+    """压缩稀疏行（CSR）格式的网络图
+
+    indptr[u]:indptr[u+1] 为节点u的邻居在 indices/delays 中的区间，
+    邻居按节点ID升序存放，保证与稠密矩阵扫描的松弛顺序一致。
+    """
+    def __init__(self, indptr, indices, delays):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.delays = np.asarray(delays, dtype=np.float64)
+        self.num_nodes = len(self.indptr) - 1
+        self._rows = None
+
+    @classmethod
+    def from_matrix(cls, delay_matrix):
+        """从延迟矩阵构建，非对角线上的有限值视为一条边"""
+        matrix = np.asarray(delay_matrix, dtype=np.float64)
+        mask = np.isfinite(matrix)
+        np.fill_diagonal(mask, False)
+        rows, cols = np.nonzero(mask)  # 按行优先返回，行内列号升序
+        indptr = np.zeros(len(matrix) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(matrix)), out=indptr[1:])
+        return cls(indptr, cols, matrix[rows, cols])
+
+    @classmethod
+    def from_edges(cls, num_nodes, sources, targets, delays, directed=False):
+        """从边列表构建，无向图会同时写入两个方向"""
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        delays = np.asarray(delays, dtype=np.float64)
+        if not directed:
+            sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+            delays = np.concatenate([delays, delays])
+        order = np.lexsort((targets, sources))
+        sources, targets, delays = sources[order], targets[order], delays[order]
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+        return cls(indptr, targets, delays)
+
+    def neighbors(self, u):
+        """返回节点u的 (邻居ID列表, 延迟列表)"""
+        if self._rows is None:
+            # 转为Python列表后逐元素访问远快于numpy标量
+            indptr = self.indptr.tolist()
+            indices = self.indices.tolist()
+            delays = self.delays.tolist()
+            self._rows = [(indices[indptr[i]:indptr[i + 1]], delays[indptr[i]:indptr[i + 1]])
+                          for i in range(self.num_nodes)]
+        return self._rows[u]
+
+    def _edge_pos(self, u, v):
+        lo, hi = self.indptr[u], self.indptr[u + 1]
+        pos = lo + np.searchsorted(self.indices[lo:hi], v)
+        if pos < hi and self.indices[pos] == v:
+            return int(pos)
+        return -1
+
+    def delay(self, u, v):
+        """查询边(u, v)的延迟，不存在时返回inf"""
+        pos = self._edge_pos(u, v)
+        return float(self.delays[pos]) if pos >= 0 else np.inf
+
+    def set_delay(self, u, v, delay):
+        """修改已有边(u, v)的延迟（单向），CSR结构本身不变"""
+        pos = self._edge_pos(u, v)
+        if pos < 0:
+            raise KeyError(f"边 ({u}, {v}) 不存在")
+        self.delays[pos] = delay
+        if self._rows is not None:
+            self._rows[u][1][pos - self.indptr[u]] = float(delay)
+
+    def transpose(self):
+        """返回所有边反向后的图"""
+        sources = np.repeat(np.arange(self.num_nodes), np.diff(self.indptr))
+        return CSRGraph.from_edges(self.num_nodes, self.indices, sources, self.delays, directed=True)
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+@timed(DIJKSTRA_SECONDS, engine='csr')
+def dijkstra_shortest_path_csr(start, end, graph):
+    """基于CSR邻接表的Dijkstra算法，复杂度O(E log V)"""
+    num_nodes = graph.num_nodes
+    visited = [False] * num_nodes
+    distance = [np.inf] * num_nodes
+    distance[start] = 0
+    previous = [-1] * num_nodes
+
+    priority_queue = [(0, start)]
+
+    while priority_queue:
+        dist_u, u = heapq.heappop(priority_queue)
+        if visited[u]:
+            continue
+        visited[u] = True
+
+        if u == end:
+            break
+
+        neighbor_ids, neighbor_delays = graph.neighbors(u)
+        for v, d in zip(neighbor_ids, neighbor_delays):
+            if not visited[v]:
+                new_dist = dist_u + d
+                if new_dist < distance[v]:
+                    distance[v] = new_dist
+                    previous[v] = u
+                    heapq.heappush(priority_queue, (new_dist, v))
+
+    # 重构路径
+    path = []
+    u = end
+    while u != -1:
+        path.append(u)
+        u = previous[u]
+    path.reverse()
+
+    return path
+
+class ShortestPathOracle:
+    """以出口节点为根的反向最短路径树（下一跳表）
+
+    构建时对反向图执行一次Dijkstra，之后每一跳只需O(1)查表；
+    边延迟变化时只修复受影响的子树，而不是重新计算整棵树。
+    存在多条等长最短路径时，选出的下一跳可能与从当前节点正向搜索的
+    dijkstra_shortest_path / dijkstra_shortest_path_csr 不同（仍在某条最短路径上）。
+    """
+    def __init__(self, graph, root):
+        self.graph = graph                # 正向图：u -> v
+        self.reverse = graph.transpose()  # 反向图：v -> u
+        self.root = root
+        self.distance = [np.inf] * graph.num_nodes
+        self.next_hops = [-1] * graph.num_nodes
+        self._build()
+
+    def _build(self):
+        self.distance[self.root] = 0
+        self._propagate([(0, self.root)])
+
+    def _propagate(self, heap, allowed=None):
+        """沿入边向外松弛；allowed 不为空时只更新其中的节点"""
+        distance, next_hops = self.distance, self.next_hops
+        while heap:
+            dist_v, v = heapq.heappop(heap)
+            if dist_v > distance[v]:
+                continue
+            for u, d in zip(*self.reverse.neighbors(v)):
+                if allowed is not None and u not in allowed:
+                    continue
+                new_dist = dist_v + d
+                if new_dist < distance[u]:
+                    distance[u] = new_dist
+                    next_hops[u] = v
+                    heapq.heappush(heap, (new_dist, u))
+
+    def _subtree(self, u):
+        """返回经由u到达根节点的所有节点（含u）"""
+        subtree = {u}
+        stack = [u]
+        while stack:
+            v = stack.pop()
+            for w in self.reverse.neighbors(v)[0]:
+                if w not in subtree and self.next_hops[w] == v:
+                    subtree.add(w)
+                    stack.append(w)
+        return subtree
+
+    def next_hop(self, u):
+        """节点u去往根节点的下一跳，u为根或不可达时返回-1"""
+        return self.next_hops[u]
+
+    def path(self, u):
+        """节点u到根节点的完整路径，不可达时返回空列表"""
+        if self.distance[u] == np.inf:
+            return []
+        path = [u]
+        while u != self.root:
+            u = self.next_hops[u]
+            path.append(u)
+        return path
+
+    def update_delay(self, u, v, delay):
+        """修改边 u -> v 的延迟并增量修复最短路径树（无向图需两个方向各调用一次）"""
+        old_delay = self.graph.delay(u, v)
+        self.graph.set_delay(u, v, delay)
+        self.reverse.set_delay(v, u, delay)
+        distance, next_hops = self.distance, self.next_hops
+
+        if delay < old_delay:
+            # 延迟降低：只可能让u及其上游变短
+            new_dist = distance[v] + delay
+            if new_dist < distance[u]:
+                distance[u] = new_dist
+                next_hops[u] = v
+                self._propagate([(new_dist, u)])
+        elif delay > old_delay and next_hops[u] == v:
+            # 树边延迟升高：u的整棵子树需要重新选择下一跳
+            affected = self._subtree(u)
+            for w in affected:
+                distance[w] = np.inf
+                next_hops[w] = -1
+            heap = []
+            for w in affected:
+                for x, d in zip(*self.graph.neighbors(w)):
+                    if x not in affected and distance[x] + d < distance[w]:
+                        distance[w] = distance[x] + d
+                        next_hops[w] = x
+                if distance[w] < np.inf:
+                    heap.append((distance[w], w))
+            heapq.heapify(heap)
+            self._propagate(heap, allowed=affected)
+
+def find_shortest_path(start, end, delay_matrix, graph=None, engine='csr'):
+    """按 engine 选择稠密矩阵扫描（'dense'）或CSR邻接表（'csr'）求最短路径"""
+    if engine == 'dense':
+        return dijkstra_shortest_path(start, end, delay_matrix)
+    if engine == 'csr':
+        if graph is None:
+            graph = CSRGraph.from_matrix(delay_matrix)
+        return dijkstra_shortest_path_csr(start, end, graph)
+    raise ValueError(f"未知的最短路径引擎: {engine}")
+
+@timed(SELECT_NEXT_NODE_SECONDS)
 def select_next_node(current_node_id, nodes, delay_matrix, alpha, beta, gamma, delta, epsilon=1e-5):
-    """使用改进蚁群算法选择下一个节点"""
+    """使用改进蚁群算法选择下一个节点（在状态数组上向量化计算）"""
     epsilon = 1e-5  # 防止除以零
-    probabilities = []
-    total = 0.0
+    state = NodeState.of(nodes)
 
-    candidates = [node for node in nodes if node.id != current_node_id]
-    if not candidates:
+    candidates = np.arange(len(state))
+    candidates = candidates[candidates != current_node_id]
+    if candidates.size == 0:
         return None
 
-    for node in candidates:
-        network_delay = delay_matrix[current_node_id][node.id]
-        heuristic = (alpha / (network_delay + epsilon)) + (beta / (node.load + 1 + epsilon))
-        prob = (node.pheromone ** gamma) * (heuristic ** delta)
-        probabilities.append(prob)
-        total += prob
+    network_delay = np.asarray(delay_matrix[current_node_id], dtype=np.float64)[candidates]
+    heuristic = (alpha / (network_delay + epsilon)) + (beta / (state.load[candidates] + 1 + epsilon))
+    probabilities = (state.pheromone[candidates] ** gamma) * (heuristic ** delta)
+    cdf = np.cumsum(probabilities)
+    total = cdf[-1]
 
     if total == 0:
-        return random.choice(candidates)
+        return random.choice([state[i] for i in candidates])
 
-    probabilities = [p / total for p in probabilities]
-    selected = np.random.choice(len(candidates), p=probabilities)
-    selected_node = candidates[selected]
-    selected_node.request_count += 1  # 确保这一行被正确执行
-    return selected_node
+    # 归一化累积分布 + 二分查找，等价于 np.random.choice(p=probabilities / total)
+    cdf /= total
+    selected = candidates[np.searchsorted(cdf, np.random.random_sample(), side='right')]
+    state.request_count[selected] += 1
+    return state[selected]
 
 def update_pheromone(node, Q, delay, load):
     """动态更新信息素"""
@@ -81,119 +375,563 @@ def update_pheromone(node, Q, delay, load):
 
 def evaporate_pheromone(nodes, rho):
     """全局信息素挥发"""
+    if isinstance(nodes, NodeState):
+        nodes.evaporate(rho)
+        return
     for node in nodes:
         node.pheromone = max(node.pheromone * rho, 0.1)
 
-# 算法参数配置
-alpha = 0.8   # 延迟权重
-beta = 1.0    # 负载权重
-gamma = 0.5     # 信息素重要性指数
-delta = 3     # 启发因子重要性指数
-rho = 0.8     # 信息素挥发率
-Q = 100       # 信息素增强系数
-num_nodes = 8 # 网络节点数量（包括入口和出口）
-num_requests = 5000  # 总请求数
-
-# 初始化随机种子
-random.seed(42)
-np.random.seed(42)
-
-# 创建网络节点
-nodes = [Node(i) for i in range(num_nodes)]
-
-# 定义入口和出口节点
-entry_node = 0
-exit_node = num_nodes - 1
-all_nodes = [node for node in nodes if node.id != entry_node and node.id != exit_node]
-
-# 初始化网络延迟矩阵（模拟真实网络探测）
-delay_matrix = np.zeros((num_nodes, num_nodes))
-print("正在初始化网络延迟矩阵...")
-for i in range(num_nodes):
-    for j in range(i+1, num_nodes):
-        if i != j:
-            delay_matrix[i][j] = random.randint(50, 200)
-            delay_matrix[j][i] = delay_matrix[i][j]
-    delay_matrix[i][i] = 0  # 节点到自身延迟为0
-
-# 模拟请求处理过程
-print("\n开始模拟负载均衡...")
-total_time = 0.0
-
-for req_id in range(num_requests):
-    # 固定入口节点
-    current_node_id = entry_node
-    nodes[current_node_id].load += 1  # 入口节点负载增加
-    
-    # 记录路径
-    path = [current_node_id]
-    
+def _advance_batch(state, delay_matrix, next_hops, entry_node, exit_node, batch_size,
+                   alpha, beta, gamma, delta, Q, epsilon=1e-5):
+    """让一批并发请求（蚂蚁）从入口走到出口，并批量写回负载与信息素
+
+    同一批内的请求看到相同的节点状态；批大小为1时与逐个请求的模拟逐位一致。
+    返回形如 (跳数+1, batch_size) 的路径矩阵（已到达出口的蚂蚁用-1填充）和各请求的总延迟。
+    """
+    num_nodes = len(state)
+    state.load[entry_node] += batch_size  # 入口节点负载增加
+
+    # 同一批内负载和信息素不变，启发因子中与当前节点无关的部分只需计算一次
+    load_term = beta / (state.load + 1 + epsilon)
+    pheromone_term = state.pheromone ** gamma
+
+    current = np.full(batch_size, entry_node, dtype=np.int64)
+    path_rows = [current.copy()]
+    path_delays = np.zeros(batch_size)
+    active = np.flatnonzero(current != exit_node)
+
     # 使用蚁群算法和最短路径算法结合选择路径
-    while current_node_id != exit_node:
-        # 获取当前节点对象
-        current_node = next((node for node in nodes if node.id == current_node_id), None)
-        
-        # 使用Dijkstra算法获取最短路径
-        shortest_path = dijkstra_shortest_path(current_node_id, exit_node, delay_matrix)
-        next_node_id = shortest_path[1] if len(shortest_path) > 1 else exit_node
-        
-        # 使用蚁群算法选择下一个节点
-        next_node = select_next_node(current_node_id, nodes, delay_matrix, 
-                                      alpha, beta, gamma, delta)
-        
+    while active.size:
+        cur = current[active]
+        sp_next = next_hops[cur]
+
+        heuristic = (alpha / (delay_matrix[cur] + epsilon)) + load_term
+        weights = pheromone_term * (heuristic ** delta)
+        weights[np.arange(active.size), cur] = 0  # 排除当前节点
+        cdf = np.cumsum(weights, axis=1)
+        totals = cdf[:, -1:]
+        aco_next = np.empty(active.size, dtype=np.int64)
+        sampled = totals[:, 0] != 0
+        if sampled.all():
+            cdf /= totals
+            draws = np.random.random_sample(active.size)
+            aco_next = (cdf <= draws[:, None]).sum(axis=1)  # 逐行 searchsorted(side='right')
+            np.add.at(state.request_count, aco_next, 1)
+        else:
+            # 概率全为零的蚂蚁退化为均匀随机选择，与 select_next_node 保持一致
+            for row in range(active.size):
+                if sampled[row]:
+                    row_cdf = cdf[row] / totals[row]
+                    aco_next[row] = np.searchsorted(row_cdf, np.random.random_sample(), side='right')
+                    state.request_count[aco_next[row]] += 1
+                else:
+                    aco_next[row] = random.choice([i for i in range(num_nodes) if i != cur[row]])
+
         # 权衡最短路径和蚁群算法选择
-        if next_node.id != next_node_id:
-            # 如果蚁群算法选择的节点与最短路径不同，比较延迟和负载
-            acl_delay = delay_matrix[current_node_id][next_node.id]
-            sp_delay = delay_matrix[current_node_id][next_node_id]
-            
-            if (acl_delay <= sp_delay * 1.2) and (next_node.load < nodes[next_node_id].load):
-                # 蚁群算法选择的节点延迟和负载更优
-                next_node_id = next_node.id
-        
-        # 更新路径和当前节点
-        path.append(next_node_id)
-        current_node_id = next_node_id
-    
-    # 更新负载和信息素
-    for i in range(len(path) - 1):
-        current = path[i]
-        next_node = path[i+1]
-        nodes[next_node].load += 1
-        update_pheromone(nodes[next_node], Q, delay_matrix[current][next_node], nodes[next_node].load)
-    
-    # 计算总用时
-    total_delay = sum(delay_matrix[path[i]][path[i+1]] for i in range(len(path)-1))
-    total_time += total_delay
-    
-    # 定期挥发信息素
-    if req_id % 10 == 0:
-        evaporate_pheromone(nodes, rho)
-    
-    # 模拟负载自然衰减
-    for node in nodes:
-        if node.id not in (entry_node, exit_node):
-            node.load = max(node.load - 0.3, 0)  # 每秒处理0.3个请求
-
-# 结果输出
-# 结果输出
-print("\n节点状态统计结果：")
-print("节点ID | 负载 | 请求次数 | 平均延迟 ")
-print("------------------------------------------------")
-avg_delays = []
-for node in nodes:
-    if node.id == entry_node or node.id == exit_node:
-        avg_delays.append(0)
-    else:
-        outgoing_delays = [delay_matrix[node.id][j] for j in range(num_nodes) if j != node.id]
-        avg_delay = np.mean(outgoing_delays) if outgoing_delays else 0
-        avg_delays.append(avg_delay)
-
-for node_idx, node in enumerate(nodes):
-    if node.id == entry_node or node.id == exit_node:
-        print(f"{node.id:^6} | {'入口' if node.id == entry_node else '出口'}    "
-              f" | {node.request_count:^8} | {avg_delays[node_idx]:^8.2f}ms")
+        prefer_aco = (aco_next != sp_next) & \
+            (delay_matrix[cur, aco_next] <= delay_matrix[cur, sp_next] * 1.2) & \
+            (state.load[aco_next] < state.load[sp_next])
+        chosen = np.where(prefer_aco, aco_next, sp_next)
+
+        path_delays[active] += delay_matrix[cur, chosen]
+        step = np.full(batch_size, -1, dtype=np.int64)
+        step[active] = chosen
+        path_rows.append(step)
+        current[active] = chosen
+        active = active[chosen != exit_node]
+
+    paths = np.array(path_rows)
+
+    # 按跳序更新负载和信息素：同一跳内的多只蚂蚁一起写回
+    for hop in range(1, len(paths)):
+        moved = paths[hop] != -1
+        prev, nxt = paths[hop - 1][moved], paths[hop][moved]
+        np.add.at(state.load, nxt, 1)
+        np.add.at(state.pheromone, nxt, Q / (delay_matrix[prev, nxt] + state.load[nxt] + 1))
+
+    return paths, path_delays
+
+def simulate_batched(state, delay_matrix, next_hops, entry_node, exit_node, num_requests,
+                     batch_size, alpha, beta, gamma, delta, rho, Q, record_paths=False):
+    """以每个tick并发 batch_size 个请求的方式模拟，负载衰减和信息素挥发按批向量化执行
+
+    返回 (总用时, 路径列表)，record_paths 为 False 时路径列表为空。
+    """
+    delay_matrix = np.asarray(delay_matrix, dtype=np.float64)
+    next_hops = np.asarray(next_hops, dtype=np.int64).copy()
+    next_hops[next_hops == -1] = exit_node
+    relay = np.ones(len(state), dtype=bool)
+    relay[[entry_node, exit_node]] = False
+
+    total_time = 0.0
+    paths = []
+    for first_id in range(0, num_requests, batch_size):
+        size = min(batch_size, num_requests - first_id)
+        state.sync()
+        batch_paths, batch_delays = _advance_batch(
+            state, delay_matrix, next_hops, entry_node, exit_node, size,
+            alpha, beta, gamma, delta, Q)
+        for d in batch_delays:
+            total_time += d
+        if record_paths:
+            paths.extend(col[col != -1].tolist() for col in batch_paths.T)
+
+        # 定期挥发信息素：本批中每个编号为10的倍数的请求各挥发一次
+        evaporations = (first_id + size - 1) // 10 - (first_id - 1) // 10
+        if evaporations == 1:
+            evaporate_pheromone(state, rho)
+        elif evaporations > 1:
+            state.evaporate(rho, evaporations)
+
+        # 模拟负载自然衰减（每个请求0.3）
+        state.decay_load(relay, 0.3 * size)
+
+    return total_time, paths
+
+def poisson_arrivals(num_requests, rate, rng):
+    """泊松到达：间隔服从均值 1/rate 的指数分布，返回到达时刻（秒）"""
+    return np.cumsum(rng.exponential(1.0 / rate, num_requests))
+
+def bursty_arrivals(num_requests, rate, rng, on_mean=0.5, off_mean=2.0):
+    """突发到达（ON/OFF 调制泊松过程）：ON 期内按较高速率泊松到达，OFF 期内没有请求
+
+    ON、OFF 时长分别服从均值 on_mean、off_mean 秒的指数分布，
+    ON 期速率取 rate * (on_mean + off_mean) / on_mean，使长期平均到达率仍为 rate。
+    """
+    on_rate = rate * (on_mean + off_mean) / on_mean
+    bursts = []
+    count = 0
+    t = 0.0
+    while count < num_requests:
+        on = rng.exponential(on_mean)
+        n = rng.poisson(on_rate * on)
+        bursts.append(t + np.sort(rng.uniform(0, on, n)))
+        count += n
+        t += on + rng.exponential(off_mean)
+    return np.concatenate(bursts)[:num_requests]
+
+def trace_arrivals(timestamps, num_requests=None):
+    """按记录的时间戳到达，时刻相对第一条记录（秒）"""
+    times = np.sort(np.asarray(timestamps, dtype=np.float64))[:num_requests]
+    return times - times[0] if len(times) else times
+
+def read_trace(path):
+    """读取到达时间戳文件：每行一个数字，或含 timestamp 字段的JSON对象（与 replay.py 的请求文件兼容）"""
+    timestamps = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            timestamps.append(float(record['timestamp'] if isinstance(record, dict) else record))
+    return timestamps
+
+def arrival_times(config, rng):
+    """按 config.arrival 生成各请求进入网络的时刻（毫秒）"""
+    if config.arrival == 'poisson':
+        times = poisson_arrivals(config.num_requests, config.arrival_rate, rng)
+    elif config.arrival == 'bursty':
+        times = bursty_arrivals(config.num_requests, config.arrival_rate, rng,
+                                config.burst_on, config.burst_off)
+    elif config.arrival == 'trace':
+        if config.arrival_trace is None:
+            raise ValueError("trace 到达模式需要指定 arrival_trace")
+        trace = config.arrival_trace
+        times = trace_arrivals(read_trace(trace) if isinstance(trace, str) else trace,
+                               config.num_requests)
     else:
-        print(f"{node.id:^6} | {node.load:^8.2f} | {node.request_count:^8} | {avg_delays[node_idx]:^8.2f}ms")
+        raise ValueError(f"未知的到达过程: {config.arrival}")
+    return times * 1000
+
+def latency_summary(values):
+    """均值、分位数和最大值（毫秒）"""
+    values = np.asarray(values, dtype=np.float64)
+    if not values.size:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'mean': float(values.mean()), 'p50': float(p50), 'p95': float(p95),
+            'p99': float(p99), 'max': float(values.max())}
+
+class SimulationConfig:
+    """模拟参数配置"""
+    def __init__(self, alpha=0.8, beta=1.0, gamma=0.5, delta=3, rho=0.8, Q=100,
+                 num_nodes=8, num_requests=5000, sp_engine='dense', batch_size=None,
+                 record_paths=True, mode='tick', arrival='poisson', arrival_rate=20.0,
+                 burst_on=0.5, burst_off=2.0, arrival_trace=None, service_rate=50.0,
+                 service_dist='exp'):
+        self.alpha = alpha                # 延迟权重
+        self.beta = beta                  # 负载权重
+        self.gamma = gamma                # 信息素重要性指数
+        self.delta = delta                # 启发因子重要性指数
+        self.rho = rho                    # 信息素挥发率
+        self.Q = Q                        # 信息素增强系数
+        self.num_nodes = num_nodes        # 网络节点数量（包括入口和出口），仅用于生成随机拓扑
+        self.num_requests = num_requests  # 总请求数
+        self.sp_engine = sp_engine        # 最短路径引擎：'dense'（稠密矩阵）、'csr'（邻接表）或 'oracle'（下一跳表）；
+                                          # 'oracle' 最快，但等长最短路径并列时选出的下一跳可能不同，结果与前两者不逐位一致
+        self.batch_size = batch_size      # 每个tick并发的请求数，None 表示逐个请求模拟
+        self.record_paths = record_paths  # 是否记录每个请求的路径
+        # 以下参数仅用于离散事件模式
+        self.mode = mode                  # 'tick'（按请求推进，负载固定衰减）或 'event'（离散事件）
+        self.arrival = arrival            # 到达过程：'poisson'、'bursty' 或 'trace'
+        self.arrival_rate = arrival_rate  # 平均到达率（请求/秒）
+        self.burst_on = burst_on          # 突发模式 ON 期平均时长（秒）
+        self.burst_off = burst_off        # 突发模式 OFF 期平均时长（秒）
+        self.arrival_trace = arrival_trace  # trace 模式的时间戳列表（秒）或文件路径
+        self.service_rate = service_rate  # 节点服务速率（请求/秒），标量或每个节点一个值
+        self.service_dist = service_dist  # 服务时间分布：'exp'（指数）或 'det'（固定）
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+class SimulationResult:
+    """一次模拟的结构化结果"""
+    def __init__(self, load, pheromone, request_count, total_time, paths, entry_node, exit_node,
+                 latency=None):
+        self.load = load                      # 各节点最终负载
+        self.pheromone = pheromone            # 各节点最终信息素浓度
+        self.request_count = request_count    # 各节点被蚁群算法选中的次数
+        self.total_time = total_time          # 所有请求路径延迟之和（ms）
+        self.paths = paths                    # 每个请求的路径（未记录时为空列表）
+        self.entry_node = entry_node
+        self.exit_node = exit_node
+        self.latency = latency                # 离散事件模式下的延迟分位数与节点利用率，tick 模式为 None
+
+    def to_dict(self):
+        return {
+            'load': self.load.tolist(),
+            'pheromone': self.pheromone.tolist(),
+            'request_count': self.request_count.tolist(),
+            'total_time': float(self.total_time),
+            'paths': self.paths,
+            'entry_node': self.entry_node,
+            'exit_node': self.exit_node,
+            'latency': self.latency,
+        }
+
+def random_delay_matrix(num_nodes, low=50, high=200):
+    """使用全局 random 生成对称的随机延迟矩阵（模拟真实网络探测）"""
+    delay_matrix = np.zeros((num_nodes, num_nodes))
+    for i in range(num_nodes):
+        for j in range(i+1, num_nodes):
+            delay_matrix[i][j] = random.randint(low, high)
+            delay_matrix[j][i] = delay_matrix[i][j]
+        delay_matrix[i][i] = 0  # 节点到自身延迟为0
+    return delay_matrix
+
+# 离散事件类型
+_ARRIVAL, _HOP_DONE, _DEPARTURE = range(3)
+
+class Simulator:
+    """在给定拓扑上运行负载均衡模拟，导入本模块不会触发任何计算"""
+    def __init__(self, config, delay_matrix, entry_node=0, exit_node=None, state_factory=None):
+        self.config = config
+        self.delay_matrix = np.asarray(delay_matrix, dtype=np.float64)
+        self.num_nodes = len(self.delay_matrix)
+        self.entry_node = entry_node
+        self.exit_node = self.num_nodes - 1 if exit_node is None else exit_node
+        self.delay_graph = CSRGraph.from_matrix(self.delay_matrix)
+        self.sp_oracle = ShortestPathOracle(self.delay_graph, self.exit_node)
+        self.state_factory = state_factory or NodeState  # 节点数 -> 节点状态，多进程共享时传入 Controller.attach
+        self.nodes = None
+
+    def run(self, seed=None):
+        """执行一次模拟；seed 不为空时先重置 random 与 np.random 的全局种子"""
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+        config = self.config
+        self.nodes = self.state_factory(self.num_nodes)
+
+        latency = None
+        if config.mode == 'event':
+            total_time, paths, latency = self._run_events()
+        elif config.batch_size is not None:
+            total_time, paths = simulate_batched(
+                self.nodes, self.delay_matrix, self._next_hop_table(),
+                self.entry_node, self.exit_node, config.num_requests, config.batch_size,
+                config.alpha, config.beta, config.gamma, config.delta, config.rho, config.Q,
+                record_paths=config.record_paths)
+        else:
+            total_time, paths = self._run_sequential()
+        self.nodes.sync(force=True)  # 把尚未提交的更新写回共享存储
+
+        return SimulationResult(self.nodes.load.copy(), self.nodes.pheromone.copy(),
+                                self.nodes.request_count.copy(), total_time, paths,
+                                self.entry_node, self.exit_node, latency)
+
+    def _next_hop(self, current_node_id):
+        """最短路径上的下一跳"""
+        if self.config.sp_engine == 'oracle':
+            next_node_id = self.sp_oracle.next_hop(current_node_id)
+            return self.exit_node if next_node_id == -1 else next_node_id
+        shortest_path = find_shortest_path(current_node_id, self.exit_node, self.delay_matrix,
+                                           self.delay_graph, self.config.sp_engine)
+        return shortest_path[1] if len(shortest_path) > 1 else self.exit_node
+
+    def _next_hop_table(self):
+        """各节点的最短路径下一跳；与 _next_hop 使用同一引擎，批量模拟因而与逐个模拟的选择一致"""
+        if self.config.sp_engine == 'oracle':
+            return self.sp_oracle.next_hops
+        return [self._next_hop(u) for u in range(self.num_nodes)]
+
+    def _run_sequential(self):
+        """逐个请求模拟"""
+        config = self.config
+        nodes = self.nodes
+        delay_matrix = self.delay_matrix
+        entry_node, exit_node = self.entry_node, self.exit_node
+        relay = np.ones(self.num_nodes, dtype=bool)
+        relay[[entry_node, exit_node]] = False
+
+        total_time = 0.0
+        paths = []
+        for req_id in range(config.num_requests):
+            nodes.sync()
+            # 固定入口节点
+            current_node_id = entry_node
+            nodes[current_node_id].load += 1  # 入口节点负载增加
+
+            # 记录路径
+            path = [current_node_id]
+
+            # 使用蚁群算法和最短路径算法结合选择路径
+            while current_node_id != exit_node:
+                # 获取最短路径上的下一跳
+                next_node_id = self._next_hop(current_node_id)
+
+                # 使用蚁群算法选择下一个节点
+                next_node = select_next_node(current_node_id, nodes, delay_matrix,
+                                             config.alpha, config.beta, config.gamma, config.delta)
+
+                # 权衡最短路径和蚁群算法选择
+                if next_node.id != next_node_id:
+                    # 如果蚁群算法选择的节点与最短路径不同，比较延迟和负载
+                    acl_delay = delay_matrix[current_node_id][next_node.id]
+                    sp_delay = delay_matrix[current_node_id][next_node_id]
+
+                    if (acl_delay <= sp_delay * 1.2) and (next_node.load < nodes[next_node_id].load):
+                        # 蚁群算法选择的节点延迟和负载更优
+                        next_node_id = next_node.id
+
+                # 更新路径和当前节点
+                path.append(next_node_id)
+                current_node_id = next_node_id
+
+            # 更新负载和信息素
+            for i in range(len(path) - 1):
+                current = path[i]
+                next_node = path[i+1]
+                nodes[next_node].load += 1
+                update_pheromone(nodes[next_node], config.Q, delay_matrix[current][next_node],
+                                 nodes[next_node].load)
+
+            # 计算总用时
+            total_delay = sum(delay_matrix[path[i]][path[i+1]] for i in range(len(path)-1))
+            total_time += total_delay
+            if config.record_paths:
+                path = [int(n) for n in path]
+                paths.append(path)
+
+            # 定期挥发信息素
+            if req_id % 10 == 0:
+                evaporate_pheromone(nodes, config.rho)
+
+            # 模拟负载自然衰减（每秒处理0.3个请求）
+            nodes.decay_load(relay, 0.3)
+
+        return total_time, paths
+
+    def _service_times(self):
+        """各节点的平均服务时间（毫秒）"""
+        rate = np.broadcast_to(np.asarray(self.config.service_rate, dtype=np.float64), (self.num_nodes,))
+        if (rate <= 0).any():
+            raise ValueError("service_rate 必须为正数")
+        return 1000.0 / rate
+
+    def _run_events(self):
+        """离散事件模拟：每个节点是一个先到先服务的单服务台队列
+
+        事件堆中只有三类事件：请求到达某节点（_ARRIVAL）、在中继节点服务完成后转发
+        （_HOP_DONE）、在出口节点服务完成后离开网络（_DEPARTURE）。节点负载即事件时刻
+        在该节点排队或服务中的请求数，随到达和完成增减，空闲节点不参与任何事件。
+        节点的服务开始时刻取到达时刻与该节点上一请求完成时刻的较大者，因此排队时间
+        无需显式维护等待队列。返回 (总网络延迟, 路径列表, 延迟统计)。
+        """
+        config = self.config
+        nodes = self.nodes
+        delay_matrix = self.delay_matrix
+        entry_node, exit_node = self.entry_node, self.exit_node
+        rng = np.random.default_rng(np.random.randint(2 ** 32))  # 由全局种子派生，run(seed) 可复现
+        arrivals = arrival_times(config, rng).tolist()
+        num_requests = len(arrivals)
+        mean_service = self._service_times().tolist()
+        exponential = config.service_dist == 'exp'
+        if not exponential and config.service_dist != 'det':
+            raise ValueError(f"未知的服务时间分布: {config.service_dist}")
+
+        free_at = [0.0] * self.num_nodes   # 各节点服务台空闲的时刻
+        busy = [0.0] * self.num_nodes      # 各节点累计服务时间
+        queueing = [0.0] * num_requests    # 各请求累计排队时间
+        network_delay = [0.0] * num_requests
+        finish = [0.0] * num_requests
+        previous = [-1] * num_requests     # 各请求上一跳所在节点，-1 表示尚未进入网络
+        paths = [[entry_node] for _ in range(num_requests)] if config.record_paths else None
+
+        events = []
+        seq = 0
+        if num_requests:
+            heapq.heappush(events, (arrivals[0], seq, _ARRIVAL, 0, entry_node))
+
+        while events:
+            now, _, kind, req, node = heapq.heappop(events)
+            seq += 1
+
+            if kind == _ARRIVAL:
+                nodes.load[node] += 1
+                prev = previous[req]
+                if prev == -1:
+                    nodes.sync()
+                    # 外部到达：按需把下一个请求放入事件堆，堆的大小只与在途请求数有关
+                    if req + 1 < num_requests:
+                        heapq.heappush(events, (arrivals[req + 1], seq, _ARRIVAL, req + 1, entry_node))
+                    # 定期挥发信息素
+                    if req % 10 == 0:
+                        evaporate_pheromone(nodes, config.rho)
+                else:
+                    update_pheromone(nodes[node], config.Q, delay_matrix[prev][node], nodes.load[node])
+                service = rng.exponential(mean_service[node]) if exponential else mean_service[node]
+                start = max(now, free_at[node])
+                free_at[node] = start + service
+                busy[node] += service
+                queueing[req] += start - now
+                heapq.heappush(events, (start + service, seq,
+                                        _DEPARTURE if node == exit_node else _HOP_DONE, req, node))
+                continue
+
+            nodes.load[node] -= 1
+            if kind == _DEPARTURE:
+                finish[req] = now
+                continue
+
+            # 获取最短路径上的下一跳，并按当前在途负载用蚁群算法选择候选节点
+            next_node_id = self._next_hop(node)
+            next_node = select_next_node(node, nodes, delay_matrix,
+                                         config.alpha, config.beta, config.gamma, config.delta)
+            if next_node.id != next_node_id:
+                acl_delay = delay_matrix[node][next_node.id]
+                sp_delay = delay_matrix[node][next_node_id]
+                if (acl_delay <= sp_delay * 1.2) and (next_node.load < nodes[next_node_id].load):
+                    next_node_id = next_node.id
+
+            link_delay = float(delay_matrix[node][next_node_id])
+            network_delay[req] += link_delay
+            previous[req] = node
+            if paths is not None:
+                paths[req].append(int(next_node_id))
+            heapq.heappush(events, (now + link_delay, seq, _ARRIVAL, req, next_node_id))
+
+        end_to_end = np.array(finish) - np.array(arrivals)
+        duration = max(finish) if num_requests else 0.0
+        latency = {
+            'completed': num_requests,
+            'duration_ms': float(duration),
+            'throughput_rps': num_requests / duration * 1000 if duration > 0 else 0.0,
+            'end_to_end': latency_summary(end_to_end),
+            'queueing': latency_summary(queueing),
+            'network': latency_summary(network_delay),
+            'utilization': [b / duration if duration > 0 else 0.0 for b in busy],
+        }
+        return float(sum(network_delay)), paths or [], latency
+
+def print_report(result, delay_matrix):
+    """输出节点状态统计表"""
+    num_nodes = len(delay_matrix)
+    print("\n节点状态统计结果：")
+    print("节点ID | 负载 | 请求次数 | 平均延迟 ")
+    print("------------------------------------------------")
+    avg_delays = []
+    for node_id in range(num_nodes):
+        if node_id == result.entry_node or node_id == result.exit_node:
+            avg_delays.append(0)
+        else:
+            outgoing_delays = [delay_matrix[node_id][j] for j in range(num_nodes) if j != node_id]
+            avg_delay = np.mean(outgoing_delays) if outgoing_delays else 0
+            avg_delays.append(avg_delay)
+
+    for node_id in range(num_nodes):
+        load = float(result.load[node_id])
+        request_count = int(result.request_count[node_id])
+        if node_id == result.entry_node or node_id == result.exit_node:
+            print(f"{node_id:^6} | {'入口' if node_id == result.entry_node else '出口'}    "
+                  f" | {request_count:^8} | {avg_delays[node_id]:^8.2f}ms")
+        else:
+            print(f"{node_id:^6} | {load:^8.2f} | {request_count:^8} | {avg_delays[node_id]:^8.2f}ms")
+
+    print(f"\n总用时: {result.total_time:.2f}ms")
+
+    if result.latency:
+        latency = result.latency
+        print(f"\n完成请求: {latency['completed']}  模拟时长: {latency['duration_ms']:.2f}ms  "
+              f"吞吐量: {latency['throughput_rps']:.2f}请求/秒")
+        print("延迟类型 |   均值   |   P50    |   P95    |   P99    |   最大")
+        print("------------------------------------------------------------------")
+        for key, label in (('end_to_end', '端到端'), ('queueing', '排队'), ('network', '链路')):
+            stats = latency[key]
+            if stats:
+                print(f"{label:^6} | " + " | ".join(f"{stats[k]:>8.2f}" for k in
+                                                     ('mean', 'p50', 'p95', 'p99', 'max')))
+        print("节点利用率: " + "  ".join(f"{i}:{u:.0%}" for i, u in enumerate(latency['utilization'])))
+
+def main(config=None, seed=42):
+    config = config or SimulationConfig()
+
+    # 初始化随机种子
+    random.seed(seed)
+    np.random.seed(seed)
+
+    print("正在初始化网络延迟矩阵...")
+    delay_matrix = random_delay_matrix(config.num_nodes)
+
+    # 模拟请求处理过程
+    print("\n开始模拟负载均衡...")
+    result = Simulator(config, delay_matrix).run()
+
+    print_report(result, delay_matrix)
+    return result
+
+def parse_args(argv=None):
+    """命令行参数，缺省时与原来的逐请求模拟相同"""
+    import argparse
+    parser = argparse.ArgumentParser(description="蚁群算法负载均衡模拟")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--num-nodes', type=int, default=8)
+    parser.add_argument('--num-requests', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=None, help="tick 模式下每个tick并发的请求数")
+    parser.add_argument('--mode', choices=['tick', 'event'], default='tick',
+                        help="tick：每个请求后负载固定衰减；event：离散事件模拟真实到达与服务时间")
+    parser.add_argument('--arrival', choices=['poisson', 'bursty', 'trace'], default='poisson')
+    parser.add_argument('--rate', type=float, default=20.0, help="平均到达率（请求/秒）")
+    parser.add_argument('--burst-on', type=float, default=0.5, help="突发 ON 期平均时长（秒）")
+    parser.add_argument('--burst-off', type=float, default=2.0, help="突发 OFF 期平均时长（秒）")
+    parser.add_argument('--trace', default=None, help="trace 到达模式的时间戳文件")
+    parser.add_argument('--service-rate', type=float, nargs='+', default=[50.0],
+                        help="节点服务速率（请求/秒），给一个值时所有节点相同，否则每个节点一个值")
+    parser.add_argument('--service-dist', choices=['exp', 'det'], default='exp')
+    args = parser.parse_args(argv)
+    service_rate = args.service_rate[0] if len(args.service_rate) == 1 else args.service_rate
+    config = SimulationConfig(num_nodes=args.num_nodes, num_requests=args.num_requests,
+                              batch_size=args.batch_size, mode=args.mode, arrival=args.arrival,
+                              arrival_rate=args.rate, burst_on=args.burst_on, burst_off=args.burst_off,
+                              arrival_trace=args.trace, service_rate=service_rate,
+                              service_dist=args.service_dist)
+    return config, args.seed
 
-print(f"\n总用时: {total_time:.2f}ms")
\ No newline at end of file
+if __name__ == "__main__":
+    config, seed = parse_args()
+    main(config, seed)
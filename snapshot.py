@@ -0,0 +1,131 @@
+"""拓扑快照的紧凑二进制格式
+
+文件布局：8字节魔数 + 8字节小端头部长度 + JSON头部 + 按64字节对齐的数组数据。
+头部记录每个数组的 dtype、shape 和相对数据区起点的偏移，read_arrays 对每个数组
+直接 np.memmap，不解析也不复制数据。load_delay_matrix 返回的就是映射本身，多GB的
+矩阵可以瞬间打开，并由多个worker进程只读共享同一份页缓存；load_network 则要据此
+构建 SecureNetwork 的节点对象与邻接表，边数组整段拷入，不逐条解析。
+
+    save_network(network, 'topo.snet')
+    network = load_network('topo.snet')
+    save_delay_matrix(delay_matrix, 'delay.snet')
+    delay_matrix = load_delay_matrix('delay.snet')  # 只读 np.memmap
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b'ROUTESNP'
+VERSION = 1
+ALIGN = 64
+
+def _align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+def write_arrays(path, arrays, meta=None):
+    """把若干命名数组与元数据写入一个快照文件（先写临时文件再原子替换）"""
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    entries = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        entries[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes
+    header = json.dumps({'version': VERSION, 'meta': meta or {}, 'arrays': entries},
+                        ensure_ascii=False).encode('utf-8')
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + entries[name]['offset'])
+            array.tofile(f)
+    os.replace(tmp_path, path)
+
+def read_arrays(path, mmap=True):
+    """读取快照文件，返回 (数组字典, 元数据)；mmap 为 True 时数组为只读 np.memmap"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"不是拓扑快照文件: {path}")
+        (length,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(length).decode('utf-8'))
+    if header['version'] != VERSION:
+        raise ValueError(f"不支持的快照版本: {header['version']}")
+    data_start = _align(len(MAGIC) + 8 + length)
+
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        dtype = np.dtype(entry['dtype'])
+        shape = tuple(entry['shape'])
+        count = int(np.prod(shape))
+        offset = data_start + entry['offset']
+        if count == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+        elif mmap:
+            arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+        else:
+            arrays[name] = np.fromfile(path, dtype=dtype, count=count, offset=offset).reshape(shape)
+    return arrays, header['meta']
+
+def save_network(network, path, include_loads=True):
+    """保存 SecureNetwork：节点容量/安全等级、边端点/延迟/带宽，可选当前负载和布局坐标"""
+    node_ids = list(network.nodes)
+    nodes = [network.nodes[n] for n in node_ids]
+    edges = [(u, v, props) for (u, v), props in network.edge_props.items() if u < v]
+    arrays = {
+        'node_id': np.array(node_ids, dtype=np.int64),
+        'capacity': np.array([n.max_capacity for n in nodes], dtype=np.int64),
+        'security': np.array([n.security_level for n in nodes], dtype=np.int8),
+        'edge_u': np.array([u for u, _, _ in edges], dtype=np.int64),
+        'edge_v': np.array([v for _, v, _ in edges], dtype=np.int64),
+        'latency': np.array([p['latency'] for _, _, p in edges], dtype=np.float64),
+        'bandwidth': np.array([p['bandwidth'] for _, _, p in edges], dtype=np.float64),
+    }
+    if include_loads:
+        arrays['load'] = np.array([n.current_load for n in nodes], dtype=np.float64)
+    if network.pos is not None and len(network.pos) == len(node_ids):
+        arrays['pos'] = np.array([network.pos[n] for n in node_ids], dtype=np.float64)
+    write_arrays(path, arrays, {'kind': 'secure_network', 'layout_seed': network.layout_seed})
+
+def load_network(path, mmap=True):
+    """从快照重建 SecureNetwork（批量添加节点和边，只触发一次缓存失效）
+
+    边数组整段拷入 CompactGraph；每个节点仍需创建 SecureNode 和邻接表，耗时与节点数和边数成正比。
+    """
+    from new import SecureNetwork, SecureNode
+    arrays, meta = read_arrays(path, mmap)
+    if meta.get('kind') != 'secure_network':
+        raise ValueError(f"快照中不是 SecureNetwork: {path}")
+
+    node_ids = arrays['node_id'].tolist()
+    nodes = [SecureNode(n, capacity, security) for n, capacity, security in
+             zip(node_ids, arrays['capacity'].tolist(), arrays['security'].tolist())]
+    if 'load' in arrays:
+        for node, load in zip(nodes, arrays['load'].tolist()):
+            node.current_load = int(load) if load.is_integer() else load
+
+    network = SecureNetwork()
+    network.layout_seed = meta.get('layout_seed')
+    network.add_nodes(nodes)
+    # 边数组直接从映射拷入 CompactGraph，不经过逐条的Python对象；旧快照中带宽为 int64，同样适用
+    network.add_edge_arrays(arrays['edge_u'], arrays['edge_v'], arrays['latency'], arrays['bandwidth'])
+    if 'pos' in arrays:
+        network.pos = dict(zip(node_ids, np.array(arrays['pos'])))
+    return network
+
+def save_delay_matrix(delay_matrix, path):
+    """保存 route.py 的延迟矩阵"""
+    write_arrays(path, {'delay_matrix': np.asarray(delay_matrix, dtype=np.float64)},
+                 {'kind': 'delay_matrix'})
+
+def load_delay_matrix(path, mmap=True):
+    """读取延迟矩阵；mmap 为 True 时返回只读 np.memmap，可直接传给 route.Simulator"""
+    arrays, meta = read_arrays(path, mmap)
+    if meta.get('kind') != 'delay_matrix':
+        raise ValueError(f"快照中不是延迟矩阵: {path}")
+    return arrays['delay_matrix']
@@ -0,0 +1,417 @@
+"""Flask服务的网络状态管理
+
+NetworkStateManager 持有当前的 SecureNetwork：
+  - 寻路（会修改负载）在写锁内串行执行，保证“寻路 + update_load”是原子的；
+  - 只读接口使用写时复制的快照，快照按负载版本缓存，读请求之间互不阻塞；
+  - 渲染使用独立的锁和负载快照，绘图期间不阻塞寻路；渲染模块在首次渲染时才导入。
+给定 shared_name 时，拓扑种子和节点负载放在共享内存中，并用文件锁跨进程互斥，
+多个 gunicorn worker 因而看到同一份拓扑和负载。
+index_workers 大于0时，每次安装新网络或加边后都在后台构建延迟距离索引（大图的地标距离在
+这么多个进程的进程池中并行计算），构建完成后寻路自动改用A*。
+"""
+import fcntl
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from latency_index import ALL_PAIRS_LIMIT, can_build_index, mark_pool_worker
+from new import create_network
+from snapshot import load_network
+
+def build_network(seed):
+    """用给定种子确定性地构建网络（相同种子在任何进程中得到相同拓扑与布局）"""
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        network = create_network()
+    finally:
+        random.setstate(state)
+    network.layout_seed = seed
+    return network
+
+def snapshot_loader(path):
+    """从快照文件加载网络的工厂函数（忽略种子），各worker加载同一文件得到相同拓扑"""
+    def load(seed):
+        network = load_network(path)
+        if network.layout_seed is None:
+            network.layout_seed = seed
+        return network
+    return load
+
+class SharedLoads:
+    """共享内存中的负载表：int64头部 [代数, 拓扑种子, 负载版本, 节点数] + float64负载数组"""
+    HEADER = 4
+
+    def __init__(self, name, capacity=4096, create=False):
+        self.name = name
+        size = (self.HEADER + capacity) * 8
+        if create:
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+                self.shm.buf[:size] = bytes(size)
+            except FileExistsError:
+                self.shm = shared_memory.SharedMemory(name=name)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        # 共享段的生命周期由 close(unlink=True) 显式管理，避免某个worker退出时被资源追踪器回收
+        resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self.header = np.ndarray((self.HEADER,), dtype=np.int64, buffer=self.shm.buf)
+        self.loads = np.ndarray(((self.shm.size // 8) - self.HEADER,), dtype=np.float64,
+                                buffer=self.shm.buf, offset=self.HEADER * 8)
+        self._lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+
+    @property
+    def generation(self):
+        return int(self.header[0])
+
+    @property
+    def seed(self):
+        return int(self.header[1])
+
+    @property
+    def version(self):
+        return int(self.header[2])
+
+    @contextmanager
+    def locked(self):
+        """跨进程互斥（POSIX文件锁）"""
+        with open(self._lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield self
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def publish_topology(self, seed, num_nodes):
+        if num_nodes > len(self.loads):
+            raise ValueError(f"共享负载表容量不足: {num_nodes} > {len(self.loads)}")
+        self.loads[:num_nodes] = 0
+        self.header[1] = seed
+        self.header[2] += 1
+        self.header[3] = num_nodes
+        self.header[0] += 1
+
+    def close(self, unlink=False):
+        del self.header, self.loads
+        self.shm.close()
+        if unlink:
+            resource_tracker.register(self.shm._name, 'shared_memory')  # unlink() 会注销一次
+            self.shm.unlink()
+
+class TopologyView:
+    """某一拓扑版本下边属性和布局坐标的副本，在持锁时创建，拓扑不变时各快照共用"""
+    def __init__(self, network):
+        self.network = network
+        self.topology_version = network.topology_version
+        self.edges = [(u, v, props) for (u, v), props in network.edge_props.items() if u < v]
+        pos = network.pos
+        self.pos = dict(pos) if pos is not None and len(pos) == len(network.nodes) else None
+
+class NetworkSnapshot:
+    """某一拓扑版本和负载版本下网络状态的只读副本
+
+    创建时复制各节点负载，边属性和布局坐标取自同一拓扑版本的 TopologyView，
+    之后的加边和负载变化都不会反映到本快照中；status/graph 在首次访问时再生成。
+    layout 为尚无布局坐标时在持锁状态下计算布局的回调。
+    """
+    def __init__(self, network, topology, layout=None):
+        self.network = network
+        self.topology = topology
+        self.topology_version = topology.topology_version
+        self.load_version = network.load_version
+        self.loads = {n: node.current_load for n, node in network.nodes.items()}
+        self.load_ratios = {n: node.load_ratio for n, node in network.nodes.items()}
+        self._layout = layout or network.ensure_layout
+        self._status = None
+        self._graph = None
+
+    @property
+    def status(self):
+        if self._status is None:
+            self._status = {
+                'nodes': {
+                    node_id: {
+                        'security_level': node.security_level,
+                        'max_capacity': node.max_capacity,
+                        'current_load': self.loads[node_id],
+                        'load_ratio': self.load_ratios[node_id]
+                    }
+                    for node_id, node in self.network.nodes.items()
+                },
+                'edges': {
+                    f"{u}-{v}": {
+                        'latency': props['latency'],
+                        'bandwidth': props['bandwidth'],
+                        'security': props['security']
+                    }
+                    for u, v, props in self.topology.edges
+                }
+            }
+        return self._status
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            topology = self.topology
+            if topology.pos is None:
+                topology.pos = dict(self._layout())
+            self._graph = self.network.graph_data(loads=self.loads, load_version=self.load_version,
+                                                  edges=topology.edges, pos=topology.pos,
+                                                  topology_version=topology.topology_version)
+        return self._graph
+
+class ChangeFeed:
+    """增量变更事件队列，保留最近 history 条事件供断线重连补发"""
+    def __init__(self, history=1024):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=history)
+        self._last_id = 0
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, kind, data):
+        with self._cond:
+            self._last_id += 1
+            self._events.append((self._last_id, kind, data))
+            self._cond.notify_all()
+
+    def since(self, last_id, timeout=None):
+        """返回编号大于 last_id 的事件，没有新事件时最多等待 timeout 秒
+
+        请求的位置已被挤出历史，或超出最新编号（服务重启后客户端带着旧的 Last-Event-ID 重连）时
+        立即返回一条 reset 事件，客户端应重新拉取全量数据。
+        """
+        with self._cond:
+            if last_id > self._last_id:
+                return [(self._last_id, 'reset', {'reason': 'unknown_event_id'})]
+            self._cond.wait_for(lambda: self._last_id > last_id, timeout)
+            if self._events and self._events[0][0] > last_id + 1:
+                return [(self._last_id, 'reset', {'reason': 'history_truncated'})]
+            return [event for event in self._events if event[0] > last_id]
+
+class NetworkStateManager:
+    def __init__(self, shared_name=None, network_factory=build_network, index_workers=0):
+        self.network_factory = network_factory
+        self.index_workers = index_workers
+        self._index_pool = None  # 首次构建大图的索引时创建
+        self.network = None
+        self.renderer = None
+        self.feed = ChangeFeed()
+        self._published_loads = {}   # 已推送给订阅者的节点负载
+        self._pending_nodes = set()  # 本次写操作中负载可能变化的节点
+        self._pending_edges = []     # 本次写操作中新增的边
+        self._write_lock = threading.Lock()
+        self._render_lock = threading.Lock()
+        self._snapshot = None
+        self._topology = None  # 当前拓扑版本的 TopologyView
+        self._generation = 0
+        self._seen_version = -1
+        self.shared = SharedLoads(shared_name, create=True) if shared_name else None
+
+    @property
+    def initialized(self):
+        if self.shared is not None:
+            return self.shared.generation > 0
+        return self.network is not None
+
+    def reset(self, seed=None):
+        """构建新网络并替换当前网络（多进程模式下通知其他worker按同一种子重建）"""
+        seed = random.randrange(2 ** 31) if seed is None else seed
+        with self._exclusive():
+            self._reset(seed)
+        return seed
+
+    def ensure_initialized(self, seed=0):
+        """尚未初始化时按 seed 构建网络；多个线程或worker同时调用时只构建一次"""
+        if self.initialized:
+            return
+        with self._exclusive():
+            if not self.initialized:
+                self._reset(seed)
+
+    def _reset(self, seed):
+        self._install(self.network_factory(seed))
+        if self.shared is not None:
+            self.shared.publish_topology(seed, len(self.network.nodes))
+            self._generation = self.shared.generation
+            self._seen_version = self.shared.version
+
+    def _install(self, network):
+        self.network = network
+        self.renderer = None  # 首次渲染时创建
+        self._snapshot = None
+        self._published_loads = {n: node.current_load for n, node in network.nodes.items()}
+        self._pending_nodes.clear()
+        self._pending_edges.clear()
+        network.add_listener(self._on_network_event)
+        self.feed.publish('reset', {'topology_version': network.topology_version})
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        """在后台为当前拓扑构建延迟距离索引（持锁调用：边数组在调用时取出，计算在后台线程中进行）"""
+        if self.index_workers and can_build_index():
+            self.network.build_latency_index(self._index_executor(len(self.network.nodes)),
+                                             self.index_workers, background=True)
+
+    def _index_executor(self, num_nodes):
+        """构建索引用的进程池；全对距离由 NumPy 计算、不需要进程池，小图返回 None"""
+        if num_nodes <= ALL_PAIRS_LIMIT:
+            return None
+        if self._index_pool is None:
+            self._index_pool = ProcessPoolExecutor(self.index_workers,
+                                                   mp_context=multiprocessing.get_context('spawn'),
+                                                   initializer=mark_pool_worker)
+        return self._index_pool
+
+    def _on_network_event(self, event, payload):
+        if event == 'loads':
+            self._pending_nodes.update(payload)
+        elif event == 'edge':
+            self._pending_edges.append(payload)
+
+    def _flush_changes(self):
+        """把累积的变更整理成增量事件：只包含负载真正变化的节点和新增的边"""
+        network = self.network
+        if self._pending_edges:
+            added = []
+            for u, v in self._pending_edges:
+                props = network.edge_props[(u, v)]
+                added.append([u, v, props['latency'], props['bandwidth'], props['security']])
+            self._pending_edges.clear()
+            self.feed.publish('edges', {'topology_version': network.topology_version, 'added': added})
+        if self._pending_nodes:
+            changed = {}
+            for n in self._pending_nodes:
+                node = network.nodes[n]
+                if self._published_loads.get(n) != node.current_load:
+                    self._published_loads[n] = node.current_load
+                    changed[n] = [node.current_load, node.load_ratio]
+            self._pending_nodes.clear()
+            if changed:
+                self.feed.publish('loads', {'load_version': network.load_version, 'nodes': changed})
+
+    @contextmanager
+    def _exclusive(self):
+        with self._write_lock:
+            if self.shared is None:
+                yield
+            else:
+                with self.shared.locked():
+                    yield
+
+    def _sync_from_shared(self):
+        """在持锁状态下把共享内存中的拓扑和负载同步到本进程"""
+        shared = self.shared
+        if shared is None or shared.generation == 0:
+            return
+        if shared.generation != self._generation:
+            self._install(self.network_factory(shared.seed))
+            self._generation = shared.generation
+            self._seen_version = -1
+        if shared.version != self._seen_version:
+            loads = shared.loads
+            for i, node in enumerate(self.network.nodes.values()):
+                load = loads[i].item()
+                node.current_load = int(load) if load.is_integer() else load
+            self.network.refresh_loads()
+            self._seen_version = shared.version
+            self._snapshot = None
+            self._flush_changes()
+
+    def _publish_loads(self):
+        shared = self.shared
+        if shared is None:
+            return
+        shared.loads[:len(self.network.nodes)] = [n.current_load for n in self.network.nodes.values()]
+        shared.header[2] += 1
+        self._seen_version = shared.version
+
+    @contextmanager
+    def write(self):
+        """独占访问网络，期间的负载修改在退出时对其他线程/进程可见"""
+        with self._exclusive():
+            self._sync_from_shared()
+            if self.network is None:
+                raise RuntimeError('Network not initialized')
+            load_version = self.network.load_version
+            topology_version = self.network.topology_version
+            try:
+                yield self.network
+            finally:
+                if self.network.topology_version != topology_version:
+                    self._snapshot = None
+                    self._rebuild_index()  # 加边后旧索引作废
+                if self.network.load_version != load_version:
+                    self._snapshot = None
+                    self._publish_loads()
+                self._flush_changes()
+
+    def changes(self, last_id, timeout=15.0):
+        """等待编号大于 last_id 的变更事件；多进程模式下顺带拉取其他worker写入的负载"""
+        if self.shared is None:
+            return self.feed.since(last_id, timeout)
+        # 其他进程的写入不会唤醒本进程，按较短间隔轮询共享内存
+        deadline = time.monotonic() + timeout
+        while True:
+            events = self.feed.since(last_id, min(1.0, max(deadline - time.monotonic(), 0)))
+            if events or time.monotonic() >= deadline:
+                return events
+            if self.shared.generation > 0 and self.shared.version != self._seen_version:
+                with self._exclusive():
+                    self._sync_from_shared()
+
+    def snapshot(self):
+        """返回当前状态的只读快照；负载未变化时复用上一次的快照"""
+        snapshot = self._snapshot
+        if snapshot is not None and self.shared is None:
+            return snapshot
+        with self._exclusive():
+            self._sync_from_shared()
+            if self.network is None:
+                raise RuntimeError('Network not initialized')
+            if self._snapshot is None:
+                network = self.network
+                topology = self._topology
+                if (topology is None or topology.network is not network or
+                        topology.topology_version != network.topology_version):
+                    topology = self._topology = TopologyView(network)
+                self._snapshot = NetworkSnapshot(network, topology, lambda: self._layout(network))
+            return self._snapshot
+
+    def _layout(self, network):
+        """在持锁状态下计算布局坐标（同一网络只计算一次，之后直接返回）"""
+        with self._exclusive():
+            return network.ensure_layout()
+
+    def render(self, highlight_path=None):
+        """基于快照渲染图像，不持有写锁"""
+        snapshot = self.snapshot()
+        with self._render_lock:
+            return self._renderer_for(snapshot.network).render(
+                highlight_path, load_ratios=snapshot.load_ratios, load_version=snapshot.load_version)
+
+    def _renderer_for(self, network):
+        """与快照所属网络对应的渲染器（网络被替换后重新创建）"""
+        if self.renderer is None or self.renderer.network is not network:
+            from render import NetworkRenderer
+            self.renderer = NetworkRenderer(network)
+        return self.renderer
+
+    def close(self, unlink=False):
+        if self._index_pool is not None:
+            self._index_pool.shutdown(wait=False, cancel_futures=True)
+            self._index_pool = None
+        if self.shared is not None:
+            self.shared.close(unlink=unlink)
+            self.shared = None
@@ -0,0 +1,492 @@
+"""共享状态存储：多个路由进程通过它共享节点负载和信息素
+
+StateStore 以“哈希表名 -> {字段: 浮点数}”的形式保存状态，只提供批量接口，
+每次调用对应一次往返：
+  - increment({key: {field: delta}})   批量原子累加
+  - fetch([key, ...])                  批量读取整个哈希表
+  - exchange(increments, keys)         先累加再读取，一次往返完成一次同步
+  - store({key: {field: value}})       批量覆盖写入
+  - update(keys, func)                 读取 keys 后按 func 算出的值覆盖写入，读写整体原子
+  - delete(key, ...)
+
+两个后端：
+  MemoryStore  进程内字典，线程安全，用于单进程和测试；
+  RedisStore   Redis 协议（RESP）客户端，同一批命令包在 MULTI/EXEC 事务中一次写出、
+               一次读回（管线化），整体原子，不依赖 redis-py。没有 Redis 时可以用
+               LocalRedisServer 在本地起一个只实现所需命令的替身服务：
+
+    python store.py --port 6380
+"""
+import argparse
+import socket
+import socketserver
+import threading
+
+class StoreError(Exception):
+    """存储后端返回的错误"""
+
+class StateStore:
+    """状态存储接口"""
+    def increment(self, increments):
+        raise NotImplementedError
+
+    def fetch(self, keys):
+        raise NotImplementedError
+
+    def exchange(self, increments, keys):
+        raise NotImplementedError
+
+    def store(self, values):
+        raise NotImplementedError
+
+    def update(self, keys, func):
+        """读-改-写：func(读到的 {key: {field: value}}) 返回 (要覆盖写入的值, 结果)，返回该结果
+
+        读取与写入之间其他调用方的修改不会被覆盖：写入前发现冲突时重新读取并再次调用 func。
+        """
+        raise NotImplementedError
+
+    def delete(self, *keys):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class MemoryStore(StateStore):
+    """进程内后端：一把锁保护所有哈希表，每次调用整体原子"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def _increment(self, increments):
+        for key, fields in increments.items():
+            table = self._data.setdefault(key, {})
+            for field, delta in fields.items():
+                table[field] = table.get(field, 0.0) + delta
+
+    def increment(self, increments):
+        with self._lock:
+            self._increment(increments)
+
+    def fetch(self, keys):
+        with self._lock:
+            return {key: dict(self._data.get(key, {})) for key in keys}
+
+    def exchange(self, increments, keys):
+        with self._lock:
+            self._increment(increments)
+            return {key: dict(self._data.get(key, {})) for key in keys}
+
+    def _store(self, values):
+        for key, fields in values.items():
+            self._data.setdefault(key, {}).update({field: float(value) for field, value in fields.items()})
+
+    def store(self, values):
+        with self._lock:
+            self._store(values)
+
+    def update(self, keys, func):
+        with self._lock:
+            values, result = func({key: dict(self._data.get(key, {})) for key in keys})
+            self._store(values)
+        return result
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+# ---- RESP 协议 ----
+
+def encode_command(*args):
+    """把一条命令编码为 RESP 数组"""
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode('utf-8')
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+def read_reply(stream):
+    """从缓冲流读取一条 RESP 回复；错误回复以 StoreError 实例返回而不是抛出，便于读完整批回复"""
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("连接已关闭")
+    kind, body = line[:1], line[1:-2]
+    if kind == b'+':
+        return body.decode('utf-8')
+    if kind == b'-':
+        return StoreError(body.decode('utf-8'))
+    if kind == b':':
+        return int(body)
+    if kind == b'$':
+        length = int(body)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        return data[:-2]
+    if kind == b'*':
+        length = int(body)
+        if length < 0:
+            return None
+        return [read_reply(stream) for _ in range(length)]
+    raise StoreError(f"无法解析的回复: {line!r}")
+
+def _pairs(reply):
+    """HGETALL 的扁平回复 -> {字段: 浮点数}"""
+    return {reply[i].decode('utf-8'): float(reply[i + 1]) for i in range(0, len(reply), 2)}
+
+class RedisStore(StateStore):
+    """Redis 协议后端；一次调用的所有命令管线化发送，连接断开后下次调用自动重连
+
+    increment/fetch/exchange/store 的一批命令在 MULTI/EXEC 事务中执行，其他连接的命令
+    不会插入其中，例如一次同步读到的共享值与待处理维护量总是同一时刻的；update 用
+    WATCH 实现乐观事务，被监视的键在读写之间被修改时 EXEC 放弃写入，重新读取后再试。
+    """
+    def __init__(self, host='127.0.0.1', port=6379, db=0, timeout=5.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.timeout = timeout
+        self.round_trips = 0  # 已发生的网络往返次数
+        self._lock = threading.Lock()
+        self._sock = None
+        self._stream = None
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """redis://host:port/db"""
+        from urllib.parse import urlsplit
+        parts = urlsplit(url)
+        db = int(parts.path.lstrip('/') or 0)
+        return cls(parts.hostname or '127.0.0.1', parts.port or 6379, db, **kwargs)
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._stream = self._sock.makefile('rb')
+        if self.db:
+            self._roundtrip([('SELECT', self.db)])
+
+    def _roundtrip(self, commands):
+        self._sock.sendall(b''.join(encode_command(*command) for command in commands))
+        replies = [read_reply(self._stream) for _ in commands]
+        self.round_trips += 1
+        for reply in replies:
+            if isinstance(reply, StoreError):
+                raise reply
+        return replies
+
+    def execute(self, commands, atomic=False):
+        """管线化执行一批命令，返回各自的回复；atomic 为 True 时包在 MULTI/EXEC 事务中"""
+        if not commands:
+            return []
+        with self._lock:
+            if self._sock is None:
+                self._connect()
+            try:
+                if not atomic or len(commands) == 1:
+                    return self._roundtrip(commands)
+                replies = self._roundtrip([('MULTI',)] + list(commands) + [('EXEC',)])[-1]
+            except (OSError, ConnectionError):
+                self._close()
+                raise
+        if replies is None:
+            raise StoreError("事务被中止")
+        for reply in replies:
+            if isinstance(reply, StoreError):
+                raise reply
+        return replies
+
+    @staticmethod
+    def _increment_commands(increments):
+        return [('HINCRBYFLOAT', key, field, repr(float(delta)))
+                for key, fields in increments.items() for field, delta in fields.items()]
+
+    def increment(self, increments):
+        self.execute(self._increment_commands(increments), atomic=True)
+
+    def fetch(self, keys):
+        keys = list(keys)
+        replies = self.execute([('HGETALL', key) for key in keys], atomic=True)
+        return {key: _pairs(reply) for key, reply in zip(keys, replies)}
+
+    def exchange(self, increments, keys):
+        keys = list(keys)
+        commands = self._increment_commands(increments)
+        replies = self.execute(commands + [('HGETALL', key) for key in keys], atomic=True)
+        return {key: _pairs(reply) for key, reply in zip(keys, replies[len(commands):])}
+
+    @staticmethod
+    def _store_commands(values):
+        commands = []
+        for key, fields in values.items():
+            if fields:
+                args = [item for field, value in fields.items() for item in (field, repr(float(value)))]
+                commands.append(('HSET', key, *args))
+        return commands
+
+    def store(self, values):
+        self.execute(self._store_commands(values), atomic=True)
+
+    def update(self, keys, func):
+        keys = list(keys)
+        while True:
+            with self._lock:
+                if self._sock is None:
+                    self._connect()
+                try:
+                    replies = self._roundtrip([('WATCH', *keys)] + [('HGETALL', key) for key in keys])
+                    values, result = func({key: _pairs(reply) for key, reply in zip(keys, replies[1:])})
+                    commands = self._store_commands(values)
+                    if not commands:
+                        self._roundtrip([('UNWATCH',)])
+                        return result
+                    replies = self._roundtrip([('MULTI',)] + commands + [('EXEC',)])[-1]
+                except (OSError, ConnectionError):
+                    self._close()
+                    raise
+            if replies is not None:  # None 表示被监视的键已被修改，事务未执行
+                for reply in replies:
+                    if isinstance(reply, StoreError):
+                        raise reply
+                return result
+
+    def delete(self, *keys):
+        if keys:
+            self.execute([('DEL', *keys)])
+
+    def ping(self):
+        return self.execute([('PING',)])[0] == 'PONG'
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._stream.close()
+                self._sock.close()
+            finally:
+                self._sock = self._stream = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+# ---- 本地替身服务 ----
+
+def _encode_reply(value):
+    if isinstance(value, StoreError):
+        return b'-%s\r\n' % str(value).encode('utf-8')
+    if isinstance(value, str):
+        return b'+%s\r\n' % value.encode('utf-8')
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, bytes):
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    return b'*%d\r\n' % len(value) + b''.join(_encode_reply(item) for item in value)
+
+def _format_float(value):
+    return repr(value).encode('utf-8')
+
+def _parse_request(buffer, pos):
+    """从 buffer[pos:] 解析一条完整的 RESP 值，返回 (值, 新位置)；数据不完整时返回 None"""
+    end = buffer.find(b'\r\n', pos)
+    if end < 0:
+        return None
+    kind, body = buffer[pos:pos + 1], buffer[pos + 1:end]
+    pos = end + 2
+    if kind == b'$':
+        length = int(body)
+        if len(buffer) < pos + length + 2:
+            return None
+        return buffer[pos:pos + length], pos + length + 2
+    if kind == b'*':
+        items = []
+        for _ in range(int(body)):
+            parsed = _parse_request(buffer, pos)
+            if parsed is None:
+                return None
+            item, pos = parsed
+            items.append(item)
+        return items, pos
+    return body, pos  # 内联命令等简单值按原样返回
+
+class _RespHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        buffer = b''
+        while True:
+            try:
+                data = self.request.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            buffer += data
+            # 把已完整到达的整批命令处理完再一次写回，与真实 Redis 的管线化行为一致
+            replies = []
+            pos = 0
+            while True:
+                parsed = _parse_request(buffer, pos)
+                if parsed is None:
+                    break
+                command, pos = parsed
+                replies.append(server.dispatch(command))
+            buffer = buffer[pos:]
+            if replies:
+                self.request.sendall(b''.join(_encode_reply(reply) for reply in replies))
+
+class LocalRedisServer(socketserver.ThreadingTCPServer):
+    """只实现 RedisStore 所需命令（PING、SELECT、MULTI、EXEC、DISCARD、WATCH、UNWATCH、HSET、
+    HGET、HGETALL、HINCRBYFLOAT、DEL、FLUSHDB）的替身服务
+
+    所有命令在一把全局锁内执行，单条命令原子；MULTI 之后的命令排队，EXEC 时在同一次持锁中
+    依次执行，整个事务原子。每个键带一个修改版本号，WATCH 记下版本号，EXEC 时有被监视的键
+    已被修改则放弃整个事务并返回 nil。每个数据库编号一份独立数据。
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _RespHandler)
+        self._lock = threading.Lock()
+        self._databases = {}
+        self._versions = {}  # (数据库编号, 键) -> 修改版本号
+        self._db = threading.local()
+        self._thread = None
+
+    @property
+    def address(self):
+        return self.server_address[:2]
+
+    def dispatch(self, command):
+        if not isinstance(command, list) or not command:
+            return StoreError("ERR protocol error")
+        name = command[0].decode('utf-8').upper()
+        args = command[1:]
+        queued = getattr(self._db, 'queued', None)  # 每个连接由独立线程处理，线程局部即连接局部
+        if name == 'WATCH':
+            if queued is not None:
+                return StoreError("ERR WATCH inside MULTI is not allowed")
+            if not args:
+                return StoreError("ERR wrong number of arguments for 'watch' command")
+            with self._lock:
+                watched = getattr(self._db, 'watched', None) or {}
+                for key in args:
+                    watched.setdefault(key, self._versions.get(self._version_key(key), 0))
+                self._db.watched = watched
+            return 'OK'
+        if name == 'UNWATCH':
+            self._db.watched = None
+            return 'OK'
+        if name == 'MULTI':
+            if queued is not None:
+                return StoreError("ERR MULTI calls can not be nested")
+            self._db.queued = []
+            return 'OK'
+        if name == 'DISCARD':
+            if queued is None:
+                return StoreError("ERR DISCARD without MULTI")
+            self._db.queued = self._db.watched = None
+            return 'OK'
+        if name == 'EXEC':
+            if queued is None:
+                return StoreError("ERR EXEC without MULTI")
+            watched = getattr(self._db, 'watched', None) or {}
+            self._db.queued = self._db.watched = None
+            with self._lock:
+                if any(self._versions.get(self._version_key(key), 0) != version
+                       for key, version in watched.items()):
+                    return None
+                return [self._call(command_name, command_args) for command_name, command_args in queued]
+        if getattr(self, f"_cmd_{name.lower()}", None) is None:
+            return StoreError(f"ERR unknown command '{name}'")
+        if queued is not None:
+            queued.append((name, args))
+            return 'QUEUED'
+        with self._lock:
+            return self._call(name, args)
+
+    def _call(self, name, args):
+        handler = getattr(self, f"_cmd_{name.lower()}")
+        try:
+            return handler(self._databases.setdefault(getattr(self._db, 'index', 0), {}), *args)
+        except (TypeError, ValueError) as e:
+            return StoreError(f"ERR {e}")
+
+    def _version_key(self, key):
+        return getattr(self._db, 'index', 0), key
+
+    def _touch(self, *keys):
+        """记录键被修改（调用方持有全局锁）"""
+        for key in keys:
+            version_key = self._version_key(key)
+            self._versions[version_key] = self._versions.get(version_key, 0) + 1
+
+    def _cmd_ping(self, data):
+        return 'PONG'
+
+    def _cmd_select(self, data, index):
+        self._db.index = int(index)
+        return 'OK'
+
+    def _cmd_flushdb(self, data):
+        self._touch(*data)
+        data.clear()
+        return 'OK'
+
+    def _cmd_del(self, data, *keys):
+        self._touch(*keys)
+        return sum(data.pop(key, None) is not None for key in keys)
+
+    def _cmd_hset(self, data, key, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise ValueError("wrong number of arguments for 'hset' command")
+        self._touch(key)
+        table = data.setdefault(key, {})
+        added = 0
+        for i in range(0, len(pairs), 2):
+            added += pairs[i] not in table
+            table[pairs[i]] = pairs[i + 1]
+        return added
+
+    def _cmd_hget(self, data, key, field):
+        return data.get(key, {}).get(field)
+
+    def _cmd_hgetall(self, data, key):
+        return [item for pair in data.get(key, {}).items() for item in pair]
+
+    def _cmd_hincrbyfloat(self, data, key, field, delta):
+        self._touch(key)
+        table = data.setdefault(key, {})
+        value = float(table.get(field, b'0')) + float(delta)
+        table[field] = _format_float(value)
+        return table[field]
+
+    def start(self):
+        """在后台线程中开始服务，返回 (host, port)"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self.address
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 Redis 协议替身服务（仅实现共享状态所需的命令）")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    args = parser.parse_args()
+    server = LocalRedisServer(args.host, args.port)
+    print(f"监听 {args.host}:{server.address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""蚁群算法超参数扫描：在多个CPU核上并行运行 route.Simulator 并流式写出结果
+
+扫描规格（JSON）示例：
+    {"mode": "grid", "params": {"alpha": [0.4, 0.8], "rho": [0.6, 0.8, 0.9]}}
+    {"mode": "random", "samples": 1000,
+     "params": {"alpha": [0.1, 2.0], "delta": {"choices": [1, 2, 3]}}}
+网格模式下每个参数给出候选值列表；随机模式下 [low, high] 表示均匀分布区间，
+{"choices": [...]} 表示从离散候选值中抽取。
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from route import SimulationConfig, Simulator, random_delay_matrix
+from snapshot import load_delay_matrix
+
+SWEEP_PARAMS = ('alpha', 'beta', 'gamma', 'delta', 'rho', 'Q')
+
+def grid_points(params):
+    """笛卡尔积网格，按参数名排序保证运行编号稳定"""
+    names = sorted(params)
+    return [dict(zip(names, values)) for values in itertools.product(*(params[n] for n in names))]
+
+def random_points(params, samples, seed):
+    """随机搜索采样点"""
+    rng = np.random.default_rng(seed)
+    points = []
+    for _ in range(samples):
+        point = {}
+        for name in sorted(params):
+            spec = params[name]
+            if isinstance(spec, dict):
+                point[name] = spec['choices'][rng.integers(len(spec['choices']))]
+            else:
+                low, high = spec
+                point[name] = float(rng.uniform(low, high))
+        points.append(point)
+    return points
+
+def expand_spec(spec, seed=0):
+    """把扫描规格展开为参数点列表"""
+    params = spec['params']
+    unknown = set(params) - set(SWEEP_PARAMS)
+    if unknown:
+        raise ValueError(f"不支持扫描的参数: {sorted(unknown)}")
+    mode = spec.get('mode', 'grid')
+    if mode == 'grid':
+        return grid_points(params)
+    if mode == 'random':
+        return random_points(params, spec['samples'], seed)
+    raise ValueError(f"未知的扫描模式: {mode}")
+
+def run_seed(base_seed, run_id):
+    """每个运行编号对应的确定性种子，与调度顺序和进程数无关"""
+    return int(np.random.SeedSequence(base_seed, spawn_key=(run_id,)).generate_state(1)[0])
+
+def balance_metrics(result):
+    """根据中继节点的被选次数计算负载均衡指标"""
+    relay = [i for i in range(len(result.request_count))
+             if i not in (result.entry_node, result.exit_node)]
+    counts = result.request_count[relay].astype(np.float64)
+    mean = counts.mean() if counts.size else 0.0
+    if mean == 0:
+        return {'max_mean_ratio': 0.0, 'cv': 0.0, 'jain_index': 1.0, 'max_load': 0.0}
+    return {
+        'max_mean_ratio': float(counts.max() / mean),
+        'cv': float(counts.std() / mean),
+        'jain_index': float(counts.sum() ** 2 / (counts.size * (counts ** 2).sum())),
+        'max_load': float(result.load[relay].max()),
+    }
+
+# 工作进程内共享的拓扑与基础配置，由 _init_worker 设置一次
+_worker_delay_matrix = None
+_worker_base_config = None
+
+def _init_worker(delay_matrix, base_config):
+    global _worker_delay_matrix, _worker_base_config
+    if isinstance(delay_matrix, str):
+        delay_matrix = load_delay_matrix(delay_matrix)  # 各进程只读映射同一文件，不经过pickle复制
+    _worker_delay_matrix = delay_matrix
+    _worker_base_config = base_config
+
+def _run_point(run_id, point, seed):
+    config = dict(_worker_base_config, record_paths=False, **point)
+    result = Simulator(SimulationConfig.from_dict(config), _worker_delay_matrix).run(seed=seed)
+    row = {'run_id': run_id, 'seed': seed}
+    row.update(point)
+    row['total_time'] = float(result.total_time)
+    row.update(balance_metrics(result))
+    return row
+
+def _truncate_partial_line(output):
+    """截掉中断时写了一半的最后一行（截回最后一个换行符之后），续跑追加的新行才能独立成行"""
+    if not os.path.exists(output):
+        return
+    with open(output, 'rb+') as f:
+        size = pos = f.seek(0, os.SEEK_END)
+        end = 0
+        while pos > 0:
+            start = max(0, pos - 65536)
+            f.seek(start)
+            newline = f.read(pos - start).rfind(b'\n')
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            pos = start
+        if end < size:
+            f.truncate(end)
+
+def _completed_runs(output):
+    """读取已有输出文件中完成的运行编号，用于中断后续跑（应先经 _truncate_partial_line 处理）"""
+    if not os.path.exists(output):
+        return set()
+    with open(output, newline='', encoding='utf-8') as f:
+        if output.endswith('.csv'):
+            return {int(row['run_id']) for row in csv.DictReader(f)}
+        return {json.loads(line)['run_id'] for line in f if line.strip()}
+
+def _fingerprint(spec, base_config, base_seed, delay_matrix):
+    """扫描规格、基础配置、基础种子与延迟矩阵内容的摘要；相同摘要下运行编号对应的参数点和种子一致"""
+    if isinstance(delay_matrix, str):
+        delay_matrix = load_delay_matrix(delay_matrix)
+    matrix = np.ascontiguousarray(delay_matrix, dtype=np.float64)
+    payload = json.dumps({'spec': spec, 'base_config': base_config, 'base_seed': base_seed,
+                          'delay_matrix': [matrix.shape, hashlib.sha256(matrix.tobytes()).hexdigest()]},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _meta_path(output):
+    return output + '.meta.json'
+
+def _check_resume(output, fingerprint):
+    """续跑前确认已有输出由同一扫描产生，否则拒绝续跑，避免跳过未计算的运行或混入其他配置的结果"""
+    if not os.path.exists(output) or os.path.getsize(output) == 0:
+        return
+    try:
+        with open(_meta_path(output), encoding='utf-8') as f:
+            recorded = json.load(f).get('fingerprint')
+    except (OSError, ValueError):
+        recorded = None
+    if recorded != fingerprint:
+        raise ValueError(f"{output} 不是由相同的扫描规格、基础配置、种子和延迟矩阵生成的，"
+                         f"不能续跑；请换一个输出文件或使用 --no-resume 覆盖")
+
+def _write_meta(output, fingerprint):
+    with open(_meta_path(output), 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': fingerprint}, f)
+
+class _ResultWriter:
+    """按文件扩展名以JSONL或CSV格式逐行追加结果"""
+    def __init__(self, output):
+        self.is_csv = output.endswith('.csv')
+        write_header = self.is_csv and (not os.path.exists(output) or os.path.getsize(output) == 0)
+        self.file = open(output, 'a', newline='', encoding='utf-8')
+        self.csv_writer = None
+        self.write_header = write_header
+
+    def write(self, row):
+        if self.is_csv:
+            if self.csv_writer is None:
+                self.csv_writer = csv.DictWriter(self.file, fieldnames=list(row))
+                if self.write_header:
+                    self.csv_writer.writeheader()
+            self.csv_writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def run_sweep(spec, output, base_config=None, delay_matrix=None, workers=None,
+              base_seed=42, topology_seed=42, resume=True):
+    """并行执行扫描并把每个运行的结果在完成时立即写入 output
+
+    返回本次新完成的结果行列表。resume 为 True 时跳过输出文件中已有的运行编号；
+    输出文件旁的 <output>.meta.json 记录扫描的摘要，摘要不一致时拒绝续跑（抛出 ValueError）。
+    delay_matrix 可以是矩阵，也可以是 snapshot.save_delay_matrix 生成的文件路径。
+    """
+    base_config = (base_config or SimulationConfig()).to_dict()
+    if delay_matrix is None:
+        random.seed(topology_seed)
+        delay_matrix = random_delay_matrix(base_config['num_nodes'])
+
+    points = expand_spec(spec, seed=base_seed)
+    fingerprint = _fingerprint(spec, base_config, base_seed, delay_matrix)
+    if resume:
+        _check_resume(output, fingerprint)
+        _truncate_partial_line(output)
+    done = _completed_runs(output) if resume else set()
+    if not resume and os.path.exists(output):
+        os.remove(output)
+    _write_meta(output, fingerprint)
+    pending = [(run_id, point) for run_id, point in enumerate(points) if run_id not in done]
+
+    rows = []
+    writer = _ResultWriter(output)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(delay_matrix, base_config)) as pool:
+            futures = [pool.submit(_run_point, run_id, point, run_seed(base_seed, run_id))
+                       for run_id, point in pending]
+            for future in as_completed(futures):
+                row = future.result()
+                writer.write(row)
+                rows.append(row)
+    finally:
+        writer.close()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="蚁群算法超参数并行扫描")
+    parser.add_argument('spec', help="扫描规格JSON文件")
+    parser.add_argument('-o', '--output', default='sweep_results.jsonl',
+                        help="结果文件，.csv 结尾时写CSV，否则写JSONL")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="进程数，默认使用全部CPU核")
+    parser.add_argument('--seed', type=int, default=42, help="基础种子")
+    parser.add_argument('--num-requests', type=int, default=5000)
+    parser.add_argument('--num-nodes', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--delay-matrix', default=None,
+                        help="延迟矩阵快照文件（snapshot.save_delay_matrix），缺省时随机生成")
+    parser.add_argument('--no-resume', action='store_true', help="忽略并覆盖已有结果文件")
+    args = parser.parse_args()
+
+    with open(args.spec, encoding='utf-8') as f:
+        spec = json.load(f)
+    base_config = SimulationConfig(num_nodes=args.num_nodes, num_requests=args.num_requests,
+                                   batch_size=args.batch_size)
+    rows = run_sweep(spec, args.output, base_config=base_config, delay_matrix=args.delay_matrix,
+                     workers=args.workers, base_seed=args.seed, topology_seed=args.seed,
+                     resume=not args.no_resume)
+    print(f"完成 {len(rows)} 次运行，结果已写入 {args.output}")
+
+if __name__ == "__main__":
+    main()
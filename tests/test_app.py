@@ -0,0 +1,122 @@
+import json
+import os
+
+import pytest
+
+os.environ.setdefault('ROUTE_INDEX_WORKERS', '0')  # 测试中不启动索引进程池
+pytest.importorskip('flask')
+import app as server
+from new import DEFAULT_WEIGHTS
+from state import build_network
+
+SEED = 7
+
+@pytest.fixture
+def client():
+    client = server.app.test_client()
+    assert client.post('/api/network/init', json={'seed': SEED}).status_code == 200
+    return client
+
+def _loads(client):
+    nodes = client.get('/api/network/status').get_json()['nodes']
+    return {int(n): node['current_load'] for n, node in nodes.items()}
+
+def test_find_paths_matches_sequential_find_path(client):
+    """批量寻路与在同种子网络上逐个调用 find_path 的路径、代价和最终负载一致"""
+    reference = build_network(SEED)
+    pairs = [(0, 5), (3, 9), (5, 0), (2, 2), (7, 1), (0, 5)]
+    queries = [{'start': s, 'end': e} for s, e in pairs]
+    queries[1]['weights'] = {'latency': 1, 'load': 0, 'security': 0}
+
+    body = client.post('/api/network/find_paths', json={'requests': queries}).get_json()
+
+    for i, query in enumerate(queries):
+        path, cost = reference.find_path(query['start'], query['end'], query.get('weights', DEFAULT_WEIGHTS))
+        assert body['paths'][i] == path
+        assert body['costs'][i] == pytest.approx(cost)
+    assert _loads(client) == {n: node.current_load for n, node in reference.nodes.items()}
+
+def test_find_paths_from_ends_uses_loads_at_call_time(client):
+    """单源多目的：各条路径的代价都按调用时的负载计算，之后依次更新负载"""
+    ends = [5, 9, 1, 5]
+    body = client.post('/api/network/find_paths', json={'start': 0, 'ends': ends}).get_json()
+
+    reference = build_network(SEED)
+    for end, path, cost in zip(ends, body['paths'], body['costs']):
+        _, expected = build_network(SEED).find_path(0, end, DEFAULT_WEIGHTS)
+        assert cost == pytest.approx(expected)
+        assert path[0] == 0 and path[-1] == end
+        assert sum(reference.path_cost(u, v, DEFAULT_WEIGHTS) for u, v in zip(path, path[1:])) \
+            == pytest.approx(expected)
+    for path in body['paths']:
+        reference.update_load(path)
+    assert _loads(client) == {n: node.current_load for n, node in reference.nodes.items()}
+
+def test_find_paths_rejects_unknown_nodes(client):
+    """未知节点返回400且不修改负载"""
+    before = _loads(client)
+    response = client.post('/api/network/find_paths', json={'requests': [{'start': 0, 'end': 5},
+                                                                         {'start': 0, 'end': 999}]})
+    assert response.status_code == 400
+    assert client.post('/api/network/find_paths', json={'start': 999, 'ends': [1]}).status_code == 400
+    assert _loads(client) == before
+
+def test_graph_json_matches_status(client):
+    """/graph 的列式数据与 /status 描述同一份拓扑和负载，寻路后负载版本递增"""
+    client.post('/api/network/find_path?render=0', json={'start': 0, 'end': 5})
+    graph = client.get('/api/network/graph').get_json()
+    status = client.get('/api/network/status').get_json()
+
+    nodes, edges = graph['nodes'], graph['edges']
+    assert len({len(column) for column in nodes.values()}) == 1
+    assert len({len(column) for column in edges.values()}) == 1
+    assert sorted(nodes['id']) == sorted(int(n) for n in status['nodes'])
+    for i, n in enumerate(nodes['id']):
+        node = status['nodes'][str(n)]
+        assert nodes['current_load'][i] == node['current_load']
+        assert nodes['max_capacity'][i] == node['max_capacity']
+        assert nodes['security_level'][i] == node['security_level']
+    assert {f"{u}-{v}": {'latency': lat, 'bandwidth': bw, 'security': sec}
+            for u, v, lat, bw, sec in zip(edges['u'], edges['v'], edges['latency'],
+                                          edges['bandwidth'], edges['security'])} == status['edges']
+
+    client.post('/api/network/find_path?render=0', json={'start': 3, 'end': 9})
+    later = client.get('/api/network/graph').get_json()
+    assert later['load_version'] > graph['load_version']
+    assert later['topology_version'] == graph['topology_version']
+    assert (later['nodes']['x'], later['nodes']['y']) == (nodes['x'], nodes['y'])
+
+def _stream_events(response, count):
+    """从SSE响应中读取前 count 个事件，返回 [(id, event, data)]"""
+    events, chunks = [], iter(response.response)
+    while len(events) < count:
+        chunk = next(chunks)
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith(':'):
+            continue
+        fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+        events.append((fields.get('id'), fields['event'], json.loads(fields['data'])))
+    response.close()
+    return events
+
+def test_stream_resumes_from_last_event_id(client):
+    """带 Last-Event-ID 重连时补发断线期间的事件"""
+    last_id = server.state.feed.last_id
+    path = client.post('/api/network/find_path?render=0', json={'start': 0, 'end': 5}).get_json()['path']
+    client.post('/api/network/find_path?render=0', json={'start': 3, 'end': 9})
+
+    response = client.get('/api/network/stream', headers={'Last-Event-ID': str(last_id)})
+    assert response.mimetype == 'text/event-stream'
+    hello, first, second = _stream_events(response, 3)
+    assert hello == (None, 'hello', {'last_id': last_id})
+    assert (first[0], first[1]) == (str(last_id + 1), 'loads')
+    assert sorted(map(int, first[2]['nodes'])) == sorted(path)
+    assert second[0] == str(last_id + 2)
+
+    [_, event] = _stream_events(client.get(f'/api/network/stream?since={last_id + 100}'), 2)
+    assert event[1:] == ('reset', {'reason': 'unknown_event_id'})
+
+@pytest.mark.parametrize('headers, query', [({'Last-Event-ID': 'abc'}, ''), ({}, '?since=1.5')])
+def test_stream_rejects_malformed_event_id(client, headers, query):
+    response = client.get('/api/network/stream' + query, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import bench
+
+def test_seeded_topologies_are_reproducible():
+    """基准拓扑由种子确定：相同种子得到相同的延迟矩阵和图，不同种子不同"""
+    matrix = bench.delay_matrix(30, seed=4)
+    assert np.array_equal(matrix, bench.delay_matrix(30, seed=4))
+    assert not np.array_equal(matrix, bench.delay_matrix(30, seed=5))
+    assert np.array_equal(matrix, matrix.T) and not matrix.diagonal().any()
+
+    first, second = bench.secure_network(50, seed=4), bench.secure_network(50, seed=4)
+    assert first.edge_props == second.edge_props
+    assert [n.security_level for n in first.nodes.values()] == [n.security_level for n in second.nodes.values()]
+    assert len(first.edge_props) // 2 >= int(50 * bench.EDGE_FACTOR)  # 连通化可能补几条边
+
+    graph = bench.csr_graph(50, seed=4)
+    assert np.array_equal(graph.indptr, bench.csr_graph(50, seed=4).indptr)
+
+def test_run_benchmarks_smoke(capsys):
+    """小规模下各类用例都能在子进程中跑通，超出上限的用例记为 skipped"""
+    results = bench.run_benchmarks(['dijkstra_csr', 'find_path', 'api_find_paths'], ['20'], repeat=1)
+    for key in ('dijkstra_csr@20', 'find_path@20', 'api_find_paths@20'):
+        assert 'error' not in results[key], results[key]
+        assert results[key]['min_s'] <= results[key]['median_s']
+        assert results[key]['peak_rss_bytes'] > 0
+
+    skipped = bench.run_benchmarks(['draw_network'], ['10k'], repeat=1)
+    assert 'skipped' in skipped['draw_network@10k']
+
+def test_compare_flags_regressions():
+    baseline = {'results': {'a': {'median_s': 1.0, 'alloc_peak_bytes': 100},
+                            'b': {'median_s': 1.0, 'alloc_peak_bytes': 100},
+                            'c': {'skipped': 'x'}}}
+    current = {'results': {'a': {'median_s': 1.1, 'alloc_peak_bytes': 100},
+                           'b': {'median_s': 0.5, 'alloc_peak_bytes': 200},
+                           'c': {'median_s': 1.0, 'alloc_peak_bytes': 1}}}
+    rows, regressed = bench.compare(current, baseline)
+    assert regressed
+    assert [(row[0], row[-1]) for row in rows] == [('a', ''), ('b', 'REGRESSION')]
+    rows, regressed = bench.compare(baseline, baseline)
+    assert not regressed
@@ -0,0 +1,68 @@
+import random
+
+import numpy as np
+import pytest
+
+from controller import Controller, SharedNodeState
+from route import SimulationConfig, Simulator, random_delay_matrix
+from store import LocalRedisServer, RedisStore
+
+@pytest.fixture
+def store():
+    server = LocalRedisServer()
+    host, port = server.start()
+    store = RedisStore(host, port)
+    yield store
+    store.close()
+    server.stop()
+
+@pytest.mark.parametrize('batch_size', [None, 4])
+@pytest.mark.parametrize('maintain_every', [0, 1, 3])
+def test_single_worker_matches_local_state(store, batch_size, maintain_every):
+    """单个路由进程经共享存储运行的结果与本地 NodeState 一致：沉积不会被重复挥发或衰减
+
+    maintain_every 为每隔多少次同步执行一次控制器维护（0 表示只在结束时执行），
+    在确定的位置穿插维护，而不是依赖后台线程的时机。
+    """
+    random.seed(7)
+    delay_matrix = random_delay_matrix(8)
+    config = SimulationConfig(num_requests=600, batch_size=batch_size)
+    local = Simulator(config, delay_matrix).run(seed=42)
+
+    controller = Controller(store, namespace='test')
+    controller.initialize(8)
+
+    class MaintainedState(SharedNodeState):
+        def sync(self, force=False):
+            synced = super().sync(force)
+            if synced and maintain_every and self.syncs % maintain_every == 0:
+                controller.maintain()
+            return synced
+
+    shared = Simulator(config, delay_matrix,
+                       state_factory=lambda n: MaintainedState(n, store, 'test', max_staleness=0)).run(seed=42)
+    controller.stop()
+    snapshot = controller.snapshot()
+
+    assert shared.paths == local.paths
+    assert np.array_equal(shared.request_count, local.request_count)
+    for name in ('load', 'pheromone'):
+        assert np.allclose(getattr(shared, name), getattr(local, name), rtol=1e-9, atol=1e-9)
+        assert np.allclose(snapshot[name], getattr(local, name), rtol=1e-9, atol=1e-9)
+
+def test_update_retries_after_concurrent_write(store):
+    """update 读写之间有其他连接修改被监视的键时重新读取，不覆盖对方的写入"""
+    other = RedisStore(store.host, store.port)
+    store.store({'k': {'a': 1.0}})
+    seen = []
+
+    def apply(remote):
+        seen.append(remote['k']['a'])
+        if len(seen) == 1:
+            other.increment({'k': {'a': 2.0}})
+        return {'k': {'a': remote['k']['a'] * 10}}, len(seen)
+
+    assert store.update(['k'], apply) == 2
+    assert seen == [1.0, 3.0]
+    assert store.fetch(['k'])['k'] == {'a': 30.0}
+    other.close()
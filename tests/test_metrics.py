@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import metrics
+from metrics import Registry, SearchCounter
+from new import StepTracer
+from topology import generate_network
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_histogram_and_counter_render_prometheus_text():
+    registry = Registry()
+    histogram = registry.histogram('h_seconds', "耗时", ('kind',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, kind='a"b')
+    registry.counter('c_total', "计数").inc(2)
+
+    lines = registry.render().splitlines()
+    assert '# TYPE h_seconds histogram' in lines
+    assert [line for line in lines if line.startswith('h_seconds')] == [
+        'h_seconds_bucket{kind="a\\"b",le="0.1"} 2',
+        'h_seconds_bucket{kind="a\\"b",le="1.0"} 3',
+        'h_seconds_bucket{kind="a\\"b",le="+Inf"} 4',
+        'h_seconds_sum{kind="a\\"b"} 3.65',
+        'h_seconds_count{kind="a\\"b"} 4',
+    ]
+    assert 'c_total 2' in lines
+    assert registry.counter('c_total', "计数") is registry.counter('c_total', "")
+    with pytest.raises(ValueError):
+        registry.histogram('c_total', "")
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_search_counter_matches_step_tracer(seed, monkeypatch):
+    """计数追踪器统计的出堆、松弛次数与单步追踪器记录的过程一致"""
+    network = generate_network('er', seed=seed, num_nodes=60, num_edges=100)
+    weights = {'latency': 0.4, 'load': 0.4, 'security': 0.2}
+    observed = {}
+    monkeypatch.setattr(metrics.FIND_PATH_SETTLED, 'observe', lambda v, **_: observed.update(settled=v))
+    monkeypatch.setattr(metrics.FIND_PATH_RELAXATIONS, 'inc', lambda v, **_: observed.update(relaxed=v))
+
+    reference = StepTracer()
+    network.find_path(0, 59, weights, tracer=reference)
+    for n in network.nodes:  # 两次搜索使用相同的负载
+        network.nodes[n].current_load = 0
+    network.refresh_loads()
+    network.find_path(0, 59, weights, tracer=SearchCounter(network._adjacency))
+
+    assert observed['settled'] == len(reference.records)
+    assert observed['relaxed'] == sum(len(relaxed) for _, _, relaxed in reference.records)
+
+def _run_app(enabled):
+    """在新解释器中按 ROUTE_METRICS 启动 app，寻路一次后请求 /api/metrics"""
+    code = (
+        "import json, app\n"
+        "client = app.app.test_client()\n"
+        "client.post('/api/network/init', json={'seed': 3})\n"
+        "client.post('/api/network/find_path?render=0', json={'start': 0, 'end': 5})\n"
+        "response = client.get('/api/metrics')\n"
+        "print(json.dumps([response.status_code, response.get_data(as_text=True)]))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True,
+                            timeout=120, env=dict(os.environ, ROUTE_METRICS='1' if enabled else '0',
+                                                  ROUTE_INDEX_WORKERS='0'))
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_metrics_endpoint_exports_find_path_and_request_metrics():
+    pytest.importorskip('flask')
+    status, text = _run_app(enabled=True)
+    assert status == 200
+    lines = text.splitlines()
+    assert 'route_find_path_seconds_count{result="found"} 1' in lines
+    assert any(line.startswith('route_api_request_seconds_count{endpoint="find_path",method="POST",'
+                               'status="200"}') for line in lines)
+    assert any(line.startswith('route_api_phase_seconds_count{phase="routing"}') for line in lines)
+
+def test_metrics_disabled():
+    """未启用时接口返回404，timer/timed 不包装任何东西"""
+    pytest.importorskip('flask')
+    status, _ = _run_app(enabled=False)
+    assert status == 404
+    code = ("import metrics\n"
+            "func = lambda: None\n"
+            "assert metrics.timed(metrics.DIJKSTRA_SECONDS)(func) is func\n"
+            "assert metrics.timer(metrics.API_PHASE_SECONDS, phase='x') is metrics._NULL_TIMER\n")
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True,
+                            timeout=60, env=dict(os.environ, ROUTE_METRICS='0'))
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,210 @@
+import itertools
+import math
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+from new import CompactGraph, StepTracer
+from topology import generate_network
+
+WEIGHTS = {'latency': 0.4, 'load': 0.4, 'security': 0.2}
+
+def _static_graph(network, weights):
+    """与 k_shortest_paths 使用相同静态代价（延迟项和安全项）的 networkx 图"""
+    nx = pytest.importorskip('networkx')
+    graph = nx.Graph()
+    for (u, v), props in network.edge_props.items():
+        graph.add_edge(u, v, weight=props['latency'] * weights['latency'] +
+                       (4 - props['security']) * 10 * weights['security'])
+    return graph
+
+def _cost(graph, nodes):
+    return sum(graph[u][v]['weight'] for u, v in zip(nodes, nodes[1:]))
+
+@pytest.mark.parametrize('k', [1, 3, 6])
+def test_k_shortest_paths_matches_networkx(k):
+    """Yen算法的 k 条路径代价与 networkx.shortest_simple_paths 一致（并列时路径可以不同）"""
+    nx = pytest.importorskip('networkx')
+    network = generate_network('er', seed=11, num_nodes=60, num_edges=110)
+    graph = _static_graph(network, WEIGHTS)
+    rng = random.Random(k)
+    for _ in range(40):
+        start, end = rng.sample(list(network.nodes), 2)
+        result = network.k_shortest_paths(start, end, WEIGHTS, k)
+        expected = list(itertools.islice(nx.shortest_simple_paths(graph, start, end, 'weight'), k))
+
+        assert len(result) == len(expected)
+        for (nodes, _), reference in zip(result, expected):
+            assert nodes[0] == start and nodes[-1] == end
+            assert len(set(nodes)) == len(nodes)
+            assert math.isclose(_cost(graph, nodes), _cost(graph, reference))
+        assert len({tuple(nodes) for nodes, _ in result}) == len(result)
+
+@pytest.mark.parametrize('num_nodes', [100, 1000])  # 全对距离索引与地标索引
+def test_unknown_nodes_unreachable_with_and_without_index(num_nodes):
+    """起点或终点不存在时，无论延迟距离索引是否已构建都返回 (None, inf)"""
+    network = generate_network('er', seed=1, num_nodes=num_nodes, num_edges=2 * num_nodes)
+    pure_latency = {'latency': 1, 'load': 0, 'security': 0}
+    for built in (False, True):
+        if built:
+            network.build_latency_index()
+        for start, end in ((0, -1), (-1, 0)):
+            for weights in (WEIGHTS, pure_latency):
+                assert network.find_path(start, end, weights) == (None, math.inf)
+            assert network.find_path_astar(start, end, WEIGHTS) == (None, math.inf)
+
+def test_find_paths_from_treats_unknown_ids_as_unreachable():
+    """单源多目的寻路与 find_path 一致：未知的起点或终点返回 (None, inf)，不改变负载"""
+    network = generate_network('er', seed=2, num_nodes=30, num_edges=50)
+    loads = {n: node.current_load for n, node in network.nodes.items()}
+    assert network.find_paths_from(-1, [0, 5], WEIGHTS) == [(None, math.inf)] * 2
+    assert {n: node.current_load for n, node in network.nodes.items()} == loads
+
+    results = network.find_paths_from(0, [-1, 5], WEIGHTS)
+    assert results[0] == (None, math.inf)
+    assert results[1][0][0] == 0 and results[1][0][-1] == 5
+
+def test_snapshot_keeps_fractional_bandwidth(tmp_path):
+    """快照保存与加载后边属性不变，小数带宽不会被截断"""
+    from snapshot import load_network, save_network
+
+    network = generate_network('er', seed=3, num_nodes=20, num_edges=30)
+    network.add_edge(0, 19, 12.5, 150.75)
+    save_network(network, tmp_path / 'net.bin')
+    loaded = load_network(tmp_path / 'net.bin')
+    assert dict(loaded.edge_props.items()) == dict(network.edge_props.items())
+    assert loaded.edge_props[(0, 19)]['bandwidth'] == 150.75
+
+@pytest.mark.parametrize('offset', [0, 1000])  # 节点ID即编号，以及需要经过编号映射的ID
+def test_snapshot_load_matches_incremental_construction(tmp_path, offset):
+    """从快照批量加载的网络与逐条添加边构建的网络邻接表顺序一致，寻路结果相同"""
+    from new import SecureNetwork, SecureNode
+    from snapshot import load_network, save_network
+
+    source = generate_network('ba', seed=5, num_nodes=200, m=2)
+    network = SecureNetwork()
+    network.add_nodes(SecureNode(n + offset, node.max_capacity, node.security_level)
+                      for n, node in source.nodes.items())
+    network.add_edges((u + offset, v + offset, props['latency'], props['bandwidth'])
+                      for (u, v), props in source.edge_props.items() if u < v)
+    save_network(network, tmp_path / 'net.bin')
+    loaded = load_network(tmp_path / 'net.bin')
+
+    assert loaded.graph.adjacency == network.graph.adjacency
+    assert dict(loaded.edge_props.items()) == dict(network.edge_props.items())
+    rng = random.Random(offset)
+    for _ in range(30):
+        start, end = rng.sample(list(network.nodes), 2)
+        assert loaded.find_path(start, end, WEIGHTS) == network.find_path(start, end, WEIGHTS)
+
+def test_step_tracing_is_opt_in():
+    """默认不记录单步过程；trace=True 时结果不变，回放的最后一步停在终点且路径相同"""
+    plain = generate_network('er', seed=4, num_nodes=40, num_edges=80)
+    traced = generate_network('er', seed=4, num_nodes=40, num_edges=80)
+    rng = random.Random(4)
+    for _ in range(20):
+        start, end = rng.sample(list(plain.nodes), 2)
+        expected = plain.find_path(start, end, WEIGHTS)
+        assert plain.step_records == []
+
+        assert traced.find_path(start, end, WEIGHTS, trace=True) == expected
+        assert traced.step_records
+        if expected[0] is not None:
+            tracer = StepTracer()
+            tracer.start, tracer.records = start, traced.step_records
+            last = list(tracer.snapshots(traced.nodes))[-1]
+            assert last['current'] == end and last['path'] == expected[0]
+
+def _full_cost_graph(network, weights):
+    """按当前负载逐边调用 path_cost 得到的有向 networkx 图，作为 find_path 的参照"""
+    nx = pytest.importorskip('networkx')
+    graph = nx.DiGraph()
+    for u, v in network.edge_props:
+        graph.add_edge(u, v, weight=network.path_cost(u, v, weights))
+    return graph
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_find_path_matches_networkx_dijkstra(indexed):
+    """find_path（前驱表回溯；建有索引时为A*）与 find_path_astar 的代价与 networkx 的Dijkstra一致"""
+    nx = pytest.importorskip('networkx')
+    network = generate_network('ba', seed=8, num_nodes=80, m=2)
+    if indexed:
+        network.build_latency_index()
+    rng = random.Random(8)
+    for i in range(60):
+        start, end = rng.sample(list(network.nodes), 2)
+        graph = _full_cost_graph(network, WEIGHTS)
+        expected = nx.dijkstra_path_length(graph, start, end)
+        search = network.find_path_astar if i % 2 else network.find_path
+        path, cost = search(start, end, WEIGHTS)
+
+        assert path[0] == start and path[-1] == end
+        assert math.isclose(cost, expected)
+        assert math.isclose(sum(graph[u][v]['weight'] for u, v in zip(path, path[1:])), expected)
+
+def test_cached_edge_costs_follow_load_changes():
+    """缓存的边代价向量在负载变化后按节点增量刷新，始终与逐边计算的 path_cost 一致"""
+    network = generate_network('er', seed=6, num_nodes=50, num_edges=120)
+    other = {'latency': 1.0, 'load': 0.0, 'security': 0.5}
+    rng = random.Random(6)
+    for step in range(30):
+        start, end = rng.sample(list(network.nodes), 2)
+        network.find_path(start, end, WEIGHTS if step % 3 else other)
+        src, dst, _, _ = network.graph.directed_arrays()
+        ids = network.graph.nodes
+        for weights in (WEIGHTS, other):
+            costs, cost_list = network.edge_costs(weights)
+            assert cost_list == costs.tolist()  # find_path 遍历的列表副本与向量同步刷新
+            for eid, (u, v) in enumerate(zip(src.tolist(), dst.tolist())):
+                assert math.isclose(costs[eid], network.path_cost(ids[u], ids[v], weights))
+
+def _modules_after_import(module, statement=''):
+    """在新解释器中导入 module（再执行 statement）后已加载的模块名集合"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = f"import sys, {module}\n{statement}\nprint(' '.join(sys.modules))"
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True,
+                            timeout=120, env=dict(os.environ, ROUTE_INDEX_WORKERS='0'))
+    assert result.returncode == 0, result.stderr
+    return set(result.stdout.split())
+
+@pytest.mark.parametrize('module', ['new', 'state', 'app'])
+def test_import_does_not_load_plotting(module):
+    """导入时不加载 matplotlib、tabulate；寻路也不需要它们"""
+    loaded = _modules_after_import(module, "import topology; topology.generate_network('er', seed=1, "
+                                           "num_nodes=20, num_edges=35).find_path(0, 5, "
+                                           "{'latency': 0.4, 'load': 0.4, 'security': 0.2})")
+    assert not {'matplotlib', 'matplotlib.pyplot', 'tabulate'} & loaded
+
+def test_routing_core_does_not_load_networkx():
+    """寻路和批量建图只用 CompactGraph，不导入 networkx"""
+    loaded = _modules_after_import('topology', "topology.generate_network('ba', seed=1, num_nodes=200, m=2)"
+                                               ".find_path(0, 150, {'latency': 1, 'load': 1, 'security': 1})")
+    assert 'networkx' not in loaded
+
+def test_compact_graph_matches_networkx():
+    """CompactGraph 的节点、边、邻居与属性更新语义与 networkx.Graph 一致"""
+    nx = pytest.importorskip('networkx')
+    rng = random.Random(12)
+    graph, reference = CompactGraph(), nx.Graph()
+    graph.add_nodes_from(range(40))
+    reference.add_nodes_from(range(40))
+    for _ in range(150):
+        u, v = rng.sample(range(40), 2)
+        latency, bandwidth, security = rng.randint(10, 50), rng.choice([100, 200, 500]), rng.randint(1, 3)
+        k = graph.add_edge(u, v, latency, bandwidth, security)
+        reference.add_edge(u, v, latency=latency, bandwidth=bandwidth, security=security, k=k)
+
+    assert graph.number_of_nodes() == reference.number_of_nodes()
+    assert graph.number_of_edges() == reference.number_of_edges()
+    assert {frozenset(e) for e in graph.edges()} == {frozenset(e) for e in reference.edges()}
+    for u in range(40):
+        assert sorted(graph.neighbors(u)) == sorted(reference.neighbors(u))
+    for u, v, data in reference.edges(data=True):
+        assert graph.has_edge(u, v) and graph.has_edge(v, u)
+        assert graph.edge_attrs(data['k']) == {key: data[key] for key in ('latency', 'bandwidth', 'security')}
+    converted = graph.to_networkx()
+    assert set(converted.nodes) == set(reference.nodes)
+    assert {frozenset(e) for e in converted.edges} == {frozenset(e) for e in reference.edges}
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+pytest.importorskip('matplotlib')
+pytest.importorskip('PIL')
+from render import NetworkRenderer
+from state import build_network
+
+@pytest.fixture
+def network():
+    network = build_network(11)
+    network.ensure_layout()
+    return network
+
+def _fresh_render(network, path=None):
+    """不经缓存、从头绘制的参照图像"""
+    return NetworkRenderer(network).render(path)
+
+def test_render_cache_hits_only_for_identical_state(network):
+    """相同 (拓扑, 负载, 路径) 命中缓存，负载或路径变化后重新绘制"""
+    renderer = NetworkRenderer(network)
+    path, _ = network.find_path(0, 5, {'latency': 1, 'load': 0, 'security': 0})
+
+    image = renderer.render()
+    assert renderer.render() is image
+    assert len(renderer._cache) == 1
+
+    highlighted = renderer.render(path)
+    assert highlighted != image
+    assert renderer.render(list(path)) is highlighted
+
+    network.update_load(path)
+    loaded = renderer.render()
+    assert loaded != image
+    assert loaded == _fresh_render(network)
+    assert len(renderer._cache) == 3
+
+def test_background_redrawn_after_edge_added(network):
+    """加边后底图按新拓扑重绘，结果与新建渲染器一致"""
+    renderer = NetworkRenderer(network)
+    before = renderer.render()
+    version = renderer._background_version
+    u, v = next((u, v) for u in network.nodes for v in network.nodes
+                if u < v and not network.graph.has_edge(u, v))
+    network.add_edge(u, v, 10, 100)
+
+    after = renderer.render()
+    assert after != before
+    assert renderer._background_version != version
+    assert after == _fresh_render(network)
+
+def test_render_cache_is_bounded(network, monkeypatch):
+    """缓存超出 CACHE_SIZE 时淘汰最久未使用的结果"""
+    monkeypatch.setattr(NetworkRenderer, 'CACHE_SIZE', 2)
+    renderer = NetworkRenderer(network)
+    first = renderer.render([0])
+    renderer.render([1])
+    assert renderer.render([0]) is first  # 刷新 [0] 的使用时间
+    renderer.render([2])
+    key = (network.topology_version, network.load_version)
+    assert list(renderer._cache) == [key + ((0,),), key + ((2,),)]
+    assert renderer.render([0]) is first
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from new import DEFAULT_WEIGHTS
+from replay import InProcessTarget, arrival_offsets, read_requests, run_closed_loop, run_open_loop
+from state import build_network
+
+@pytest.fixture
+def trace(tmp_path):
+    records = [{'start': s, 'end': e, 'timestamp': 0.01 * i}
+               for i, (s, e) in enumerate([(0, 5), (3, 9), (5, 0), (7, 1), (2, 8), (0, 5)])]
+    records[2]['weights'] = {'latency': 1, 'load': 0, 'security': 0}
+    path = tmp_path / 'trace.jsonl'
+    lines = [json.dumps(r) for r in records]
+    lines[3:3] = ['', 'not json', '{"start": 1}', '[1, 2]']
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return path, records
+
+def test_read_requests_skips_invalid_lines(trace):
+    path, records = trace
+    assert list(read_requests(path)) == records
+    assert list(read_requests(path, limit=2)) == records[:2]
+
+def test_closed_loop_replay_matches_sequential_find_path(trace):
+    """单线程闭环回放后的负载与逐条调用 find_path 的结果一致"""
+    path, records = trace
+    target = InProcessTarget(seed=3)
+    report = run_closed_loop(target, read_requests(path), concurrency=1)
+
+    reference = build_network(3)
+    for record in records:
+        reference.find_path(record['start'], record['end'], record.get('weights', DEFAULT_WEIGHTS))
+    assert {n: node.current_load for n, node in target.manager.network.nodes.items()} == \
+        {n: node.current_load for n, node in reference.nodes.items()}
+    assert (report['requests'], report['errors']) == (len(records), 0)
+    assert report['p50_ms'] <= report['p99_ms'] <= report['max_ms']
+
+def test_concurrent_replay_counts_every_request_and_error(trace):
+    path, records = trace
+    records = records + [{'start': 0, 'end': 999}]
+    target = InProcessTarget(seed=3)
+    report = run_closed_loop(target, records * 5, concurrency=4)
+    assert (report['requests'], report['errors']) == (len(records) * 5, 5)
+    report = run_open_loop(target, records, concurrency=2, rate=2000, seed=1)
+    assert (report['requests'], report['errors']) == (len(records), 1)
+
+def test_arrival_offsets(trace):
+    """按 timestamp 回放时按 speed 缩放；按到达率生成时相同种子得到相同时间表"""
+    _, records = trace
+    assert [offset for offset, _ in arrival_offsets(records, speed=2.0)] == \
+        pytest.approx([0.005 * i for i in range(len(records))])
+    assert [offset for offset, _ in arrival_offsets(records, rate=100, poisson=False)] == \
+        pytest.approx([0.01 * i for i in range(len(records))])
+    poisson = [offset for offset, _ in arrival_offsets(records, rate=100, seed=5)]
+    assert poisson == [offset for offset, _ in arrival_offsets(records, rate=100, seed=5)]
+    assert poisson != [offset for offset, _ in arrival_offsets(records, rate=100, seed=6)]
+    assert poisson == sorted(poisson) and poisson[0] == 0.0
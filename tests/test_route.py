@@ -0,0 +1,172 @@
+import json
+import os
+import random
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from route import (CSRGraph, NodeState, ShortestPathOracle, SimulationConfig, Simulator,
+                   dijkstra_shortest_path, dijkstra_shortest_path_csr, random_delay_matrix, select_next_node)
+
+@pytest.fixture
+def delay_matrix():
+    random.seed(7)
+    return random_delay_matrix(8)
+
+def test_batch_size_one_matches_sequential(delay_matrix):
+    """批大小为1的批量模拟与逐个请求的模拟逐位一致"""
+    sequential = Simulator(SimulationConfig(num_requests=500), delay_matrix).run(seed=42)
+    batched = Simulator(SimulationConfig(num_requests=500, batch_size=1), delay_matrix).run(seed=42)
+
+    assert np.array_equal(batched.load, sequential.load)
+    assert np.array_equal(batched.pheromone, sequential.pheromone)
+    assert np.array_equal(batched.request_count, sequential.request_count)
+    assert batched.total_time == sequential.total_time
+    assert batched.paths == sequential.paths
+
+@pytest.mark.parametrize('seed', range(10))
+def test_engines_agree_on_tied_delays(seed):
+    """延迟取 1..5 时大量等长路径并列：默认引擎与 csr 逐位一致，批大小为1时也一致"""
+    random.seed(seed)
+    delay_matrix = random_delay_matrix(8, low=1, high=5)
+    dense = Simulator(SimulationConfig(num_requests=200), delay_matrix).run(seed=seed)
+    csr = Simulator(SimulationConfig(num_requests=200, sp_engine='csr'), delay_matrix).run(seed=seed)
+    batched = Simulator(SimulationConfig(num_requests=200, batch_size=1), delay_matrix).run(seed=seed)
+
+    assert csr.paths == dense.paths
+    assert batched.paths == dense.paths
+    assert np.array_equal(batched.load, dense.load)
+
+def _assert_matches_rebuild(oracle):
+    """距离与重新构建的最短路径树一致，且每个节点的下一跳都落在最短路径上"""
+    fresh = ShortestPathOracle(CSRGraph(oracle.graph.indptr, oracle.graph.indices,
+                                        oracle.graph.delays.copy()), oracle.root)
+    assert oracle.distance == fresh.distance
+    for u, hop in enumerate(oracle.next_hops):
+        if u == oracle.root or fresh.distance[u] == np.inf:
+            assert hop == -1
+        else:
+            assert oracle.distance[hop] + oracle.graph.delay(u, hop) == oracle.distance[u]
+
+@pytest.mark.parametrize('seed', range(5))
+def test_oracle_update_delay_matches_rebuild(seed):
+    """随机升高、降低边延迟后，增量修复的结果与整棵树重建一致"""
+    rng = np.random.default_rng(seed)
+    num_nodes = 30
+    matrix = rng.integers(1, 100, (num_nodes, num_nodes)).astype(np.float64)
+    matrix[rng.random((num_nodes, num_nodes)) < 0.8] = np.inf  # 稀疏有向图，部分节点可能不可达
+    oracle = ShortestPathOracle(CSRGraph.from_matrix(matrix), root=num_nodes - 1)
+    sources = np.repeat(np.arange(num_nodes), np.diff(oracle.graph.indptr))
+
+    for _ in range(200):
+        pos = int(rng.integers(oracle.graph.num_edges))
+        u, v = int(sources[pos]), int(oracle.graph.indices[pos])
+        old = oracle.graph.delay(u, v)
+        # 一半的修改针对当前树边，覆盖子树修复分支
+        if rng.random() < 0.5 and oracle.next_hops[u] != -1:
+            v = oracle.next_hops[u]
+            old = oracle.graph.delay(u, v)
+        delay = float(max(1, old + rng.integers(-60, 61)))
+        oracle.update_delay(u, v, delay)
+        _assert_matches_rebuild(oracle)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_csr_dijkstra_matches_dense_scan(seed):
+    """CSR邻接表的Dijkstra与稠密矩阵扫描对所有节点对给出相同路径（含不可达和等长并列）"""
+    rng = np.random.default_rng(seed)
+    num_nodes = 30
+    matrix = rng.integers(1, 6, (num_nodes, num_nodes)).astype(np.float64)  # 小范围延迟，大量并列
+    matrix = np.minimum(matrix, matrix.T)
+    matrix[rng.random((num_nodes, num_nodes)) < 0.8] = np.inf  # 稀疏、有向，部分节点对不可达
+    np.fill_diagonal(matrix, 0)
+    graph = CSRGraph.from_matrix(matrix)
+    for start in range(num_nodes):
+        for end in range(num_nodes):
+            assert dijkstra_shortest_path_csr(start, end, graph) == dijkstra_shortest_path(start, end, matrix)
+
+def test_csr_from_edges_matches_from_matrix(delay_matrix):
+    """从无向边列表构建的CSR图与从矩阵构建的相同"""
+    upper = np.triu_indices(len(delay_matrix), 1)
+    from_edges = CSRGraph.from_edges(len(delay_matrix), upper[0], upper[1], delay_matrix[upper])
+    from_matrix = CSRGraph.from_matrix(delay_matrix)
+    for name in ('indptr', 'indices', 'delays'):
+        assert np.array_equal(getattr(from_edges, name), getattr(from_matrix, name))
+
+def _reference_select(current_node_id, loads, pheromones, delay_matrix, alpha, beta, gamma, delta):
+    """原逐节点循环实现的 select_next_node（只返回选中的节点ID）"""
+    epsilon = 1e-5
+    candidates = [i for i in range(len(loads)) if i != current_node_id]
+    probabilities = []
+    for i in candidates:
+        heuristic = (alpha / (delay_matrix[current_node_id][i] + epsilon)) + (beta / (loads[i] + 1 + epsilon))
+        probabilities.append((pheromones[i] ** gamma) * (heuristic ** delta))
+    total = sum(probabilities)
+    return candidates[np.random.choice(len(candidates), p=[p / total for p in probabilities])]
+
+def test_vectorized_selection_matches_reference(delay_matrix):
+    """向量化的下一跳选择与原循环实现在相同随机种子下逐次选中同一节点，并累计被选次数"""
+    rng = np.random.default_rng(3)
+    state = NodeState(len(delay_matrix))
+    state.load[:] = rng.integers(0, 20, len(state))
+    state.pheromone[:] = rng.uniform(0.1, 5, len(state))
+    params = (0.8, 1.0, 0.5, 3)
+    loads, pheromones = state.load.tolist(), state.pheromone.tolist()
+
+    np.random.seed(11)
+    expected = [_reference_select(i % len(state), loads, pheromones, delay_matrix, *params) for i in range(400)]
+    np.random.seed(11)
+    selected = [select_next_node(i % len(state), state, delay_matrix, *params).id for i in range(400)]
+
+    assert selected == expected
+    assert np.array_equal(state.request_count, np.bincount(expected, minlength=len(state)))
+
+def test_import_runs_nothing():
+    """导入 route 不执行模拟、不输出任何内容"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', 'import route'], cwd=root,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0
+    assert result.stdout == ''
+
+def test_simulator_is_reproducible_and_serializable(delay_matrix):
+    """相同种子的两次运行结果相同，结果可序列化为JSON，配置可经 to_dict/from_dict 往返"""
+    config = SimulationConfig(num_requests=300, alpha=0.6, rho=0.7)
+    simulator = Simulator(config, delay_matrix)
+    first, second = simulator.run(seed=5).to_dict(), simulator.run(seed=5).to_dict()
+
+    assert first == second
+    assert json.loads(json.dumps(first)) == first
+    assert len(first['paths']) == 300
+    assert all(path[0] == 0 and path[-1] == len(delay_matrix) - 1 for path in first['paths'])
+    assert SimulationConfig.from_dict(config.to_dict()).to_dict() == config.to_dict()
+
+def test_event_mode_queueing_with_deterministic_service():
+    """两节点网络、两个请求同时到达、固定服务时间：第二个请求在入口排队一个服务时间"""
+    delay_matrix = np.array([[0.0, 40.0], [40.0, 0.0]])
+    config = SimulationConfig(num_requests=2, mode='event', arrival='trace', arrival_trace=[0.0, 0.0],
+                              service_rate=10.0, service_dist='det')  # 每个节点服务 100ms
+    result = Simulator(config, delay_matrix).run(seed=1)
+    latency = result.latency
+
+    assert result.paths == [[0, 1], [0, 1]]
+    assert result.total_time == 80.0
+    assert latency['completed'] == 2
+    assert latency['queueing']['max'] == 100.0 and latency['queueing']['mean'] == 50.0
+    assert latency['end_to_end']['max'] == 340.0  # 排队100 + 入口服务100 + 链路40 + 出口服务100
+    assert latency['duration_ms'] == 340.0
+    assert np.array_equal(result.load, [0, 0])
+
+@pytest.mark.parametrize('arrival', ['poisson', 'bursty'])
+def test_event_mode_completes_every_request(delay_matrix, arrival):
+    """离散事件模式下所有请求都从入口走到出口，结束时没有在途负载，结果可由种子复现"""
+    config = SimulationConfig(num_requests=300, mode='event', arrival=arrival)
+    simulator = Simulator(config, delay_matrix)
+    result = simulator.run(seed=9)
+
+    assert result.latency['completed'] == 300
+    assert all(path[0] == 0 and path[-1] == len(delay_matrix) - 1 for path in result.paths)
+    assert np.allclose(result.load, 0)
+    assert all(0 <= u <= 1 for u in result.latency['utilization'])
+    assert simulator.run(seed=9).to_dict() == result.to_dict()
@@ -0,0 +1,158 @@
+import multiprocessing
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from latency_index import can_build_index, mark_pool_worker
+from state import ChangeFeed, NetworkStateManager
+from topology import generate_network
+
+@pytest.fixture
+def state():
+    manager = NetworkStateManager(
+        network_factory=lambda seed: generate_network('er', seed=seed, num_nodes=30, num_edges=40))
+    manager.reset(seed=3)
+    yield manager
+    manager.close()
+
+def _missing_edge(network):
+    return next((u, v) for u in network.nodes for v in network.nodes
+                if u < v and not network.graph.has_edge(u, v))
+
+def test_snapshot_does_not_see_later_edges(state):
+    """快照创建后加的边不出现在该快照的 status/graph 中（首次访问在加边之后也一样）"""
+    pytest.importorskip('networkx')
+    snapshot = state.snapshot()
+    u, v = _missing_edge(state.network)
+    with state.write() as network:
+        network.add_edge(u, v, 10, 100)
+
+    assert f"{u}-{v}" not in snapshot.status['edges']
+    graph = snapshot.graph
+    assert (u, v) not in set(zip(graph['edges']['u'], graph['edges']['v']))
+    assert graph['topology_version'] == snapshot.topology_version
+
+    fresh = state.snapshot()
+    assert fresh is not snapshot
+    assert f"{u}-{v}" in fresh.status['edges']
+    assert (u, v) in set(zip(fresh.graph['edges']['u'], fresh.graph['edges']['v']))
+    assert fresh.graph['nodes']['x'] == graph['nodes']['x']  # 同一网络的布局只计算一次
+
+def test_change_feed_resumes_from_last_event_id():
+    """从任意已知编号续传时按顺序补发之后的全部事件"""
+    feed = ChangeFeed(history=8)
+    for i in range(5):
+        feed.publish('loads', {'i': i})
+    assert [data['i'] for _, _, data in feed.since(2)] == [2, 3, 4]
+    assert [event_id for event_id, _, _ in feed.since(0)] == [1, 2, 3, 4, 5]
+    assert feed.since(5, timeout=0) == []
+
+def test_change_feed_resets_when_history_is_truncated_or_id_unknown():
+    """续传位置已被挤出历史，或编号超出最新事件时返回 reset"""
+    feed = ChangeFeed(history=3)
+    for i in range(6):
+        feed.publish('loads', {'i': i})
+    assert feed.since(1) == [(6, 'reset', {'reason': 'history_truncated'})]
+    assert [data['i'] for _, _, data in feed.since(3)] == [3, 4, 5]  # 历史中最早的事件是4
+    assert feed.since(42) == [(6, 'reset', {'reason': 'unknown_event_id'})]
+
+def test_change_feed_wakes_waiting_reader():
+    feed = ChangeFeed()
+    timer = threading.Timer(0.05, feed.publish, args=('edges', {}))
+    timer.start()
+    assert feed.since(0, timeout=5) == [(1, 'edges', {})]
+    timer.join()
+
+def test_manager_publishes_only_changed_loads_and_added_edges(state):
+    """每次写操作发布一次增量：负载真正变化的节点和新增的边"""
+    last_id = state.feed.last_id
+    with state.write() as network:
+        path, _ = network.find_path(0, 5, {'latency': 1, 'load': 0, 'security': 0})
+    [(event_id, kind, data)] = state.changes(last_id, timeout=0)
+    assert kind == 'loads' and data['load_version'] == state.network.load_version
+    assert data['nodes'] == {n: [state.network.nodes[n].current_load, state.network.nodes[n].load_ratio]
+                             for n in path}
+
+    with state.write() as network:  # 负载写回原值：没有变化就不发布
+        for n in path:
+            network.nodes[n].current_load = network.nodes[n].current_load
+        network.refresh_loads()
+    assert state.changes(event_id, timeout=0) == []
+
+    u, v = _missing_edge(state.network)
+    with state.write() as network:
+        network.add_edge(u, v, 10, 100)
+    [(_, kind, data)] = state.changes(event_id, timeout=0)
+    props = state.network.edge_props[(u, v)]
+    assert kind == 'edges'
+    assert data == {'topology_version': state.network.topology_version,
+                    'added': [[u, v, 10, 100, props['security']]]}
+
+    state.reset(seed=4)
+    assert state.changes(event_id + 1, timeout=0)[-1][1] == 'reset'
+
+def test_concurrent_find_path_keeps_loads_consistent(state):
+    """多线程并发寻路时每次“寻路 + update_load”都是原子的，最终负载等于各路径负载增量之和"""
+    weights = {'latency': 0.4, 'load': 0.4, 'security': 0.2}
+    nodes = list(state.network.nodes)
+    paths, snapshots = [], []
+
+    def worker(offset):
+        for i in range(25):
+            start, end = nodes[(offset + i) % len(nodes)], nodes[(offset * 7 + i * 3 + 1) % len(nodes)]
+            with state.write() as network:
+                path, _ = network.find_path(start, end, weights)
+            if path:
+                paths.append(path)
+            snapshots.append(state.snapshot())
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counts = Counter(n for path in paths for n in path)
+    network = state.network
+    assert {n: node.current_load for n, node in network.nodes.items()} == \
+        {n: min(3 * counts[n], node.max_capacity) for n, node in network.nodes.items()}
+    for snapshot in snapshots:  # 快照内各节点负载同属一个负载版本
+        assert sum(snapshot.loads.values()) <= sum(node.current_load for node in network.nodes.values())
+        assert all(snapshot.load_ratios[n] == snapshot.loads[n] / network.nodes[n].max_capacity
+                   for n in snapshot.loads)
+    assert state.snapshot().loads == {n: node.current_load for n, node in network.nodes.items()}
+
+def test_index_rebuilt_after_edge_added():
+    """加边使旧索引作废后，管理器在后台为新拓扑重新构建索引"""
+    state = NetworkStateManager(
+        network_factory=lambda seed: generate_network('er', seed=seed, num_nodes=40, num_edges=60),
+        index_workers=1)
+    try:
+        state.reset(seed=5)
+        _wait_for_index(state.network)
+        u, v = _missing_edge(state.network)
+        with state.write() as network:
+            network.add_edge(u, v, 1, 100)
+            assert network.latency_index is None
+        index = _wait_for_index(state.network)
+        assert index.distance(state.network.graph.index[u], state.network.graph.index[v]) == 1
+    finally:
+        state.close()
+
+def _wait_for_index(network, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while network.latency_index is None:
+        assert time.monotonic() < deadline, "索引未在限定时间内构建完成"
+        time.sleep(0.01)
+    return network.latency_index
+
+@pytest.mark.parametrize('initializer, expected', [(None, True), (mark_pool_worker, False)])
+def test_only_index_pool_workers_skip_index_builds(initializer, expected):
+    """普通子进程（如 sweep 的worker）可以构建索引，只有索引进程池自己的worker不构建"""
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=initializer) as pool:
+        assert pool.submit(can_build_index).result() is expected
+    assert can_build_index()
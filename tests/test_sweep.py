@@ -0,0 +1,86 @@
+import csv
+import json
+import random
+
+import pytest
+
+from route import SimulationConfig, random_delay_matrix
+from sweep import expand_spec, run_seed, run_sweep
+
+SPEC = {'mode': 'grid', 'params': {'alpha': [0.4, 0.8], 'rho': [0.6, 0.9]}}
+CONFIG = SimulationConfig(num_nodes=6, num_requests=40)
+
+def _read(output):
+    """按运行编号读出结果文件中的各行"""
+    with open(output, newline='', encoding='utf-8') as f:
+        if str(output).endswith('.csv'):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f]
+    return {int(row['run_id']): row for row in rows}
+
+@pytest.fixture(params=['jsonl', 'csv'])
+def reference(request, tmp_path):
+    """不中断运行完整扫描得到的参照结果"""
+    output = str(tmp_path / f'full.{request.param}')
+    run_sweep(SPEC, output, base_config=CONFIG, workers=1)
+    return output
+
+def test_resume_after_partial_line_matches_full_run(reference, tmp_path):
+    """中断时最后一行只写了一半：续跑截掉半行、只补算缺失的运行，结果与完整运行一致"""
+    with open(reference, encoding='utf-8') as f:
+        lines = f.readlines()
+    keep = 3 if reference.endswith('.csv') else 2  # CSV 多一行表头
+    output = str(tmp_path / ('partial' + reference[reference.rfind('.'):]))
+    with open(output, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:keep])
+        f.write(lines[keep][:len(lines[keep]) // 2])
+    with open(reference + '.meta.json', encoding='utf-8') as f:
+        meta = f.read()
+    with open(output + '.meta.json', 'w', encoding='utf-8') as f:
+        f.write(meta)
+
+    rows = run_sweep(SPEC, output, base_config=CONFIG, workers=1)
+    assert sorted(row['run_id'] for row in rows) == [2, 3]
+    assert _read(output) == _read(reference)
+
+def test_resume_rejects_output_from_another_sweep(reference):
+    """摘要不一致（种子、规格或配置不同，或缺少元数据文件）时拒绝续跑，--no-resume 可覆盖"""
+    with pytest.raises(ValueError):
+        run_sweep(SPEC, reference, base_config=CONFIG, workers=1, base_seed=7)
+    with pytest.raises(ValueError):
+        run_sweep(dict(SPEC, params={'alpha': [0.4]}), reference, base_config=CONFIG, workers=1)
+    with pytest.raises(ValueError):
+        run_sweep(SPEC, reference, base_config=SimulationConfig(num_nodes=6, num_requests=41), workers=1)
+    assert len(_read(reference)) == 4
+
+    assert run_sweep(SPEC, reference, base_config=CONFIG, workers=1) == []  # 同一扫描：全部已完成
+    rows = run_sweep(SPEC, reference, base_config=CONFIG, workers=1, base_seed=7, resume=False)
+    assert len(rows) == 4 and len(_read(reference)) == 4
+
+def test_results_do_not_depend_on_worker_count(tmp_path):
+    """每个运行的种子只由运行编号决定，进程数不影响结果"""
+    serial, parallel = str(tmp_path / 'serial.jsonl'), str(tmp_path / 'parallel.jsonl')
+    run_sweep(SPEC, serial, base_config=CONFIG, workers=1)
+    run_sweep(SPEC, parallel, base_config=CONFIG, workers=2)
+    assert _read(serial) == _read(parallel)
+    assert {row['seed'] for row in _read(serial).values()} == {run_seed(42, i) for i in range(4)}
+
+def test_explicit_delay_matrix_changes_fingerprint(tmp_path):
+    output = str(tmp_path / 'out.jsonl')
+    random.seed(1)
+    matrix = random_delay_matrix(6)
+    run_sweep(SPEC, output, base_config=CONFIG, delay_matrix=matrix, workers=1)
+    matrix[0, 1] = matrix[1, 0] = matrix[0, 1] + 1
+    with pytest.raises(ValueError):
+        run_sweep(SPEC, output, base_config=CONFIG, delay_matrix=matrix, workers=1)
+
+def test_expand_spec():
+    assert expand_spec(SPEC) == [{'alpha': 0.4, 'rho': 0.6}, {'alpha': 0.4, 'rho': 0.9},
+                                 {'alpha': 0.8, 'rho': 0.6}, {'alpha': 0.8, 'rho': 0.9}]
+    spec = {'mode': 'random', 'samples': 5, 'params': {'alpha': [0.1, 2.0], 'delta': {'choices': [1, 2]}}}
+    points = expand_spec(spec, seed=3)
+    assert points == expand_spec(spec, seed=3) and points != expand_spec(spec, seed=4)
+    assert all(0.1 <= p['alpha'] <= 2.0 and p['delta'] in (1, 2) for p in points)
+    with pytest.raises(ValueError):
+        expand_spec({'params': {'unknown': [1]}})
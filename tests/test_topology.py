@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from topology import connected_components, generate_edges, generate_network
+
+CASES = [
+    ('er', {'num_nodes': 500, 'num_edges': 300}),  # 稀疏，生成时有大量孤立分量
+    ('er', {'num_nodes': 60, 'p': 0.5}),           # 稠密分支
+    ('ba', {'num_nodes': 500, 'm': 2}),
+    ('grid', {'rows': 7, 'cols': 9}),
+    ('fat_tree', {'k': 4}),
+]
+
+def _is_connected(num_nodes, u, v):
+    return len(np.unique(connected_components(num_nodes, u, v))) == 1
+
+@pytest.mark.parametrize('kind, params', CASES)
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_generated_edges_are_simple_and_connected(kind, params, seed):
+    """生成的边无自环、无重边，connected=True 时整图连通（与 networkx 的判断一致）"""
+    nx = pytest.importorskip('networkx')
+    num_nodes, u, v = generate_edges(kind, np.random.default_rng(seed), **params)
+    pairs = set(zip(np.minimum(u, v).tolist(), np.maximum(u, v).tolist()))
+
+    assert (u != v).all()
+    assert len(pairs) == len(u)
+    assert _is_connected(num_nodes, u, v)
+    graph = nx.Graph()
+    graph.add_nodes_from(range(num_nodes))
+    graph.add_edges_from(pairs)
+    assert nx.is_connected(graph)
+
+def test_connected_components_matches_networkx():
+    nx = pytest.importorskip('networkx')
+    num_nodes, u, v = generate_edges('er', np.random.default_rng(5), connected=False,
+                                     num_nodes=300, num_edges=200)
+    graph = nx.Graph()
+    graph.add_nodes_from(range(num_nodes))
+    graph.add_edges_from(zip(u.tolist(), v.tolist()))
+    labels = connected_components(num_nodes, u, v)
+    for component in nx.connected_components(graph):
+        assert set(labels[list(component)].tolist()) == {min(component)}
+
+def test_generator_sizes():
+    """不补边时 ER 的边数精确；网格与胖树的节点数和边数符合定义"""
+    rng = np.random.default_rng(0)
+    assert len(generate_edges('er', rng, connected=False, num_nodes=200, num_edges=150)[1]) == 150
+    num_nodes, u, _ = generate_edges('grid', rng, rows=7, cols=9)
+    assert (num_nodes, len(u)) == (63, 2 * 7 * 9 - 7 - 9)
+    num_nodes, u, _ = generate_edges('fat_tree', rng, k=4)
+    assert (num_nodes, len(u)) == (4 + 8 + 8 + 16, 16 + 16 + 16)
+
+def test_generate_network_is_reproducible():
+    """相同种子得到相同的节点与边属性；布局种子限制在 32 位内"""
+    first = generate_network('ba', seed=2 ** 40 + 7, num_nodes=200, m=3)
+    second = generate_network('ba', seed=2 ** 40 + 7, num_nodes=200, m=3)
+    assert dict(first.edge_props.items()) == dict(second.edge_props.items())
+    assert [(n.max_capacity, n.security_level) for n in first.nodes.values()] == \
+           [(n.max_capacity, n.security_level) for n in second.nodes.values()]
+    assert first.layout_seed == (2 ** 40 + 7) % 2 ** 32
@@ -0,0 +1,185 @@
+"""大规模网络拓扑生成
+
+各生成函数用 NumPy 批量产生无向边数组 (u, v)（u < v，无重边、无自环），
+populate_network 再把节点和边属性一次性写入 SecureNetwork。节点容量、安全等级、
+边延迟和带宽的分布与 create_network 原来的设定一致。
+
+    network = generate_network('ba', seed=1, num_nodes=100000, m=2)
+    network = generate_network('grid', seed=1, rows=300, cols=300)
+"""
+import numpy as np
+
+from new import SecureNetwork, SecureNode
+
+def _canonical(u, v, num_nodes):
+    """去掉自环、统一为 u < v 并去重，保留每条边首次出现的顺序"""
+    u = np.asarray(u, dtype=np.int64)
+    v = np.asarray(v, dtype=np.int64)
+    keep = u != v
+    lo, hi = np.minimum(u[keep], v[keep]), np.maximum(u[keep], v[keep])
+    _, first = np.unique(lo * num_nodes + hi, return_index=True)
+    first.sort()
+    return lo[first], hi[first]
+
+def erdos_renyi_edges(num_nodes, rng, num_edges=None, p=None):
+    """G(n, m) 随机图；给出 p 时边数按二项分布抽取，等价于 G(n, p)"""
+    max_edges = num_nodes * (num_nodes - 1) // 2
+    if num_edges is None:
+        if p is None:
+            raise ValueError("需要指定 num_edges 或 p")
+        num_edges = int(rng.binomial(max_edges, p))
+    if num_edges > max_edges:
+        raise ValueError(f"边数 {num_edges} 超过 {num_nodes} 个节点的完全图边数 {max_edges}")
+
+    if num_edges * 2 > max_edges:
+        # 稠密图：直接从全部节点对中无放回抽取
+        u, v = np.triu_indices(num_nodes, 1)
+        chosen = rng.choice(max_edges, size=num_edges, replace=False)
+        return u[chosen].astype(np.int64), v[chosen].astype(np.int64)
+
+    # 稀疏图：成批抽取节点对，去重后不足再补抽
+    u = np.empty(0, dtype=np.int64)
+    v = np.empty(0, dtype=np.int64)
+    while len(u) < num_edges:
+        need = num_edges - len(u)
+        batch = int(need * 1.1) + 16
+        u, v = _canonical(np.concatenate([u, rng.integers(0, num_nodes, batch)]),
+                          np.concatenate([v, rng.integers(0, num_nodes, batch)]), num_nodes)
+    return u[:num_edges], v[:num_edges]
+
+def barabasi_albert_edges(num_nodes, m, rng):
+    """Barabási–Albert 优先连接图：从 m+1 个节点的完全图开始，每个新节点连 m 条边
+
+    所有边的端点依次排成一个列表，按度数比例选旧节点等价于在新节点之前的端点中均匀抽取一个位置。
+    抽到的位置若本身也是“被选中的端点”，其值取决于更早的位置，因此先记录指针，
+    再用指针跳跃一次性解析，整个过程不需要逐节点循环。同一新节点重复选中的目标会被合并。
+    """
+    if not 1 <= m < num_nodes:
+        raise ValueError(f"m 必须满足 1 <= m < num_nodes，当前 m={m}")
+    seed_u, seed_v = np.triu_indices(m + 1, 1)
+    base = 2 * len(seed_u)
+    sources = np.repeat(np.arange(m + 1, num_nodes, dtype=np.int64), m)
+    total = base + 2 * len(sources)
+
+    endpoints = np.empty(total, dtype=np.int64)
+    endpoints[0:base:2] = seed_u
+    endpoints[1:base:2] = seed_v
+    endpoints[base::2] = sources
+
+    # 每条新边的目标位置：在该新节点第一条边之前的端点中均匀抽取
+    limit = base + 2 * m * (sources - (m + 1))
+    pointer = np.arange(total, dtype=np.int64)
+    pointer[base + 1::2] = (rng.random(len(sources)) * limit).astype(np.int64)
+    while True:
+        jumped = pointer[pointer]
+        if np.array_equal(jumped, pointer):
+            break
+        pointer = jumped
+    targets = endpoints[pointer[base + 1::2]]
+
+    return _canonical(np.concatenate([seed_u, sources]),
+                      np.concatenate([seed_v, targets]), num_nodes)
+
+def grid_edges(rows, cols):
+    """rows x cols 网格，节点编号为 r * cols + c"""
+    ids = np.arange(rows * cols, dtype=np.int64).reshape(rows, cols)
+    u = np.concatenate([ids[:, :-1].ravel(), ids[:-1, :].ravel()])
+    v = np.concatenate([ids[:, 1:].ravel(), ids[1:, :].ravel()])
+    return u, v
+
+def fat_tree_edges(k, hosts=True):
+    """k叉胖树（k为偶数）：(k/2)^2 个核心交换机，k 个pod各含 k/2 个汇聚和 k/2 个接入交换机，
+    每个接入交换机下挂 k/2 台主机。返回 (节点数, u, v)，编号顺序为核心、汇聚、接入、主机。
+    """
+    if k < 2 or k % 2:
+        raise ValueError(f"胖树的 k 必须是不小于2的偶数，当前 k={k}")
+    half = k // 2
+    num_core = half * half
+    agg = num_core + np.arange(k * half, dtype=np.int64).reshape(k, half)  # [pod, i]
+    edge = agg[-1, -1] + 1 + np.arange(k * half, dtype=np.int64).reshape(k, half)
+    num_nodes = int(edge[-1, -1]) + 1
+
+    # 每个pod的第 i 个汇聚交换机连接核心交换机 i*half .. i*half+half-1
+    core = np.arange(num_core, dtype=np.int64).reshape(half, half)
+    u = [np.broadcast_to(core[None, :, :], (k, half, half)).ravel()]
+    v = [np.broadcast_to(agg[:, :, None], (k, half, half)).ravel()]
+    # pod内汇聚交换机与接入交换机全连接
+    u.append(np.broadcast_to(agg[:, None, :], (k, half, half)).ravel())
+    v.append(np.broadcast_to(edge[:, :, None], (k, half, half)).ravel())
+    if hosts:
+        host_u = np.repeat(edge.ravel(), half)
+        u.append(host_u)
+        v.append(num_nodes + np.arange(len(host_u), dtype=np.int64))
+        num_nodes += len(host_u)
+    return num_nodes, np.concatenate(u), np.concatenate(v)
+
+def connected_components(num_nodes, u, v):
+    """连通分量标号（每个节点的标号为其所在分量的最小节点编号）"""
+    labels = np.arange(num_nodes, dtype=np.int64)
+    while True:
+        hooked = labels.copy()
+        smaller = np.minimum(labels[u], labels[v])
+        np.minimum.at(hooked, u, smaller)
+        np.minimum.at(hooked, v, smaller)
+        hooked = hooked[hooked]  # 指针跳跃，加速收敛
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
+
+def connect_components(num_nodes, u, v, rng):
+    """为每个非首个连通分量添加一条边，连到随机一个更早的分量，使图连通"""
+    roots = np.unique(connected_components(num_nodes, u, v))
+    if len(roots) <= 1:
+        return u, v
+    partners = roots[(rng.random(len(roots) - 1) * np.arange(1, len(roots))).astype(np.int64)]
+    return (np.concatenate([u, np.minimum(partners, roots[1:])]),
+            np.concatenate([v, np.maximum(partners, roots[1:])]))
+
+def populate_network(num_nodes, u, v, rng, network=None):
+    """按 create_network 的属性分布随机生成节点与边属性，批量写入 SecureNetwork"""
+    network = SecureNetwork() if network is None else network
+    capacities = rng.integers(80, 201, num_nodes).tolist()
+    security_levels = rng.integers(1, 4, num_nodes).tolist()
+    latencies = rng.integers(10, 51, len(u)).tolist()
+    bandwidths = rng.choice([100, 200, 500], len(u)).tolist()
+    network.add_nodes(SecureNode(i, capacities[i], security_levels[i]) for i in range(num_nodes))
+    network.add_edges(zip(u.tolist(), v.tolist(), latencies, bandwidths))
+    return network
+
+def generate_edges(kind, rng, connected=True, **params):
+    """按拓扑类型生成边数组，返回 (节点数, u, v)
+
+    kind 与参数：
+      'er'        num_nodes，num_edges 或 p
+      'ba'        num_nodes，m
+      'grid'      rows，cols
+      'fat_tree'  k，hosts（默认 True）
+    connected 为 True 时补边保证连通（网格和胖树本身连通）。
+    """
+    if kind == 'er':
+        num_nodes = params['num_nodes']
+        u, v = erdos_renyi_edges(num_nodes, rng, params.get('num_edges'), params.get('p'))
+    elif kind == 'ba':
+        num_nodes = params['num_nodes']
+        u, v = barabasi_albert_edges(num_nodes, params['m'], rng)
+    elif kind == 'grid':
+        num_nodes = params['rows'] * params['cols']
+        u, v = grid_edges(params['rows'], params['cols'])
+    elif kind == 'fat_tree':
+        num_nodes, u, v = fat_tree_edges(params['k'], params.get('hosts', True))
+    else:
+        raise ValueError(f"未知的拓扑类型: {kind}")
+    if connected:
+        u, v = connect_components(num_nodes, u, v, rng)
+    return num_nodes, u, v
+
+def generate_network(kind='er', seed=None, connected=True, **params):
+    """生成指定类型的 SecureNetwork；相同种子与参数得到相同的网络
+
+    seed 同时作为布局种子，networkx 布局只接受 32 位种子，因此取低 32 位。
+    """
+    rng = np.random.default_rng(seed)
+    num_nodes, u, v = generate_edges(kind, rng, connected, **params)
+    network = populate_network(num_nodes, u, v, rng)
+    network.layout_seed = None if seed is None else seed % 2 ** 32
+    return network